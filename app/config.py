@@ -2,7 +2,7 @@
 Application Configuration
 """
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Literal, Optional
 
 
 class Settings(BaseSettings):
@@ -12,13 +12,118 @@ class Settings(BaseSettings):
     APP_NAME: str = "Smart Brewery IoT Server"
     VERSION: str = "1.0.0"
     
-    # Database - Azure SQL
+    # Database - Azure SQL, or sqlite:///path/to/brewery.db for an on-site server
     DATABASE_URL: str = ""
     
+    # Embedded SQLite tuning (only used with a sqlite:// DATABASE_URL)
+    SQLITE_SYNCHRONOUS: Literal["OFF", "NORMAL", "FULL", "EXTRA"] = "NORMAL"
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    SQLITE_CACHE_SIZE_KB: int = 64 * 1024
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_READ_POOL_SIZE: int = 8
+    
     # JWT Settings
     SECRET_KEY: str = ""
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 30
+    # Rotated refresh tokens are kept this long to detect their reuse, then purged
+    REFRESH_TOKEN_REUSE_WINDOW_HOURS: int = 24
+    
+    # Authenticated user cache (per worker, 0 TTL disables it)
+    USER_CACHE_TTL_SECONDS: int = 60
+    USER_CACHE_MAX_SIZE: int = 1024
+    
+    # Stateless auth - readings endpoints trust token claims, no DB lookup.
+    # Revoked tokens then stay valid until they expire (ACCESS_TOKEN_EXPIRE_MINUTES).
+    # Bump TOKEN_VERSION to invalidate every token issued before.
+    STATELESS_AUTH: bool = False
+    TOKEN_VERSION: int = 1
+    TOKEN_DECODE_CACHE_SIZE: int = 4096
+    
+    # Password hashing pool (bcrypt runs off the event loop, 0 workers = inline)
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_QUEUE_SIZE: int = 16
+    
+    # Device API keys for /sensor/data (X-Device-Key header)
+    DEVICE_AUTH_REQUIRED: bool = False
+    DEVICE_KEY_REFRESH_SECONDS: int = 30
+    
+    # Background database probe used by /health/ready
+    HEALTH_PROBE_INTERVAL_SECONDS: int = 15
+    
+    # Batch uploads (/sensor/batch)
+    GZIP_REQUEST_MAX_BYTES: int = 10 * 1024 * 1024
+    BATCH_ID_RETENTION_DAYS: int = 7
+    
+    # Derived series (dew point, weight-loss rate, pH drift) computed on ingestion
+    DERIVED_SERIES_ENABLED: bool = True
+    DERIVED_WINDOW_MINUTES: int = 60
+    DERIVED_MIN_INTERVAL_SECONDS: int = 60
+    
+    # Bulk export (/export) - rows per fetch / CSV chunk / Parquet row group
+    EXPORT_CHUNK_ROWS: int = 10000
+    EXPORT_MAX_CONCURRENT: int = 2
+    
+    # Cold data archive - readings older than ARCHIVE_AFTER_DAYS move to
+    # ARCHIVE_DIR/<sensor>/<YYYY-MM>/part-*.parquet (disabled when empty, needs pyarrow)
+    ARCHIVE_DIR: str = ""
+    ARCHIVE_AFTER_DAYS: int = 90
+    ARCHIVE_INTERVAL_SECONDS: int = 3600
+    ARCHIVE_BATCH_ROWS: int = 50000
+    ARCHIVE_MAX_ROWS_PER_RUN: int = 1000000
+    
+    # Analytics - /readings/{type}/stats over more than ANALYTICS_MIN_DAYS runs in DuckDB
+    # on a Parquet snapshot in ANALYTICS_DIR, extended with the new rows every
+    # ANALYTICS_REFRESH_SECONDS (disabled when empty, needs duckdb and pyarrow)
+    ANALYTICS_DIR: str = ""
+    ANALYTICS_MIN_DAYS: int = 30
+    ANALYTICS_REFRESH_SECONDS: int = 900
+    ANALYTICS_THREADS: int = 2
+    
+    # Alert rules evaluated on ingestion, e.g. "temperature>24,temperature<16,temperature:rate>0.5,ph:zscore>4"
+    ALERT_RULES: str = ""
+    ALERT_COOLDOWN_SECONDS: int = 900
+    ALERT_EWMA_ALPHA: float = 0.1
+    ALERT_ZSCORE_MIN_SAMPLES: int = 30
+    # Alert sinks besides the application log (disabled when empty)
+    ALERT_FILE_PATH: str = ""
+    ALERT_WEBHOOK_URL: str = ""
+    
+    # Query profiler - slow-query log and optional plan capture
+    SLOW_QUERY_THRESHOLD_MS: int = 500
+    QUERY_PLAN_CAPTURE: bool = False
+    QUERY_PLAN_SLOWEST: int = 10
+    QUERY_STATS_MAX_STATEMENTS: int = 500
+    
+    # Comma separated usernames allowed to use /diagnostics endpoints
+    # and per-request profiling
+    OPERATOR_USERNAMES: str = ""
+    
+    # /metrics access - a bearer token for the scraper, or client addresses
+    # (comma separated IPs/networks); everything else gets 403
+    METRICS_TOKEN: str = ""
+    METRICS_ALLOWED_IPS: str = "127.0.0.1,::1"
+    
+    # On-demand profiling (X-Profile header), profiles are written to PROFILE_DIR
+    PROFILING_ENABLED: bool = False
+    PROFILE_DIR: str = "profiles"
+    
+    # Traffic capture for replay (disabled when empty), one file per worker
+    TRAFFIC_CAPTURE_PATH: str = ""
+    TRAFFIC_CAPTURE_MAX_BYTES: int = 50 * 1024 * 1024
+    TRAFFIC_CAPTURE_BACKUP_COUNT: int = 5
+    TRAFFIC_CAPTURE_MAX_BODY: int = 64 * 1024
+    
+    # Logging - records go through a queue to a background writer thread
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: Literal["json", "text"] = "json"
+    LOG_QUEUE_SIZE: int = 10000
+    
+    # Access log sampling per route template ("route=rate,..."), errors and slow requests always logged
+    ACCESS_LOG_SAMPLE_RATES: str = "/sensor/data=0.01,/sensor/batch=0.1"
+    ACCESS_LOG_DEFAULT_SAMPLE_RATE: float = 1.0
+    ACCESS_LOG_SLOW_MS: float = 1000
     
     class Config:
         env_file = ".env"
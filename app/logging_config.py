@@ -0,0 +1,157 @@
+"""
+Logging Configuration
+
+Request handlers never write log output themselves: loggers get a
+QueueHandler and a background QueueListener thread formats records and
+writes them to the real handlers. Records are JSON by default.
+
+When the queue is full, records below WARNING are dropped and counted.
+Warnings and errors wait for space, so error logs stay complete.
+
+A listener thread does not survive fork, so gunicorn's post_fork hook
+calls `restart_log_pipelines()` in every worker.
+"""
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List
+
+# Attributes of every LogRecord - anything else was passed with `extra=`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, including `extra=` fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "pid": record.process,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops low-level records instead of blocking when the queue is full"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Keep the traceback apart from the message so the listener can format it as a field
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if record.levelno >= logging.WARNING:
+                self.queue.put(record)
+            else:
+                self.dropped += 1
+
+
+class LogPipeline:
+    """Routes a logger through a queue to handlers owned by a listener thread"""
+
+    def __init__(self, logger: logging.Logger, handlers: List[logging.Handler], queue_size: int):
+        self.logger = logger
+        self.handlers = handlers
+        self.queue_size = queue_size
+        self.handler = None
+        self.listener = None
+        self.pid = None
+
+    def start(self) -> None:
+        """(Re)start the listener - after fork the parent's thread is gone"""
+        if self.pid == os.getpid():
+            return
+        if self.handler is not None:
+            self.logger.removeHandler(self.handler)
+        self.handler = DroppingQueueHandler(queue.Queue(self.queue_size))
+        self.listener = QueueListener(self.handler.queue, *self.handlers, respect_handler_level=True)
+        self.listener.start()
+        self.logger.addHandler(self.handler)
+        self.pid = os.getpid()
+
+    def stop(self) -> None:
+        """Flush queued records and stop the listener (this process only)"""
+        if self.listener is not None and self.pid == os.getpid():
+            self.listener.stop()
+            self.listener = None
+            self.pid = None
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.handler.queue.qsize() if self.handler else 0,
+            "dropped": self.handler.dropped if self.handler else 0
+        }
+
+
+_pipelines: Dict[str, LogPipeline] = {}
+
+
+def add_log_pipeline(logger: logging.Logger, handlers: List[logging.Handler], queue_size: int) -> LogPipeline:
+    """Send a logger's records through a queue to `handlers` (once per logger)"""
+    pipeline = _pipelines.get(logger.name)
+    if pipeline is None:
+        pipeline = _pipelines[logger.name] = LogPipeline(logger, handlers, queue_size)
+    pipeline.start()
+    return pipeline
+
+
+def restart_log_pipelines() -> None:
+    """Start listener threads in a forked worker"""
+    for pipeline in _pipelines.values():
+        pipeline.start()
+
+
+def stop_log_pipelines() -> None:
+    for pipeline in _pipelines.values():
+        pipeline.stop()
+
+
+def log_pipeline_stats() -> Dict[str, dict]:
+    return {name or "root": pipeline.stats() for name, pipeline in _pipelines.items()}
+
+
+def setup_logging(level: str, log_format: str, queue_size: int) -> None:
+    """Replace basicConfig: root logger -> queue -> stdout (JSON or text)"""
+    root = logging.getLogger()
+    if root.name in _pipelines:
+        restart_log_pipelines()
+        return
+    handler = logging.StreamHandler(sys.stdout)
+    if log_format == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.setLevel(level)
+    add_log_pipeline(root, [handler], queue_size)
+    atexit.register(stop_log_pipelines)
@@ -5,21 +5,50 @@ Simple REST API for receiving sensor data from Raspberry Pi
 and providing endpoints to read historical data.
 """
 import logging
+from app.services.startup import startup_report  # first, so import time is measured
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from app.config import get_settings
-from app.database import init_db
-from app.routers import auth, sensor, readings, health
+from app.database import engine, read_engine
+from app.logging_config import setup_logging
+from app.middleware.access_log import AccessLogMiddleware, parse_sample_rates
+from app.middleware.gzip_request import GzipRequestMiddleware
+from app.middleware.inflight import InFlightMiddleware, ingestion_requests
+from app.middleware.metrics import MetricsMiddleware
+from app.routers import auth, sensor, readings, devices, health, metrics, diagnostics, export
+from app.services.alerts import setup_alerts
+from app.services.analytics import analytics_available, refresh_snapshot
+from app.services.archive import archive_cold_readings, archive_enabled
+from app.services.auth import PasswordHasherBusy
+from app.services.device_auth import refresh_device_keys
+from app.services.health import probe_database
+from app.services.ingest import purge_ingested_batches
+from app.services.refresh_tokens import purge_refresh_tokens
+from app.services.metrics import instrument_engine
+from app.services.query_profiler import install_query_profiler
+from app.services.schema import database_prepared, prepare_database
+from app.services.tasks import start_periodic, stop_tasks
+
+settings = get_settings()
 
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
+setup_logging(settings.LOG_LEVEL, settings.LOG_FORMAT, settings.LOG_QUEUE_SIZE)
 logger = logging.getLogger(__name__)
+setup_alerts(
+    settings.ALERT_RULES,
+    settings.ALERT_COOLDOWN_SECONDS,
+    settings.ALERT_EWMA_ALPHA,
+    settings.ALERT_ZSCORE_MIN_SAMPLES,
+    file_path=settings.ALERT_FILE_PATH,
+    webhook_url=settings.ALERT_WEBHOOK_URL
+)
+startup_report.mark("imports")
 
-settings = get_settings()
+for _engine in {engine, read_engine}:
+    instrument_engine(_engine)
+    install_query_profiler(_engine)
 
 
 @asynccontextmanager
@@ -27,13 +56,35 @@ async def lifespan(app: FastAPI):
     """Application lifespan handler"""
     # Startup
     logger.info("Starting Smart Brewery IoT Server...")
-    init_db()
-    logger.info("Database initialized")
+    startup_report.mark("boot")
+    if database_prepared():
+        logger.info("Database schema checked by the gunicorn master")
+    else:
+        prepare_database()
+        logger.info("Database initialized")
+    startup_report.mark("database")
+    
+    tasks = [
+        start_periodic("device-keys", settings.DEVICE_KEY_REFRESH_SECONDS, refresh_device_keys),
+        start_periodic("database-probe", settings.HEALTH_PROBE_INTERVAL_SECONDS, probe_database),
+        start_periodic(
+            "batch-id-purge", 3600, lambda: purge_ingested_batches(settings.BATCH_ID_RETENTION_DAYS)
+        ),
+        start_periodic(
+            "refresh-token-purge", 3600, lambda: purge_refresh_tokens(settings.REFRESH_TOKEN_REUSE_WINDOW_HOURS)
+        ),
+    ]
+    if archive_enabled():
+        tasks.append(start_periodic("archiver", settings.ARCHIVE_INTERVAL_SECONDS, archive_cold_readings))
+    if analytics_available():
+        tasks.append(start_periodic("analytics-snapshot", settings.ANALYTICS_REFRESH_SECONDS, refresh_snapshot))
+    startup_report.complete()
     
     yield
     
     # Shutdown
     logger.info("Shutting down Smart Brewery IoT Server...")
+    await stop_tasks(tasks)
 
 
 app = FastAPI(
@@ -44,8 +95,10 @@ app = FastAPI(
 REST API for receiving sensor data from Raspberry Pi and reading historical data.
 
 ### Features:
-- **Sensor Data**: POST endpoint for Raspberry Pi to send sensor readings
+- **Sensor Data**: POST endpoints for Raspberry Pi to send sensor readings, one at a time or in batches
 - **Readings**: GET endpoints to retrieve historical sensor data
+- **Export**: Streaming CSV / Parquet download of any time range
+- **Devices**: Catalogue of devices and the sensors they report
 - **Authentication**: Register, login, update user profile
 
 ### Sensor Types:
@@ -59,7 +112,8 @@ REST API for receiving sensor data from Raspberry Pi and reading historical data
 ### Usage:
 1. Register at `/register`
 2. Login at `/login` to get access token
-3. Send sensor data to `/sensor/data` (no auth required)
+3. Send sensor data to `/sensor/data` (device API key from `/devices/{device_id}/key`,
+   required only when `DEVICE_AUTH_REQUIRED` is set)
 4. Read data from `/readings/*` (requires Bearer token)
     """,
     version=settings.VERSION,
@@ -76,12 +130,55 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(InFlightMiddleware, prefix="/sensor/", counter=ingestion_requests)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(
+    AccessLogMiddleware,
+    sample_rates=parse_sample_rates(settings.ACCESS_LOG_SAMPLE_RATES),
+    default_rate=settings.ACCESS_LOG_DEFAULT_SAMPLE_RATE,
+    slow_ms=settings.ACCESS_LOG_SLOW_MS
+)
+# Optional middleware is imported only when enabled
+if settings.PROFILING_ENABLED:
+    from app.middleware.profiling import ProfilingMiddleware
+    app.add_middleware(ProfilingMiddleware, profile_dir=settings.PROFILE_DIR)
+if settings.TRAFFIC_CAPTURE_PATH:
+    from app.middleware.capture import TrafficCaptureMiddleware
+    app.add_middleware(
+        TrafficCaptureMiddleware,
+        path=settings.TRAFFIC_CAPTURE_PATH,
+        max_bytes=settings.TRAFFIC_CAPTURE_MAX_BYTES,
+        backup_count=settings.TRAFFIC_CAPTURE_BACKUP_COUNT,
+        max_body=settings.TRAFFIC_CAPTURE_MAX_BODY
+    )
+# Outermost, so every other middleware sees the decompressed body
+app.add_middleware(GzipRequestMiddleware, max_size=settings.GZIP_REQUEST_MAX_BYTES)
+
+
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
+    """Too many logins/registrations at once - ask the client to retry"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Authentication service busy, try again"},
+        headers={"Retry-After": "1"}
+    )
+
 
 # Include routers
 app.include_router(health.router)
+app.include_router(metrics.router)
 app.include_router(auth.router)
 app.include_router(sensor.router)
 app.include_router(readings.router)
+app.include_router(devices.router)
+app.include_router(diagnostics.router)
+app.include_router(export.router)
+if settings.PROFILING_ENABLED:
+    # Sync endpoints run in the threadpool, out of sight of the profiling middleware
+    from app.middleware.profiling import profile_threadpool_calls
+    profile_threadpool_calls(app.routes)
+startup_report.mark("app")
 
 
 @app.get("/", tags=["Root"])
@@ -91,6 +188,8 @@ async def root():
         "message": "Smart Brewery IoT Server",
         "version": settings.VERSION,
         "documentation": "/docs",
-        "health": "/health"
+        "health": "/health",
+        "liveness": "/health/live",
+        "readiness": "/health/ready"
     }
 
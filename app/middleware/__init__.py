@@ -0,0 +1,2 @@
+# ASGI middleware - added in main.py
+__all__ = ["access_log", "capture", "gzip_request", "inflight", "metrics", "profiling"]
@@ -0,0 +1,115 @@
+"""
+Traffic Capture
+
+Records every request as one JSON line for later replay with
+benchmarks/replay.py: method, path, route, query, body, status and
+timing. The auth subject is stored only as a hash and bodies of
+authentication endpoints are never stored.
+
+Each worker writes its own rotating file (`<path>.<pid>`) so workers
+never rotate each other's files.
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+from logging.handlers import RotatingFileHandler
+from app.logging_config import add_log_pipeline
+from app.services.auth import decode_token
+
+# Bodies of these paths contain passwords, tokens or keys
+_REDACTED_PREFIXES = ("/login", "/register", "/me", "/token/", "/devices/")
+_SKIPPED_PREFIXES = ("/health", "/metrics")
+
+
+def _capture_logger(path: str, max_bytes: int, backup_count: int) -> logging.Logger:
+    logger = logging.getLogger(f"app.traffic_capture.{os.getpid()}")
+    if not logger.handlers:
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        handler = RotatingFileHandler(
+            f"{path}.{os.getpid()}", maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        # File writes happen on the log writer thread, not in the request
+        add_log_pipeline(logger, [handler], queue_size=10000)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+
+def _auth_subject(scope) -> str:
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            username = decode_token(token) if scheme.lower() == "bearer" and token else None
+            if username is None:
+                return "invalid"
+            return hashlib.sha256(username.encode()).hexdigest()[:16]
+    return None
+
+
+class TrafficCaptureMiddleware:
+    """Pure ASGI middleware writing request traces to a rotating JSON-lines file"""
+
+    def __init__(self, app, path: str, max_bytes: int, backup_count: int, max_body: int):
+        self.app = app
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.max_body = max_body
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(_SKIPPED_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        redacted = scope["path"].startswith(_REDACTED_PREFIXES)
+        body = bytearray()
+        truncated = False
+        status_code = 500
+
+        async def receive_wrapper():
+            nonlocal truncated
+            message = await receive()
+            if message["type"] == "http.request" and not redacted:
+                chunk = message.get("body", b"")
+                if len(body) + len(chunk) <= self.max_body:
+                    body.extend(chunk)
+                else:
+                    truncated = True
+            return message
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started_at = time.time()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            route = scope.get("route")
+            headers = dict(scope.get("headers", []))
+            record = {
+                "ts": round(started_at, 6),
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": route.path if route is not None else None,
+                "query": scope.get("query_string", b"").decode("latin-1"),
+                "content_type": headers.get(b"content-type", b"").decode("latin-1") or None,
+                "body": None if redacted or truncated else body.decode("utf-8", errors="replace"),
+                "redacted": redacted,
+                "truncated": truncated,
+                "device_key": b"x-device-key" in headers,
+                "subject": _auth_subject(scope),
+                "status": status_code,
+                "duration_ms": round(duration_ms, 3),
+            }
+            _capture_logger(self.path, self.max_bytes, self.backup_count).info(
+                json.dumps(record, separators=(",", ":"))
+            )
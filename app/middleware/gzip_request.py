@@ -0,0 +1,61 @@
+"""
+Gzip Request Middleware
+
+Decompresses request bodies sent with `Content-Encoding: gzip` (batch
+uploads from the Pi client) before they reach the endpoint. The
+decompressed size is capped so a small upload can't expand into a huge
+one.
+"""
+import zlib
+from starlette.responses import PlainTextResponse
+
+
+class GzipRequestMiddleware:
+    """Pure ASGI middleware inflating gzip-encoded request bodies"""
+
+    def __init__(self, app, max_size: int):
+        self.app = app
+        self.max_size = max_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        if headers.get(b"content-encoding", b"").lower() != b"gzip":
+            await self.app(scope, receive, send)
+            return
+
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        body = bytearray()
+        try:
+            more_body = True
+            while more_body:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    return
+                more_body = message.get("more_body", False)
+                body.extend(decompressor.decompress(message.get("body", b""), self.max_size + 1 - len(body)))
+                if len(body) > self.max_size:
+                    await PlainTextResponse("Request body too large", status_code=413)(scope, receive, send)
+                    return
+            body.extend(decompressor.flush())
+        except zlib.error:
+            await PlainTextResponse("Invalid gzip body", status_code=400)(scope, receive, send)
+            return
+
+        scope = dict(scope)
+        scope["headers"] = [
+            (name, value) for name, value in scope["headers"]
+            if name not in (b"content-encoding", b"content-length")
+        ] + [(b"content-length", str(len(body)).encode())]
+        body_sent = False
+
+        async def receive_decompressed():
+            nonlocal body_sent
+            if body_sent:
+                return await receive()
+            body_sent = True
+            return {"type": "http.request", "body": bytes(body), "more_body": False}
+
+        await self.app(scope, receive_decompressed, send)
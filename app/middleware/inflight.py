@@ -0,0 +1,40 @@
+"""
+In-flight Request Counter
+
+Counts requests under a path prefix from the moment they reach the app,
+including time spent waiting for the event loop or reading the body.
+"""
+
+
+class InFlightCounter:
+    """Number of requests currently being handled, and the peak seen"""
+
+    def __init__(self):
+        self.current = 0
+        self.peak = 0
+
+    def stats(self) -> dict:
+        return {"in_flight": self.current, "peak": self.peak}
+
+
+ingestion_requests = InFlightCounter()
+
+
+class InFlightMiddleware:
+    """Pure ASGI middleware updating an InFlightCounter for one path prefix"""
+
+    def __init__(self, app, prefix: str, counter: InFlightCounter):
+        self.app = app
+        self.prefix = prefix
+        self.counter = counter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+        self.counter.current += 1
+        self.counter.peak = max(self.counter.peak, self.counter.current)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.counter.current -= 1
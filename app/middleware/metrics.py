@@ -0,0 +1,39 @@
+"""
+Request Metrics Middleware
+
+Observes request latency per route template (e.g. `/readings/{...}`
+routes are labelled by their path, not the raw URL).
+"""
+import time
+from app.services.metrics import REQUEST_LATENCY
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording http_request_duration_seconds"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            REQUEST_LATENCY.labels(
+                scope["method"],
+                route.path if route is not None else "unmatched",
+                str(status_code)
+            ).observe(time.perf_counter() - start)
@@ -0,0 +1,187 @@
+"""
+On-demand Request Profiling
+
+Profiles a single request with cProfile when an operator asks for it
+with the `X-Profile` header or the `__profile` query parameter:
+
+- `X-Profile: 1` - profile is written to PROFILE_DIR, the file name is
+  returned in the `X-Profile-File` response header
+- `X-Profile: text` - the response body is replaced with the pstats
+  report (top functions by cumulative time)
+
+Only users listed in OPERATOR_USERNAMES may profile, other requests
+are served normally. cProfile only sees the thread it runs in: the
+middleware profiles the event loop thread (`async def` endpoints), and
+`profile_threadpool_calls` wraps the plain `def` endpoints and
+dependencies, which FastAPI runs in the threadpool, so they get their
+own profiler in the worker thread while a request is profiled. Both are
+merged into one report. One request per worker is profiled at a time.
+"""
+import functools
+import inspect
+import io
+import os
+import re
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime
+from typing import List, Optional
+from urllib.parse import parse_qs
+from starlette.concurrency import run_in_threadpool
+from app.database import ReadSessionLocal
+from app.services.auth import get_cached_user_from_token, is_operator
+
+_PROFILE_LOCK = threading.Lock()
+_UNSAFE_CHARS = re.compile(r"[^A-Za-z0-9_.-]+")
+
+# Profilers of the threadpool calls of the request being profiled
+_thread_profiles: ContextVar[Optional[List]] = ContextVar("thread_profiles", default=None)
+
+
+def _profiled(call):
+    @functools.wraps(call)
+    def wrapper(*args, **kwargs):
+        profiles = _thread_profiles.get()
+        if profiles is None:
+            return call(*args, **kwargs)
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiles.append(profiler)
+        return profiler.runcall(call, *args, **kwargs)
+
+    wrapper.profiled = True
+    return wrapper
+
+
+def _wrap_dependant(dependant) -> None:
+    call = dependant.call
+    if (
+        inspect.isfunction(call)
+        and not getattr(call, "profiled", False)
+        and not inspect.iscoroutinefunction(call)
+        and not inspect.isgeneratorfunction(call)
+        and not inspect.isasyncgenfunction(call)
+    ):
+        dependant.call = _profiled(call)
+    for dependency in dependant.dependencies:
+        _wrap_dependant(dependency)
+
+
+def profile_threadpool_calls(routes) -> None:
+    """Let profiled requests also profile their sync endpoints and dependencies (call after include_router)"""
+    for route in routes:
+        dependant = getattr(route, "dependant", None)
+        if dependant is not None:
+            _wrap_dependant(dependant)
+
+
+def _profile_mode(scope) -> str:
+    for name, value in scope.get("headers", []):
+        if name == b"x-profile":
+            return value.decode("latin-1").strip().lower()
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    return query.get("__profile", [""])[0].lower()
+
+
+def _operator_from_headers(scope) -> bool:
+    """Same token checks as the API (revoked tokens, inactive users), may read the database"""
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() != "bearer" or not token:
+                return False
+            db = ReadSessionLocal()
+            try:
+                user = get_cached_user_from_token(token, db)
+            finally:
+                db.close()
+            return user is not None and is_operator(user.username)
+    return False
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware profiling requests flagged by an operator"""
+
+    def __init__(self, app, profile_dir: str):
+        self.app = app
+        self.profile_dir = profile_dir
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        mode = _profile_mode(scope)
+        if mode in ("", "0", "false") or not await run_in_threadpool(_operator_from_headers, scope):
+            await self.app(scope, receive, send)
+            return
+        if not _PROFILE_LOCK.acquire(blocking=False):
+            # Another request of this worker is being profiled
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self._profile(scope, receive, send, as_text=(mode == "text"))
+        finally:
+            _PROFILE_LOCK.release()
+
+    async def _profile(self, scope, receive, send, as_text: bool):
+        import cProfile
+        import pstats
+
+        slug = _UNSAFE_CHARS.sub("_", scope["path"].strip("/")) or "root"
+        stamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S-%f")
+        filename = f"{stamp}-{os.getpid()}-{scope['method']}-{slug}.prof"
+        path = os.path.join(self.profile_dir, filename)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if as_text:
+                    return
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-file", filename.encode()))
+                message = {**message, "headers": headers}
+            elif as_text:
+                return
+            await send(message)
+
+        profiler = cProfile.Profile()
+        thread_profiles = []
+        token = _thread_profiles.set(thread_profiles)
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.disable()
+            _thread_profiles.reset(token)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            stats = pstats.Stats(profiler)
+            for thread_profile in thread_profiles:
+                stats.add(thread_profile)
+            os.makedirs(self.profile_dir, exist_ok=True)
+            stats.dump_stats(path)
+
+        if as_text:
+            report = io.StringIO()
+            report.write(
+                f"{scope['method']} {scope['path']} -> {status_code} in {elapsed_ms:.1f} ms\n"
+                f"profile: {path}\n\n"
+            )
+            stats.stream = report
+            stats.sort_stats("cumulative").print_stats(40)
+            body = report.getvalue().encode()
+            await send({
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"text/plain; charset=utf-8"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"x-profile-file", filename.encode()),
+                    (b"x-profiled-status", str(status_code).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
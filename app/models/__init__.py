@@ -1,19 +1,35 @@
 from app.models.user import User
+from app.models.alert import AlertState
+from app.models.device import DeviceSensor, DeviceCredential, IngestedBatch
+from app.models.refresh_token import RefreshToken
+from app.models.schema_version import SchemaVersion
 from app.models.readings import (
     TemperatureReading,
     PhReading,
     WeightReading,
     OutsideTemperatureReading,
     HumidityReading,
-    PressureReading
+    PressureReading,
+    DerivedReading,
+    SENSOR_MODELS,
+    SENSOR_VALUE_COLUMNS
 )
 
 __all__ = [
     "User",
+    "AlertState",
+    "DeviceSensor",
+    "DeviceCredential",
+    "IngestedBatch",
+    "RefreshToken",
+    "SchemaVersion",
     "TemperatureReading",
     "PhReading",
     "WeightReading",
     "OutsideTemperatureReading",
     "HumidityReading",
-    "PressureReading"
+    "PressureReading",
+    "DerivedReading",
+    "SENSOR_MODELS",
+    "SENSOR_VALUE_COLUMNS"
 ]
@@ -0,0 +1,19 @@
+"""
+Alert State Model
+"""
+from sqlalchemy import Column, Integer, Boolean, Float, String, UniqueConstraint
+from app.database import Base
+
+
+class AlertState(Base):
+    """Last alert sent per rule and device - shared by all workers for dedup and cool-down"""
+    __tablename__ = "alert_states"
+    __table_args__ = (
+        UniqueConstraint("rule", "device_id", name="uq_alert_states_rule_device"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    rule = Column(String(100), nullable=False)
+    device_id = Column(String(100), nullable=False)
+    firing = Column(Boolean, nullable=False, default=False)
+    sent_at = Column(Float, nullable=False)  # Unix time the last event was sent
@@ -0,0 +1,45 @@
+"""
+Device Catalogue Model
+"""
+from sqlalchemy import Column, Integer, DateTime, String, UniqueConstraint
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class DeviceSensor(Base):
+    """Per device and sensor type summary, updated on every ingested reading"""
+    __tablename__ = "device_catalogue"
+    __table_args__ = (
+        UniqueConstraint("device_id", "sensor_type", name="uq_device_catalogue_device_sensor"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    device_id = Column(String(100), index=True, nullable=False)
+    sensor_type = Column(String(50), nullable=False)
+    first_seen = Column(DateTime(timezone=True), server_default=func.now())
+    last_seen = Column(DateTime(timezone=True), server_default=func.now())
+    reading_count = Column(Integer, nullable=False, default=0)
+
+
+class DeviceCredential(Base):
+    """API key of a device - only its SHA-256 hash is stored"""
+    __tablename__ = "device_credentials"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    device_id = Column(String(100), unique=True, index=True, nullable=False)
+    key_hash = Column(String(64), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class IngestedBatch(Base):
+    """Batch upload already stored - a retried upload with the same batch_id is skipped"""
+    __tablename__ = "ingested_batches"
+    __table_args__ = (
+        UniqueConstraint("device_id", "batch_id", name="uq_ingested_batches_device_batch"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    device_id = Column(String(100), nullable=False)
+    batch_id = Column(String(100), nullable=False)
+    reading_count = Column(Integer, nullable=False)
+    received_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
@@ -1,7 +1,7 @@
 """
 Sensor Reading Models
 """
-from sqlalchemy import Column, Integer, Float, DateTime, String
+from sqlalchemy import Column, Integer, Float, DateTime, String, Index, UniqueConstraint
 from sqlalchemy.sql import func
 from app.database import Base
 
@@ -64,3 +64,40 @@ class PressureReading(Base):
     device_id = Column(String(100), index=True, nullable=False)
     pressure_hpa = Column(Float, nullable=False)
     timestamp = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+
+class DerivedReading(Base):
+    """Values computed from raw readings (dew point, weight-loss rate, pH drift)"""
+    __tablename__ = "derived_readings"
+    __table_args__ = (
+        Index("ix_derived_readings_series_device_timestamp", "series", "device_id", "timestamp"),
+        # At most one value per series, device and DERIVED_MIN_INTERVAL_SECONDS bucket, across workers
+        UniqueConstraint("series", "device_id", "bucket", name="uq_derived_readings_series_device_bucket"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    series = Column(String(50), nullable=False)
+    device_id = Column(String(100), nullable=False)
+    bucket = Column(Integer, nullable=False)
+    value = Column(Float, nullable=False)
+    timestamp = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+
+# Sensor type (as sent by devices) -> model and the column holding the value
+SENSOR_MODELS = {
+    "temperature": TemperatureReading,
+    "ph": PhReading,
+    "weight": WeightReading,
+    "outsideTemp": OutsideTemperatureReading,
+    "humidity": HumidityReading,
+    "pressure": PressureReading,
+}
+
+SENSOR_VALUE_COLUMNS = {
+    "temperature": "temperature_celsius",
+    "ph": "ph_value",
+    "weight": "weight_kg",
+    "outsideTemp": "temperature_celsius",
+    "humidity": "humidity_percent",
+    "pressure": "pressure_hpa",
+}
@@ -0,0 +1,24 @@
+"""
+Refresh Token Model
+"""
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class RefreshToken(Base):
+    """
+    Issued refresh token - only its SHA-256 hash is stored
+
+    Tokens rotated from the same login share a family_id, so reuse of an
+    already rotated token revokes the whole family.
+    """
+    __tablename__ = "refresh_tokens"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+    token_hash = Column(String(64), unique=True, index=True, nullable=False)
+    family_id = Column(String(32), index=True, nullable=False)
+    expires_at = Column(DateTime, nullable=False)  # naive UTC
+    revoked = Column(Boolean, default=False, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
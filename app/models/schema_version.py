@@ -0,0 +1,20 @@
+"""
+Schema Version Model
+"""
+from sqlalchemy import Column, Integer, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class SchemaVersion(Base):
+    """
+    Version of the table layout the database was last created for
+
+    Checked once at startup - when it matches `SCHEMA_VERSION`,
+    `create_all` and its per-table metadata round trips are skipped.
+    """
+    __tablename__ = "schema_version"
+    
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False)
+    applied_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
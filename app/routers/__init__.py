@@ -1,3 +1,3 @@
 # Router modules - import done in main.py
-__all__ = ["auth", "sensor", "readings", "health"]
+__all__ = ["auth", "sensor", "readings", "devices", "health", "metrics", "diagnostics", "export"]
 
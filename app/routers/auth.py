@@ -7,14 +7,22 @@ from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.config import get_settings
-from app.schemas.user import UserCreate, UserLogin, UserResponse, UserUpdate, Token
+from app.schemas.user import UserCreate, UserLogin, UserResponse, UserUpdate, Token, RefreshTokenRequest
 from app.services.auth import (
-    get_password_hash,
-    authenticate_user,
+    get_password_hash_async,
+    authenticate_user_async,
     get_user_by_username,
     get_user_by_email,
-    create_access_token,
-    get_current_user_from_token
+    create_user_access_token,
+    get_current_user_from_token,
+    invalidate_cached_user,
+    revoke_user_access_tokens
+)
+from app.services.refresh_tokens import (
+    issue_refresh_token,
+    rotate_refresh_token,
+    revoke_refresh_token,
+    revoke_user_refresh_tokens
 )
 from app.models.user import User
 
@@ -65,8 +73,9 @@ async def register(
             detail="Username already taken"
         )
     
-    # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    # Create new user - end the read transaction so the connection is free while hashing
+    db.rollback()
+    hashed_password = await get_password_hash_async(user_data.password)
     db_user = User(
         email=user_data.email,
         username=user_data.username,
@@ -92,9 +101,9 @@ async def login(
     - username: Your username
     - password: Your password
     
-    Returns JWT access token
+    Returns JWT access token and a refresh token for `/token/refresh`
     """
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user_async(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -102,10 +111,46 @@ async def login(
             headers={"WWW-Authenticate": "Bearer"},
         )
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
-    )
-    return {"access_token": access_token, "token_type": "bearer"}
+    access_token = create_user_access_token(user, expires_delta=access_token_expires)
+    refresh_token = issue_refresh_token(db, user)
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+
+@router.post("/token/refresh", response_model=Token)
+async def refresh_access_token(
+    request: RefreshTokenRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Get a new access token using a refresh token
+    
+    The refresh token is rotated - use the returned `refresh_token` next
+    time, the old one stops working.
+    """
+    result = rotate_refresh_token(db, request.refresh_token)
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    user, refresh_token = result
+    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_user_access_token(user, expires_delta=access_token_expires)
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+
+@router.post("/token/revoke", status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_token(
+    request: RefreshTokenRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Revoke a refresh token (logout)
+    
+    Also revokes every token rotated from the same login.
+    """
+    revoke_refresh_token(db, request.refresh_token)
 
 
 @router.get("/me", response_model=UserResponse)
@@ -137,6 +182,8 @@ async def update_user(
     - full_name
     - password
     """
+    previous_username = current_user.username
+    
     # Check email uniqueness if updating email
     if user_update.email and user_update.email != current_user.email:
         if get_user_by_email(db, user_update.email):
@@ -144,7 +191,6 @@ async def update_user(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email already registered"
             )
-        current_user.email = user_update.email
     
     # Check username uniqueness if updating username
     if user_update.username and user_update.username != current_user.username:
@@ -153,6 +199,16 @@ async def update_user(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Username already taken"
             )
+    
+    # Hash before changing anything - the connection goes back to the pool meanwhile
+    hashed_password = None
+    if user_update.password:
+        db.rollback()
+        hashed_password = await get_password_hash_async(user_update.password)
+    
+    if user_update.email:
+        current_user.email = user_update.email
+    if user_update.username:
         current_user.username = user_update.username
     
     # Update full name
@@ -160,11 +216,16 @@ async def update_user(
         current_user.full_name = user_update.full_name
     
     # Update password if provided
-    if user_update.password:
-        current_user.hashed_password = get_password_hash(user_update.password)
+    if hashed_password:
+        current_user.hashed_password = hashed_password
+        revoke_user_access_tokens(current_user)
+        revoke_user_refresh_tokens(db, current_user.id)
     
     db.commit()
     db.refresh(current_user)
     
+    # Drop cached auth data so the change is visible on the next request
+    invalidate_cached_user(previous_username, current_user.username)
+    
     return current_user
 
@@ -0,0 +1,57 @@
+"""
+Devices Endpoints - Device catalogue
+"""
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from app.database import get_db, get_read_db
+from app.routers.diagnostics import get_current_operator
+from app.routers.readings import get_current_user
+from app.schemas.device import DeviceResponse, DeviceKeyResponse
+from app.services.auth import CachedUser
+from app.services.devices import list_devices
+from app.services.device_auth import create_device_key, delete_device_key
+
+router = APIRouter(prefix="/devices", tags=["Devices"])
+
+
+@router.get("", response_model=List[DeviceResponse])
+def get_devices(
+    db: Session = Depends(get_read_db),
+    current_user: CachedUser = Depends(get_current_user)
+):
+    """
+    List known devices
+    
+    For every device returns each sensor type it reports with first seen,
+    last seen and number of readings. Served from the device catalogue,
+    the reading tables are not scanned.
+    """
+    return list_devices(db)
+
+
+@router.post("/{device_id}/key", response_model=DeviceKeyResponse, status_code=status.HTTP_201_CREATED)
+async def create_key(
+    device_id: str,
+    db: Session = Depends(get_db),
+    operator: CachedUser = Depends(get_current_operator)
+):
+    """
+    Create an API key for a device (operators only)
+    
+    Replaces the previous key of the device. The key is returned only
+    once - configure it on the device as the `X-Device-Key` header.
+    Other workers accept the new key after DEVICE_KEY_REFRESH_SECONDS.
+    """
+    return {"device_id": device_id, "api_key": create_device_key(db, device_id)}
+
+
+@router.delete("/{device_id}/key", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_key(
+    device_id: str,
+    db: Session = Depends(get_db),
+    operator: CachedUser = Depends(get_current_operator)
+):
+    """Revoke the API key of a device (operators only)"""
+    if not delete_device_key(db, device_id):
+        raise HTTPException(status_code=404, detail="Device has no API key")
@@ -0,0 +1,74 @@
+"""
+Diagnostics Endpoints - Worker statistics and query profiler (operators only)
+"""
+from typing import Literal
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from app.logging_config import log_pipeline_stats
+from app.middleware.inflight import ingestion_requests
+from app.routers.readings import get_current_user
+from app.services.alerts import alert_engine
+from app.services.auth import CachedUser, is_operator, password_hasher, user_cache
+from app.services.derived import derived_engine
+from app.services.device_auth import device_key_cache
+from app.services.health import pool_stats
+from app.services.query_profiler import query_stats
+from app.services.startup import startup_report
+
+router = APIRouter(prefix="/diagnostics", tags=["Diagnostics"])
+
+
+def get_current_operator(current_user: CachedUser = Depends(get_current_user)) -> CachedUser:
+    """Dependency allowing only users listed in OPERATOR_USERNAMES"""
+    if not is_operator(current_user.username):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Operator access required"
+        )
+    return current_user
+
+
+@router.get("/stats")
+async def get_worker_stats(operator: CachedUser = Depends(get_current_operator)):
+    """
+    Internal statistics of the worker serving the request
+    
+    Connection pools, ingestion requests in flight, user and device key
+    caches, password hashing pool, startup timings, log pipelines, alert
+    engine and derived series state.
+    """
+    return {
+        "pool": pool_stats(),
+        "ingestion": ingestion_requests.stats(),
+        "auth_cache": user_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+        "device_keys": device_key_cache.stats(),
+        "startup": startup_report.stats(),
+        "logging": log_pipeline_stats(),
+        "alerts": alert_engine.stats(),
+        "derived": derived_engine.stats()
+    }
+
+
+@router.get("/queries")
+async def get_query_stats(
+    limit: int = Query(default=20, ge=1, le=500, description="Number of statements"),
+    order_by: Literal["total_ms", "max_ms", "count"] = Query(default="total_ms"),
+    operator: CachedUser = Depends(get_current_operator)
+):
+    """
+    Top normalized SQL statements of this worker
+    
+    Returns the top N statements by total time (or max time / count) and
+    the execution plans captured for the slowest queries when
+    QUERY_PLAN_CAPTURE is enabled.
+    """
+    return {
+        "statements": query_stats.top(limit, order_by),
+        "slowest_plans": query_stats.slowest_plans()
+    }
+
+
+@router.delete("/queries", status_code=status.HTTP_204_NO_CONTENT)
+async def reset_query_stats(operator: CachedUser = Depends(get_current_operator)):
+    """Reset the query statistics of this worker"""
+    query_stats.reset()
@@ -0,0 +1,80 @@
+"""
+Export Endpoint - Bulk download of readings for analysis
+"""
+from datetime import datetime, timezone
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from starlette.background import BackgroundTask
+from app.database import get_read_db
+from app.models.readings import SENSOR_MODELS
+from app.routers.readings import get_current_user
+from app.services.auth import CachedUser
+from app.services.derived import DERIVED_SERIES
+from app.services.export import BYTES_PER_ROW, ExportBusy, ExportUnavailable, count_rows, export_stream
+
+router = APIRouter(prefix="/export", tags=["Export"])
+
+_MEDIA_TYPES = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+
+@router.get("")
+def export_readings(
+    types: str = Query(default=",".join(SENSOR_MODELS), description="Comma separated sensor types or derived series"),
+    start: datetime = Query(..., description="Range start (inclusive), ISO 8601, naive = UTC"),
+    end: Optional[datetime] = Query(default=None, description="Range end (exclusive), default now"),
+    format: Literal["csv", "parquet"] = Query(default="csv", description="csv or parquet"),
+    device_id: Optional[str] = Query(default=None, description="Only readings from this device"),
+    db: Session = Depends(get_read_db),
+    current_user: CachedUser = Depends(get_current_user)
+):
+    """
+    Export readings of any time range as CSV or Parquet
+
+    One row per reading: `sensor_type, id, device_id, timestamp, value`,
+    ordered by timestamp within each sensor type. The body is streamed
+    while rows are read, so exports of months of data start right away
+    and use constant server memory. Parquet (zstd) is written one row
+    group per chunk and needs pyarrow on the server.
+
+    `X-Export-Rows` holds the number of rows and `X-Export-Size-Hint`
+    a rough size of the body in bytes.
+
+    Use this instead of paging months of data through the JSON readings
+    endpoints. Only a few exports run at once, otherwise 429 is returned.
+    """
+    requested = [name.strip() for name in types.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in SENSOR_MODELS and name not in DERIVED_SERIES]
+    if not requested or unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown types: {', '.join(unknown) or '(none given)'}")
+    end = end or datetime.utcnow()
+    if start.tzinfo is not None:
+        start = start.astimezone(timezone.utc).replace(tzinfo=None)
+    if end.tzinfo is not None:
+        end = end.astimezone(timezone.utc).replace(tzinfo=None)
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    requested = list(dict.fromkeys(requested))
+
+    rows = count_rows(db, requested, start, end, device_id)
+    # The stream reads on its own connection - do not keep this one for the whole download
+    db.rollback()
+    try:
+        body, release = export_stream(format, requested, start, end, device_id)
+    except ExportUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except ExportBusy:
+        raise HTTPException(status_code=429, detail="Too many exports running, try again later", headers={"Retry-After": "30"})
+
+    filename = f"brewery-{start:%Y%m%d}-{end:%Y%m%d}.{format}"
+    return StreamingResponse(
+        body,
+        media_type=_MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "X-Export-Rows": str(rows),
+            "X-Export-Size-Hint": str(rows * BYTES_PER_ROW[format]),
+        },
+        background=BackgroundTask(release)
+    )
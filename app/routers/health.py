@@ -1,33 +1,62 @@
 """
-Health Check Endpoint
+Health Check Endpoints
+
+Probes never touch the database themselves - the database status comes
+from a background probe running every HEALTH_PROBE_INTERVAL_SECONDS.
 """
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import text
-from app.database import get_db
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.middleware.inflight import ingestion_requests
+from app.services.health import database_probe, pool_stats
 
 router = APIRouter(tags=["Health"])
 
 
+@router.get("/health/live")
+async def liveness():
+    """Liveness probe - the process is up and serving requests (no I/O)"""
+    return {"status": "alive"}
+
+
+@router.get("/health/ready")
+async def readiness():
+    """
+    Readiness probe
+    
+    Returns 503 until the background probe has seen a healthy database.
+    
+    Returns:
+    - Database status from the last background probe
+    - Connection pool saturation
+    - Ingestion requests in flight
+    """
+    ready = database_probe.status == "healthy"
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "not_ready",
+            "database": database_probe.stats(),
+            "pool": pool_stats(),
+            "ingestion": ingestion_requests.stats()
+        },
+        headers={"Cache-Control": "no-store"}
+    )
+
+
 @router.get("/health")
-async def health_check(db: Session = Depends(get_db)):
+async def health_check():
     """
     Health check endpoint
     
     Returns:
     - API status
-    - Database connection status
-    """
-    try:
-        # Test database connection
-        db.execute(text("SELECT 1"))
-        db_status = "healthy"
-    except Exception:
-        db_status = "unhealthy"
+    - Database connection status (from the background probe)
     
+    Internal statistics of a worker are served to operators at
+    `/diagnostics/stats`.
+    """
     return {
         "status": "healthy",
         "service": "Smart Brewery IoT Server",
-        "database": db_status
+        "database": "healthy" if database_probe.status == "healthy" else "unhealthy"
     }
-
@@ -0,0 +1,46 @@
+"""
+Metrics Endpoint - Prometheus scrape target
+
+Only the scraper may read it: the metrics list route paths, worker and
+pool state and cache hit rates. Access needs the METRICS_TOKEN bearer
+token or a client address in METRICS_ALLOWED_IPS. Behind a reverse
+proxy the client address is the proxy's, so use the token there.
+"""
+import hmac
+import ipaddress
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from app.config import get_settings
+from app.services.metrics import render_metrics
+
+router = APIRouter(tags=["Metrics"])
+settings = get_settings()
+_allowed_networks = [
+    ipaddress.ip_network(network.strip(), strict=False)
+    for network in settings.METRICS_ALLOWED_IPS.split(",") if network.strip()
+]
+
+
+def _address_allowed(host) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in _allowed_networks)
+
+
+def require_scraper(request: Request) -> None:
+    """Dependency allowing the METRICS_TOKEN bearer token or an allowed client address"""
+    if settings.METRICS_TOKEN:
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        if scheme.lower() == "bearer" and hmac.compare_digest(token.encode(), settings.METRICS_TOKEN.encode()):
+            return
+    if request.client is not None and _address_allowed(request.client.host):
+        return
+    raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Metrics access denied")
+
+
+@router.get("/metrics", include_in_schema=False, dependencies=[Depends(require_scraper)])
+async def metrics():
+    """Prometheus metrics of all workers (text exposition format)"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
@@ -1,24 +1,28 @@
 """
 Readings Endpoints - Get sensor data
 """
-from datetime import datetime, timedelta
-from typing import List
+from datetime import datetime, timedelta, timezone
+from typing import List, Literal, Optional
 from fastapi import APIRouter, Depends, Query, HTTPException
 from fastapi.security import OAuth2PasswordBearer
+import numpy as np
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from app.database import get_db
-from app.services.auth import get_current_user_from_token
-from app.models.user import User
+from app.config import get_settings
+from app.database import ReadSessionLocal, get_read_db
+from app.services.auth import CachedUser, get_cached_user_from_token
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
-    """Dependency to get current authenticated user"""
+def get_current_user(token: str = Depends(oauth2_scheme)) -> CachedUser:
+    """Dependency to get current authenticated user (served from the user cache)"""
     from fastapi import HTTPException, status
-    user = get_current_user_from_token(token, db)
+    # Short-lived session: a cache miss must not keep a connection for the whole request
+    db = ReadSessionLocal()
+    try:
+        user = get_cached_user_from_token(token, db)
+    finally:
+        db.close()
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -26,105 +30,274 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     return user
-from app.models.readings import (
-    TemperatureReading,
-    PhReading,
-    WeightReading,
-    OutsideTemperatureReading,
-    HumidityReading,
-    PressureReading
-)
+from app.models.readings import SENSOR_MODELS, SENSOR_VALUE_COLUMNS
+from app.services.analytics import reading_stats
+from app.services.archive import archive_enabled, fetch_archived_after
+from app.services.derived import DERIVED_SERIES, fetch_derived
+from app.services.readings import fetch_readings, fetch_all_readings
+from app.services.resample import parse_step, resample
 from app.schemas.readings import (
     TemperatureReadingResponse,
     PhReadingResponse,
     WeightReadingResponse,
     OutsideTemperatureReadingResponse,
     HumidityReadingResponse,
-    PressureReadingResponse
+    PressureReadingResponse,
+    DerivedReadingResponse,
+    AllReadingsResponse,
+    ResampleResponse,
+    ReadingStatsResponse,
+    SyncResponse
 )
 
 router = APIRouter(prefix="/readings", tags=["Readings"])
+settings = get_settings()
 
 
 @router.get("/temperature", response_model=List[TemperatureReadingResponse])
-async def get_temperature_readings(
+def get_temperature_readings(
     days: int = Query(default=7, ge=1, le=365, description="Number of days to fetch"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    device_id: Optional[str] = Query(default=None, description="Only readings from this device"),
+    db: Session = Depends(get_read_db),
+    current_user: CachedUser = Depends(get_current_user)
 ):
     """Get temperature readings for the last N days"""
-    since = datetime.utcnow() - timedelta(days=days)
-    readings = db.query(TemperatureReading).filter(
-        TemperatureReading.timestamp >= since
-    ).order_by(TemperatureReading.timestamp.desc()).all()
-    return readings
+    return fetch_readings(db, "temperature", days, device_id)
 
 
 @router.get("/ph", response_model=List[PhReadingResponse])
-async def get_ph_readings(
+def get_ph_readings(
     days: int = Query(default=7, ge=1, le=365, description="Number of days to fetch"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    device_id: Optional[str] = Query(default=None, description="Only readings from this device"),
+    db: Session = Depends(get_read_db),
+    current_user: CachedUser = Depends(get_current_user)
 ):
     """Get pH readings for the last N days"""
-    since = datetime.utcnow() - timedelta(days=days)
-    readings = db.query(PhReading).filter(
-        PhReading.timestamp >= since
-    ).order_by(PhReading.timestamp.desc()).all()
-    return readings
+    return fetch_readings(db, "ph", days, device_id)
 
 
 @router.get("/weight", response_model=List[WeightReadingResponse])
-async def get_weight_readings(
+def get_weight_readings(
     days: int = Query(default=7, ge=1, le=365, description="Number of days to fetch"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    device_id: Optional[str] = Query(default=None, description="Only readings from this device"),
+    db: Session = Depends(get_read_db),
+    current_user: CachedUser = Depends(get_current_user)
 ):
     """Get weight readings for the last N days"""
-    since = datetime.utcnow() - timedelta(days=days)
-    readings = db.query(WeightReading).filter(
-        WeightReading.timestamp >= since
-    ).order_by(WeightReading.timestamp.desc()).all()
-    return readings
+    return fetch_readings(db, "weight", days, device_id)
 
 
 @router.get("/outsideTemp", response_model=List[OutsideTemperatureReadingResponse])
-async def get_outside_temperature_readings(
+def get_outside_temperature_readings(
     days: int = Query(default=7, ge=1, le=365, description="Number of days to fetch"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    device_id: Optional[str] = Query(default=None, description="Only readings from this device"),
+    db: Session = Depends(get_read_db),
+    current_user: CachedUser = Depends(get_current_user)
 ):
     """Get outside temperature readings for the last N days"""
-    since = datetime.utcnow() - timedelta(days=days)
-    readings = db.query(OutsideTemperatureReading).filter(
-        OutsideTemperatureReading.timestamp >= since
-    ).order_by(OutsideTemperatureReading.timestamp.desc()).all()
-    return readings
+    return fetch_readings(db, "outsideTemp", days, device_id)
 
 
 @router.get("/humidity", response_model=List[HumidityReadingResponse])
-async def get_humidity_readings(
+def get_humidity_readings(
     days: int = Query(default=7, ge=1, le=365, description="Number of days to fetch"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    device_id: Optional[str] = Query(default=None, description="Only readings from this device"),
+    db: Session = Depends(get_read_db),
+    current_user: CachedUser = Depends(get_current_user)
 ):
     """Get humidity readings for the last N days"""
-    since = datetime.utcnow() - timedelta(days=days)
-    readings = db.query(HumidityReading).filter(
-        HumidityReading.timestamp >= since
-    ).order_by(HumidityReading.timestamp.desc()).all()
-    return readings
+    return fetch_readings(db, "humidity", days, device_id)
 
 
 @router.get("/pressure", response_model=List[PressureReadingResponse])
-async def get_pressure_readings(
+def get_pressure_readings(
     days: int = Query(default=7, ge=1, le=365, description="Number of days to fetch"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    device_id: Optional[str] = Query(default=None, description="Only readings from this device"),
+    db: Session = Depends(get_read_db),
+    current_user: CachedUser = Depends(get_current_user)
 ):
     """Get pressure readings for the last N days"""
-    since = datetime.utcnow() - timedelta(days=days)
-    readings = db.query(PressureReading).filter(
-        PressureReading.timestamp >= since
-    ).order_by(PressureReading.timestamp.desc()).all()
-    return readings
+    return fetch_readings(db, "pressure", days, device_id)
+
+
+@router.get("/derived/{series}", response_model=List[DerivedReadingResponse])
+def get_derived_readings(
+    series: Literal["dew_point", "weight_loss_rate", "ph_drift"],
+    days: int = Query(default=7, ge=1, le=365, description="Number of days to fetch"),
+    device_id: Optional[str] = Query(default=None, description="Only values from this device"),
+    db: Session = Depends(get_read_db),
+    current_user: CachedUser = Depends(get_current_user)
+):
+    """
+    Get a derived series for the last N days
+    
+    Computed on the server as readings arrive, at most one value per minute:
+    - **dew_point**: °C, from temperature and humidity
+    - **weight_loss_rate**: kg per hour over the last hour, positive while
+      the fermenter loses weight (fermentation activity)
+    - **ph_drift**: pH change per hour over the last hour
+    """
+    return fetch_derived(db, series, days, device_id)
+
+
+@router.get("/resample", response_model=ResampleResponse)
+def resample_readings(
+    types: str = Query(..., description="Comma separated sensor types or derived series, e.g. temperature,ph,weight"),
+    step: str = Query(default="5m", description="Grid step: 30s, 5m, 1h, 1d..."),
+    fill: Literal["linear", "ffill", "none"] = Query(default="linear", description="How to fill empty buckets"),
+    days: int = Query(default=1, ge=1, le=365, description="Number of days to fetch"),
+    device_id: Optional[str] = Query(default=None, description="Only readings from this device"),
+    db: Session = Depends(get_read_db),
+    current_user: CachedUser = Depends(get_current_user)
+):
+    """
+    Get several series aligned on one time grid
+    
+    Each series is averaged into `step` buckets; empty buckets between
+    two measured ones are interpolated (`linear`), carry the previous
+    value (`ffill`) or stay null (`none`). Buckets before the first or
+    after the last measurement are always null.
+    
+    Readings of all devices are averaged together unless `device_id` is given.
+    """
+    requested = [name.strip() for name in types.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in SENSOR_MODELS and name not in DERIVED_SERIES]
+    if not requested or unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown types: {', '.join(unknown) or '(none given)'}")
+    try:
+        step_seconds = parse_step(step)
+        grid, columns = resample(db, list(dict.fromkeys(requested)), step_seconds, days, fill, device_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {
+        "step_seconds": step_seconds,
+        "fill": fill,
+        "timestamps": [datetime.fromtimestamp(t, timezone.utc) for t in grid.tolist()],
+        "series": {
+            name: np.where(np.isnan(values), None, np.round(values, 4)).tolist()
+            for name, values in columns.items()
+        }
+    }
+
+
+@router.get("/{sensor_type}/stats", response_model=ReadingStatsResponse)
+def get_reading_stats(
+    sensor_type: Literal["temperature", "ph", "weight", "outsideTemp", "humidity", "pressure"],
+    days: int = Query(default=7, ge=1, le=3650, description="Number of days to aggregate"),
+    bucket: Optional[Literal["hour", "day", "week"]] = Query(default=None, description="Also aggregate per bucket (UTC)"),
+    device_id: Optional[str] = Query(default=None, description="Only readings from this device"),
+    db: Session = Depends(get_read_db),
+    current_user: CachedUser = Depends(get_current_user)
+):
+    """
+    Get statistics of a sensor for the last N days
+    
+    Count, min, max, mean, standard deviation, 5th/50th/95th percentile
+    and first/last timestamp, optionally also per hour, day or week.
+    Archived readings are included.
+    
+    Windows longer than `ANALYTICS_MIN_DAYS` run on the embedded
+    analytics engine when it is enabled (`engine: "duckdb"`), otherwise
+    on the database (`engine: "sql"`). Both return the same fields.
+    """
+    return reading_stats(db, sensor_type, days, device_id, bucket)
+
+
+@router.get("/all", response_model=AllReadingsResponse)
+async def get_all_readings(
+    days: int = Query(default=7, ge=1, le=365, description="Number of days to fetch"),
+    device_id: Optional[str] = Query(default=None, description="Only readings from this device"),
+    current_user: CachedUser = Depends(get_current_user)
+):
+    """
+    Get readings of all sensor types for the last N days in one response
+    
+    The six tables are queried concurrently, each on its own pooled connection.
+    """
+    return await fetch_all_readings(days, device_id)
+
+
+def _parse_sync_cursor(cursor: str) -> List[int]:
+    """Parse a sync cursor - one high-water id per sensor type, dot separated"""
+    try:
+        ids = [int(part) for part in cursor.split(".")]
+    except ValueError:
+        ids = []
+    if len(ids) != len(SENSOR_MODELS) or any(i < 0 for i in ids):
+        raise HTTPException(status_code=400, detail="Invalid sync cursor")
+    return ids
+
+
+def _merge_archived(rows: List, archived: List, limit: int) -> List:
+    """Hot and archived sync rows by id, archived rows still in the table dropped"""
+    if not archived:
+        return rows
+    hot_ids = {row[0] for row in rows}
+    merged = list(rows) + [row for row in archived if row[0] not in hot_ids]
+    merged.sort(key=lambda row: row[0])
+    return merged[:limit]
+
+
+@router.get("/sync", response_model=SyncResponse)
+def sync_readings(
+    since: Optional[str] = Query(default=None, description="Cursor returned by the previous sync"),
+    days: int = Query(default=7, ge=1, le=365, description="Initial window when no cursor is given"),
+    limit: int = Query(default=1000, ge=1, le=10000, description="Max rows per sensor type"),
+    device_id: Optional[str] = Query(default=None, description="Only readings from this device"),
+    db: Session = Depends(get_read_db),
+    current_user: CachedUser = Depends(get_current_user)
+):
+    """
+    Get readings added after the given cursor, for all sensor types at once
+
+    Without a cursor returns the last N days. Pass the returned `cursor`
+    as `since` on the next call; when `has_more` is true, call again
+    right away to fetch the rest. Archived readings are included.
+    """
+    high_water = _parse_sync_cursor(since) if since else None
+    window_start = datetime.utcnow() - timedelta(days=days)
+
+    readings = {}
+    next_cursor = []
+    has_more = False
+    for index, (sensor_type, model) in enumerate(SENSOR_MODELS.items()):
+        value_column = getattr(model, SENSOR_VALUE_COLUMNS[sensor_type])
+        query = db.query(model.id, model.device_id, value_column, model.timestamp)
+        if high_water is not None:
+            query = query.filter(model.id > high_water[index])
+        else:
+            query = query.filter(model.timestamp >= window_start)
+        if device_id:
+            query = query.filter(model.device_id == device_id)
+        rows = query.order_by(model.id).limit(limit + 1).all()
+        if archive_enabled() and (high_water is not None or days >= settings.ARCHIVE_AFTER_DAYS):
+            rows = _merge_archived(rows, fetch_archived_after(
+                sensor_type,
+                high_water[index] if high_water is not None else 0,
+                limit + 1,
+                since=window_start if high_water is None else None,
+                device_id=device_id
+            ), limit + 1)
+
+        if len(rows) > limit:
+            rows = rows[:limit]
+            has_more = True
+
+        readings[sensor_type] = [
+            {"id": row[0], "device_id": row[1], "value": row[2], "timestamp": row[3]}
+            for row in rows
+        ]
+        if rows:
+            next_cursor.append(rows[-1][0])
+        elif high_water is not None:
+            next_cursor.append(high_water[index])
+        else:
+            # Nothing in the window - start from the current end of the table
+            next_cursor.append(db.query(func.max(model.id)).scalar() or 0)
+
+    return {
+        "cursor": ".".join(str(i) for i in next_cursor),
+        "has_more": has_more,
+        "readings": readings
+    }
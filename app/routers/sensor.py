@@ -1,10 +1,19 @@
 """
 Sensor Data Endpoint - For Raspberry Pi
 """
-from fastapi import APIRouter, HTTPException, Depends
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Header
 from sqlalchemy.orm import Session
+from app.config import get_settings
 from app.database import get_db
-from app.schemas.readings import SensorDataCreate
+from app.schemas.readings import SensorDataCreate, SensorBatchCreate
+from app.services.alerts import alert_engine
+from app.services.derived import store_derived
+from app.services.devices import record_reading
+from app.services.device_auth import device_key_cache
+from app.services.ingest import DuplicateBatch, store_batch
+from app.services.metrics import SENSOR_READINGS
 from app.models.readings import (
     TemperatureReading,
     PhReading,
@@ -15,12 +24,29 @@ from app.models.readings import (
 )
 
 router = APIRouter(prefix="/sensor", tags=["Sensor Data"])
+settings = get_settings()
+
+
+def check_device_key(device_id: str, device_key: Optional[str]) -> None:
+    """
+    Verify the device API key against the in-memory key cache
+
+    A device with a registered key always has to send it.
+    DEVICE_AUTH_REQUIRED decides about devices without a key.
+    """
+    if device_key is None:
+        if settings.DEVICE_AUTH_REQUIRED or device_key_cache.has_key(device_id):
+            raise HTTPException(status_code=401, detail="Missing X-Device-Key header")
+        return
+    if not device_key_cache.verify(device_id, device_key):
+        raise HTTPException(status_code=401, detail="Invalid device key")
 
 
 @router.post("/data")
-async def receive_sensor_data(
+def receive_sensor_data(
     data: SensorDataCreate,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    x_device_key: Optional[str] = Header(default=None, description="Device API key")
 ):
     """
     Receive sensor data from Raspberry Pi via curl
@@ -37,12 +63,17 @@ async def receive_sensor_data(
     ```bash
     curl -X POST https://your-api.com/sensor/data \\
       -H "Content-Type: application/json" \\
+      -H "X-Device-Key: dk_..." \\
       -d '{"type": "temperature", "value": 22.5, "device_id": "raspberry-pi-brewery"}'
     ```
+    
+    The `X-Device-Key` header is required for devices with a registered
+    key, and for all devices when `DEVICE_AUTH_REQUIRED` is set.
     """
+    device_id = data.device_id or "raspberry-pi-brewery"
+    check_device_key(device_id, x_device_key)
+    
     try:
-        device_id = data.device_id or "raspberry-pi-brewery"
-        
         if data.type == "temperature":
             reading = TemperatureReading(
                 device_id=device_id,
@@ -79,19 +110,76 @@ async def receive_sensor_data(
                 detail=f"Unknown sensor type: {data.type}"
             )
         
+        timestamp = reading.timestamp = datetime.utcnow()
         db.add(reading)
+        db.flush()
+        reading_id = reading.id
+        record_reading(db, device_id, data.type, last_seen=timestamp)
+        store_derived(db, device_id, [(data.type, data.value, timestamp)])
+        # No refresh after commit - the connection goes straight back to the pool
         db.commit()
-        db.refresh(reading)
-        
-        return {
-            "status": "success",
-            "message": f"{data.type} data stored successfully",
-            "id": reading.id
-        }
+        SENSOR_READINGS.labels(data.type).inc()
     except Exception as e:
         db.rollback()
         raise HTTPException(
             status_code=500,
             detail=f"Failed to store sensor data: {str(e)}"
         )
+    
+    alert_engine.observe(device_id, data.type, data.value, timestamp)
+    return {
+        "status": "success",
+        "message": f"{data.type} data stored successfully",
+        "id": reading_id
+    }
 
+
+@router.post("/batch")
+def receive_sensor_batch(
+    data: SensorBatchCreate,
+    db: Session = Depends(get_db),
+    x_device_key: Optional[str] = Header(default=None, description="Device API key")
+):
+    """
+    Receive a batch of readings (up to 5000) from one device
+    
+    Used by the Raspberry Pi client (`raspberry_pi/brewery_client`) to
+    upload its local spool. Each reading may carry the `timestamp` it was
+    measured at. The body may be gzip-compressed (`Content-Encoding: gzip`).
+    
+    Send a `batch_id` to make retries safe: a batch already stored for
+    the device is acknowledged with `"duplicate": true` and not stored again.
+    
+    **Example:**
+    ```json
+    {
+      "device_id": "raspberry-pi-brewery",
+      "batch_id": "3f2a9c-1-500",
+      "readings": [
+        {"type": "temperature", "value": 22.5, "timestamp": "2024-05-01T12:00:00Z"},
+        {"type": "ph", "value": 4.4}
+      ]
+    }
+    ```
+    """
+    check_device_key(data.device_id, x_device_key)
+    
+    try:
+        counts = store_batch(db, data.device_id, data.readings, data.batch_id)
+        db.commit()
+    except DuplicateBatch:
+        db.rollback()
+        return {"status": "success", "stored": 0, "duplicate": True}
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to store sensor batch: {str(e)}"
+        )
+    
+    for sensor_type, count in counts.items():
+        SENSOR_READINGS.labels(sensor_type).inc(count)
+    alert_engine.observe_many(
+        data.device_id, [(reading.type, reading.value, reading.timestamp) for reading in data.readings]
+    )
+    return {"status": "success", "stored": sum(counts.values()), "duplicate": False}
@@ -1,4 +1,5 @@
-from app.schemas.user import UserCreate, UserLogin, UserResponse, UserUpdate, Token
+from app.schemas.user import UserCreate, UserLogin, UserResponse, UserUpdate, Token, RefreshTokenRequest
+from app.schemas.device import DeviceSensorSummary, DeviceResponse, DeviceKeyResponse
 from app.schemas.readings import (
     TemperatureReadingResponse,
     PhReadingResponse,
@@ -6,16 +7,35 @@ from app.schemas.readings import (
     OutsideTemperatureReadingResponse,
     HumidityReadingResponse,
     PressureReadingResponse,
-    SensorDataCreate
+    DerivedReadingResponse,
+    SensorDataCreate,
+    BatchReading,
+    SensorBatchCreate,
+    AllReadingsResponse,
+    ResampleResponse,
+    StatsBucket,
+    ReadingStatsResponse,
+    SyncReading,
+    SyncResponse
 )
 
 __all__ = [
-    "UserCreate", "UserLogin", "UserResponse", "UserUpdate", "Token",
+    "UserCreate", "UserLogin", "UserResponse", "UserUpdate", "Token", "RefreshTokenRequest",
+    "DeviceSensorSummary", "DeviceResponse", "DeviceKeyResponse",
     "TemperatureReadingResponse",
     "PhReadingResponse",
     "WeightReadingResponse",
     "OutsideTemperatureReadingResponse",
     "HumidityReadingResponse",
     "PressureReadingResponse",
-    "SensorDataCreate"
+    "DerivedReadingResponse",
+    "SensorDataCreate",
+    "BatchReading",
+    "SensorBatchCreate",
+    "AllReadingsResponse",
+    "ResampleResponse",
+    "StatsBucket",
+    "ReadingStatsResponse",
+    "SyncReading",
+    "SyncResponse"
 ]
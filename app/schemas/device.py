@@ -0,0 +1,26 @@
+"""
+Device Schemas
+"""
+from pydantic import BaseModel
+from datetime import datetime
+from typing import List, Optional
+
+
+class DeviceSensorSummary(BaseModel):
+    """Summary of one sensor type reported by a device"""
+    sensor_type: str
+    first_seen: Optional[datetime]
+    last_seen: Optional[datetime]
+    reading_count: int
+
+
+class DeviceResponse(BaseModel):
+    """Device with its sensors"""
+    device_id: str
+    sensors: List[DeviceSensorSummary]
+
+
+class DeviceKeyResponse(BaseModel):
+    """Newly created device API key - shown only once"""
+    device_id: str
+    api_key: str
@@ -3,7 +3,7 @@ Sensor Reading Schemas
 """
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Literal
+from typing import Dict, List, Literal, Optional
 
 
 # Request schemas
@@ -14,6 +14,22 @@ class SensorDataCreate(BaseModel):
     device_id: str = Field(default="raspberry-pi-brewery", description="Device identifier")
 
 
+class BatchReading(BaseModel):
+    """One reading of a batch upload"""
+    type: Literal["temperature", "ph", "weight", "outsideTemp", "humidity", "pressure"]
+    value: float = Field(..., description="Sensor value")
+    timestamp: Optional[datetime] = Field(default=None, description="When it was measured (UTC), default now")
+
+
+class SensorBatchCreate(BaseModel):
+    """Schema for a batch of readings from one device (spooled uploads)"""
+    device_id: str = Field(default="raspberry-pi-brewery", description="Device identifier")
+    batch_id: Optional[str] = Field(
+        default=None, max_length=100, description="Client batch id - retries of a stored batch are skipped"
+    )
+    readings: List[BatchReading] = Field(..., min_length=1, max_length=5000)
+
+
 # Response schemas
 class TemperatureReadingResponse(BaseModel):
     """Temperature reading response"""
@@ -79,3 +95,78 @@ class PressureReadingResponse(BaseModel):
     
     class Config:
         from_attributes = True
+
+
+class DerivedReadingResponse(BaseModel):
+    """Derived series value response"""
+    id: int
+    device_id: str
+    series: str
+    value: float
+    timestamp: datetime
+    
+    class Config:
+        from_attributes = True
+
+
+class ResampleResponse(BaseModel):
+    """Series aligned on one time grid - values[i] belongs to timestamps[i], null = no data"""
+    step_seconds: int
+    fill: str
+    timestamps: List[datetime]
+    series: Dict[str, List[Optional[float]]]
+
+
+class StatsBucket(BaseModel):
+    """Aggregates of one time bucket"""
+    start: datetime
+    count: int
+    mean: Optional[float]
+    min: Optional[float]
+    max: Optional[float]
+
+
+class ReadingStatsResponse(BaseModel):
+    """Statistics of one sensor over a window"""
+    sensor_type: str
+    days: int
+    device_id: Optional[str]
+    engine: str
+    count: int
+    min: Optional[float]
+    max: Optional[float]
+    mean: Optional[float]
+    std: Optional[float]
+    p05: Optional[float]
+    p50: Optional[float]
+    p95: Optional[float]
+    first: Optional[datetime]
+    last: Optional[datetime]
+    bucket: Optional[str]
+    buckets: Optional[List[StatsBucket]] = None
+    snapshot_age_seconds: Optional[int] = None
+
+
+class SyncReading(BaseModel):
+    """Compact reading used by the delta-sync endpoint"""
+    id: int
+    device_id: str
+    value: float
+    timestamp: datetime
+
+
+class SyncResponse(BaseModel):
+    """Delta-sync response - new rows per sensor type and the next cursor"""
+    cursor: str
+    has_more: bool
+    readings: Dict[str, List[SyncReading]]
+
+
+class AllReadingsResponse(BaseModel):
+    """Readings of all sensor types"""
+    temperature: List[TemperatureReadingResponse]
+    ph: List[PhReadingResponse]
+    weight: List[WeightReadingResponse]
+    outsideTemp: List[OutsideTemperatureReadingResponse]
+    humidity: List[HumidityReadingResponse]
+    pressure: List[PressureReadingResponse]
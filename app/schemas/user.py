@@ -45,4 +45,10 @@ class Token(BaseModel):
     """Schema for JWT token"""
     access_token: str
     token_type: str = "bearer"
+    refresh_token: Optional[str] = None
+
+
+class RefreshTokenRequest(BaseModel):
+    """Schema for refreshing or revoking a refresh token"""
+    refresh_token: str
 
@@ -0,0 +1,379 @@
+"""
+Alert Engine - Threshold and anomaly rules evaluated on ingestion
+
+Every stored reading is checked against the rules of its sensor type
+right away, so an excursion is reported within one sample. Detection
+never queries history: running statistics per (sensor_type, device_id)
+are updated in O(1) per reading - Welford's algorithm for the long-run
+mean/std and an exponentially weighted mean/variance (EWMA) as the
+rolling baseline for z-scores.
+
+Rules (ALERT_RULES, comma separated):
+- `temperature>24`, `temperature<16` - fixed thresholds
+- `temperature:rate>0.5` - change faster than 0.5 units per minute
+  (measured over at least 5 seconds)
+- `ph:zscore>4` - more than 4 rolling standard deviations from the EWMA
+
+An alert is sent when a rule starts firing, repeated at most every
+ALERT_COOLDOWN_SECONDS while it keeps firing, and a "resolved" event
+follows once the reading is back to normal. Alerts are logged through
+the `app.alerts` logger; sinks (JSON-lines file, webhook) are handlers
+of that logger, so delivery happens on the log writer thread and never
+in the request.
+
+Statistics live in each worker - with several workers a device's
+readings are split between them, so z-score and rate baselines are per
+worker. Dedup and cool-down are shared: a worker only sends an event
+after claiming it in `alert_states` (one row per rule and device,
+updated atomically), so an excursion seen by several workers is sent
+once, and "resolved" once.
+"""
+import json
+import logging
+import math
+import re
+import threading
+import time
+import urllib.request
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from sqlalchemy import or_, select, update
+from sqlalchemy.exc import IntegrityError
+from app.database import SessionLocal
+from app.logging_config import add_log_pipeline
+from app.models.alert import AlertState
+from app.services.metrics import ALERTS_FIRED
+
+logger = logging.getLogger(__name__)
+alert_logger = logging.getLogger("app.alerts")
+
+# Rates are measured against a reading at least this old, so jitter between
+# readings a few milliseconds apart does not look like a steep change
+_MIN_RATE_INTERVAL_SECONDS = 5
+
+_RULE_PATTERN = re.compile(r"^(?P<sensor>\w+)(?::(?P<kind>rate|zscore))?\s*(?P<op>[<>])\s*(?P<limit>-?\d+(?:\.\d+)?)$")
+
+
+class AlertRule(NamedTuple):
+    sensor_type: str
+    kind: str  # "above", "below", "rate" or "zscore"
+    limit: float
+
+    @property
+    def name(self) -> str:
+        return f"{self.sensor_type}:{self.kind}:{self.limit:g}"
+
+
+def parse_alert_rules(spec: str) -> List[AlertRule]:
+    """Parse ALERT_RULES, e.g. "temperature>24,temperature:rate>0.5,ph:zscore>4" """
+    rules = []
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        match = _RULE_PATTERN.match(entry)
+        if match is None:
+            raise ValueError(f"Invalid alert rule {entry!r}")
+        kind = match["kind"]
+        if kind is None:
+            kind = "above" if match["op"] == ">" else "below"
+        elif match["op"] != ">":
+            raise ValueError(f"Invalid alert rule {entry!r}: {kind} rules only support '>'")
+        rules.append(AlertRule(match["sensor"], kind, float(match["limit"])))
+    return rules
+
+
+class RunningStats:
+    """O(1) running statistics of one sensor series"""
+
+    __slots__ = ("alpha", "count", "mean", "m2", "ewma", "ewm_var", "last_value", "last_time")
+
+    def __init__(self, alpha: float):
+        self.alpha = alpha
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.ewma = 0.0
+        self.ewm_var = 0.0
+        self.last_value = None
+        self.last_time = None
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def zscore(self, value: float) -> Optional[float]:
+        """Distance from the EWMA in rolling standard deviations"""
+        if self.ewm_var <= 0:
+            return None
+        return (value - self.ewma) / math.sqrt(self.ewm_var)
+
+    def rate(self, value: float, timestamp: float) -> Optional[float]:
+        """Change per minute since the reference reading"""
+        if self.last_time is None or timestamp - self.last_time < _MIN_RATE_INTERVAL_SECONDS:
+            return None
+        return (value - self.last_value) / ((timestamp - self.last_time) / 60)
+
+    def update(self, value: float, timestamp: float) -> None:
+        # Welford
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        # EWMA mean and variance
+        if self.count == 1:
+            self.ewma = value
+        else:
+            diff = value - self.ewma
+            increment = self.alpha * diff
+            self.ewma += increment
+            self.ewm_var = (1 - self.alpha) * (self.ewm_var + diff * increment)
+        if self.last_time is None or timestamp - self.last_time >= _MIN_RATE_INTERVAL_SECONDS:
+            self.last_value = value
+            self.last_time = timestamp
+
+
+def _epoch(timestamp) -> float:
+    if timestamp is None:
+        return time.time()
+    if isinstance(timestamp, datetime):
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        return timestamp.timestamp()
+    return float(timestamp)
+
+
+class AlertEngine:
+    """Evaluates alert rules against running statistics, with dedup and cool-down"""
+
+    def __init__(
+        self,
+        rules: List[AlertRule] = (),
+        cooldown_seconds: float = 900,
+        ewma_alpha: float = 0.1,
+        zscore_min_samples: int = 30,
+        emit: Callable[[dict], None] = None,
+        claim: Callable[[str, str, str, float, float], bool] = None
+    ):
+        self.configure(rules, cooldown_seconds, ewma_alpha, zscore_min_samples)
+        self.emit = emit or _log_alert
+        # claim(state, rule name, device_id, now, cooldown) -> True when this process should send the event
+        self.claim = claim
+        self._lock = threading.Lock()
+        self._stats: Dict[Tuple[str, str], RunningStats] = {}
+        # (rule name, device_id) -> Unix time the alert was last seen firing by this worker
+        self._active: Dict[Tuple[str, str], float] = {}
+
+    def configure(
+        self,
+        rules: List[AlertRule],
+        cooldown_seconds: float,
+        ewma_alpha: float,
+        zscore_min_samples: int
+    ) -> None:
+        self.rules_by_type: Dict[str, List[AlertRule]] = {}
+        for rule in rules:
+            self.rules_by_type.setdefault(rule.sensor_type, []).append(rule)
+        self.cooldown_seconds = cooldown_seconds
+        self.ewma_alpha = ewma_alpha
+        self.zscore_min_samples = zscore_min_samples
+
+    def _check(self, rule: AlertRule, stats: RunningStats, value: float, timestamp: float) -> Optional[float]:
+        """The observed quantity when the rule fires, else None"""
+        if rule.kind == "above":
+            return value if value > rule.limit else None
+        if rule.kind == "below":
+            return value if value < rule.limit else None
+        if rule.kind == "rate":
+            rate = stats.rate(value, timestamp)
+            return rate if rate is not None and abs(rate) > rule.limit else None
+        if stats.count < self.zscore_min_samples:
+            return None
+        z = stats.zscore(value)
+        return z if z is not None and abs(z) > rule.limit else None
+
+    def observe(self, device_id: str, sensor_type: str, value: float, timestamp=None) -> List[dict]:
+        """Evaluate one reading (timestamp: datetime, naive = UTC, or Unix time; default now)"""
+        return self.observe_many(device_id, [(sensor_type, value, timestamp)])
+
+    def observe_many(self, device_id: str, readings: Iterable[tuple]) -> List[dict]:
+        """Evaluate (sensor_type, value, timestamp) readings of one device, oldest first"""
+        if not self.rules_by_type:
+            return []
+        readings = sorted(
+            ((sensor_type, value, _epoch(timestamp)) for sensor_type, value, timestamp in readings
+             if sensor_type in self.rules_by_type),
+            key=lambda reading: reading[2]
+        )
+        events = []
+        with self._lock:
+            for sensor_type, value, timestamp in readings:
+                rules = self.rules_by_type[sensor_type]
+                stats = self._stats.get((sensor_type, device_id))
+                if stats is None:
+                    stats = self._stats[(sensor_type, device_id)] = RunningStats(self.ewma_alpha)
+                for rule in rules:
+                    # Checked before the update, so an outlier is not part of its own baseline
+                    observed = self._check(rule, stats, value, timestamp)
+                    event = self._transition(rule, device_id, observed)
+                    if event is not None:
+                        events.append(self._event(event, rule, device_id, value, timestamp, observed, stats))
+                stats.update(value, timestamp)
+        if self.claim is not None:
+            # Outside the lock - claiming talks to the database
+            events = [
+                event for event in events
+                if self.claim(event["state"], event["rule"], device_id, time.time(), self.cooldown_seconds)
+            ]
+        for event in events:
+            if event["state"] == "firing":
+                ALERTS_FIRED.labels(event["sensor_type"], event["kind"]).inc()
+            self.emit(event)
+        return events
+
+    def _transition(self, rule: AlertRule, device_id: str, observed: Optional[float]) -> Optional[str]:
+        key = (rule.name, device_id)
+        sent_at = self._active.get(key)
+        if observed is None:
+            if sent_at is None:
+                return None
+            del self._active[key]
+            return "resolved"
+        now = time.time()
+        if sent_at is not None and now - sent_at < self.cooldown_seconds:
+            return None
+        self._active[key] = now
+        return "firing"
+
+    @staticmethod
+    def _event(
+        state: str,
+        rule: AlertRule,
+        device_id: str,
+        value: float,
+        timestamp: float,
+        observed: Optional[float],
+        stats: RunningStats
+    ) -> dict:
+        return {
+            "state": state,
+            "rule": rule.name,
+            "sensor_type": rule.sensor_type,
+            "kind": rule.kind,
+            "limit": rule.limit,
+            "device_id": device_id,
+            "value": value,
+            "observed": observed,
+            "timestamp": datetime.fromtimestamp(timestamp, timezone.utc).isoformat(),
+            "mean": round(stats.mean, 4),
+            "std": round(stats.std, 4),
+            "ewma": round(stats.ewma, 4),
+        }
+
+    def stats(self) -> dict:
+        return {"series": len(self._stats), "active": len(self._active)}
+
+
+def claim_in_database(state: str, rule: str, device_id: str, now: float, cooldown_seconds: float) -> bool:
+    """
+    Record an alert transition in alert_states, True when this worker won it
+
+    "firing" is won when the alert was not firing or its cool-down is
+    over, "resolved" when it was firing. Without the database the event
+    is sent anyway - a duplicate alert beats a lost one.
+    """
+    key = (AlertState.rule == rule, AlertState.device_id == device_id)
+    db = SessionLocal()
+    try:
+        if state == "firing":
+            won = db.execute(
+                update(AlertState)
+                .where(*key, or_(AlertState.firing.is_(False), AlertState.sent_at <= now - cooldown_seconds))
+                .values(firing=True, sent_at=now)
+            ).rowcount > 0
+            if not won and db.execute(select(AlertState.id).where(*key)).first() is None:
+                try:
+                    with db.begin_nested():
+                        db.add(AlertState(rule=rule, device_id=device_id, firing=True, sent_at=now))
+                    won = True
+                except IntegrityError:
+                    # Another worker inserted the row in the meantime
+                    pass
+        else:
+            won = db.execute(
+                update(AlertState).where(*key, AlertState.firing.is_(True)).values(firing=False, sent_at=now)
+            ).rowcount > 0
+        db.commit()
+        return won
+    except Exception:
+        db.rollback()
+        logger.exception("Could not record alert state")
+        return True
+    finally:
+        db.close()
+
+
+def _log_alert(event: dict) -> None:
+    level = logging.WARNING if event["state"] == "firing" else logging.INFO
+    alert_logger.log(
+        level,
+        "Alert %s %s on %s: value %s",
+        event["rule"], event["state"], event["device_id"], event["value"],
+        extra={"alert": event}
+    )
+
+
+class AlertFormatter(logging.Formatter):
+    """The alert event of a record as one JSON line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(getattr(record, "alert", {"message": record.getMessage()}))
+
+
+class WebhookHandler(logging.Handler):
+    """POSTs alert events as JSON to a webhook (runs on the log writer thread)"""
+
+    def __init__(self, url: str, timeout: float = 5.0):
+        super().__init__()
+        self.url = url
+        self.timeout = timeout
+        self.setFormatter(AlertFormatter())
+
+    def emit(self, record: logging.LogRecord) -> None:
+        request = urllib.request.Request(
+            self.url,
+            data=self.format(record).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+        except Exception as e:
+            logger.error("Alert webhook failed: %s", e)
+
+
+alert_engine = AlertEngine()
+
+
+def setup_alerts(
+    rules: str,
+    cooldown_seconds: float,
+    ewma_alpha: float,
+    zscore_min_samples: int,
+    file_path: str = "",
+    webhook_url: str = ""
+) -> None:
+    """Configure the rules and attach the file / webhook sinks"""
+    alert_engine.configure(parse_alert_rules(rules), cooldown_seconds, ewma_alpha, zscore_min_samples)
+    alert_engine.claim = claim_in_database
+    handlers = []
+    if file_path:
+        handler = logging.FileHandler(file_path, encoding="utf-8")
+        handler.setFormatter(AlertFormatter())
+        handlers.append(handler)
+    if webhook_url:
+        handlers.append(WebhookHandler(webhook_url))
+    if handlers:
+        add_log_pipeline(alert_logger, handlers, queue_size=1000)
+    alert_logger.setLevel(logging.INFO)
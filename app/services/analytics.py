@@ -0,0 +1,340 @@
+"""
+Analytics Service - Long-range aggregations on an embedded columnar engine
+
+Statistics over long windows (`/readings/{sensor_type}/stats` with more
+than ANALYTICS_MIN_DAYS) run in DuckDB instead of scanning the row-store
+tables. DuckDB reads:
+
+- a Parquet snapshot of each reading table, extended every
+  ANALYTICS_REFRESH_SECONDS by one worker
+  (ANALYTICS_DIR/<sensor>/part-<first id>-<last id>.parquet)
+- the archive part files (see app.services.archive)
+- the rows added since the snapshot, fetched by id from the table
+
+A refresh only appends the rows with an id above the snapshot's, read
+with a primary key range scan. Once a table has _COMPACT_PARTS parts,
+its snapshot is rebuilt from the table into a single part. Readers
+ignore parts inside the id range of another part, so the old parts can
+be deleted after the rebuilt one is in place.
+
+so results are as fresh as the table itself. Shorter windows, or a
+server without duckdb / a snapshot, use the SQL + NumPy path, which
+returns the same fields. duckdb and pyarrow are optional and imported
+on first use.
+"""
+import logging
+import math
+import os
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.config import get_settings
+from app.database import ReadSessionLocal
+from app.models.readings import SENSOR_MODELS, SENSOR_VALUE_COLUMNS
+from app.services.archive import archive_files, directory_lock, reading_schema
+from app.services.resample import series_arrays
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Snapshot parts of one table before they are rebuilt into one
+_COMPACT_PARTS = 48
+_PART_NAME = re.compile(r"^part-(\d+)-(\d+)\.parquet$")
+
+# Bucket -> (seconds, offset); weeks start on Monday (the epoch was a Thursday)
+BUCKETS = {"hour": (3600, 0), "day": (86400, 0), "week": (604800, 4 * 86400)}
+PERCENTILES = (5, 50, 95)
+
+
+def analytics_available() -> bool:
+    if not settings.ANALYTICS_DIR:
+        return False
+    try:
+        import duckdb  # noqa: F401
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _snapshot_dir(sensor_type: str) -> str:
+    return os.path.join(settings.ANALYTICS_DIR, sensor_type)
+
+
+def _snapshot_parts(sensor_type: str) -> List[Tuple[int, int, str]]:
+    """(first id, last id, path) of the current snapshot parts, ascending ids"""
+    directory = _snapshot_dir(sensor_type)
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    ranges = []
+    for name in names:
+        match = _PART_NAME.match(name)
+        if match:
+            ranges.append((int(match[1]), int(match[2]), os.path.join(directory, name)))
+    # A rebuilt part replaces the parts inside its id range, until they are deleted
+    ranges.sort(key=lambda part: (part[0], -part[1]))
+    parts = []
+    for first, last, path in ranges:
+        if parts and last <= parts[-1][1]:
+            continue
+        parts.append((first, last, path))
+    return parts
+
+
+def _utc(timestamp: datetime) -> datetime:
+    if timestamp.tzinfo is None:
+        return timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.astimezone(timezone.utc)
+
+
+def _arrow_table(rows: List):
+    """(id, device_id, timestamp, value) rows as an Arrow table"""
+    import pyarrow as pa
+
+    schema = reading_schema()
+    ids, devices, timestamps, values = zip(*rows) if rows else ((), (), (), ())
+    return pa.Table.from_arrays(
+        [
+            pa.array(ids, pa.int64()),
+            pa.array(devices, pa.string()),
+            pa.array([_utc(timestamp) for timestamp in timestamps], schema.field("timestamp").type),
+            pa.array(values, pa.float64()),
+        ],
+        schema=schema
+    )
+
+
+# Snapshot
+
+def _write_part(sensor_type: str, after_id: Optional[int]) -> int:
+    """Snapshot the rows with an id above after_id (all rows when None) as a new part"""
+    import pyarrow.parquet as pq
+
+    model = SENSOR_MODELS[sensor_type]
+    value_column = getattr(model, SENSOR_VALUE_COLUMNS[sensor_type])
+    directory = _snapshot_dir(sensor_type)
+    os.makedirs(directory, exist_ok=True)
+    temporary = os.path.join(directory, f".part.{os.getpid()}.tmp")
+    query = select(model.id, model.device_id, model.timestamp, value_column)
+    if after_id is None:
+        query = query.order_by(model.timestamp, model.id)
+    else:
+        # Primary key range scan - new rows are also the newest, so the part stays time ordered
+        query = query.where(model.id > after_id).order_by(model.id)
+    rows, first, last = 0, None, None
+    db = ReadSessionLocal()
+    try:
+        query = query.execution_options(stream_results=True, yield_per=settings.EXPORT_CHUNK_ROWS)
+        with pq.ParquetWriter(temporary, reading_schema(), compression="zstd") as writer:
+            for partition in db.execute(query).partitions():
+                writer.write_table(_arrow_table(partition))
+                ids = [row[0] for row in partition]
+                first = min(ids) if first is None else min(first, min(ids))
+                last = max(ids) if last is None else max(last, max(ids))
+                rows += len(partition)
+        db.rollback()
+    finally:
+        db.close()
+    if not rows:
+        os.remove(temporary)
+        return 0
+    os.replace(temporary, os.path.join(directory, f"part-{first}-{last}.parquet"))
+    return rows
+
+
+def _refresh_table(sensor_type: str) -> Tuple[int, bool]:
+    """Extend (or rebuild) the snapshot of one table, returns (rows written, rebuilt)"""
+    parts = _snapshot_parts(sensor_type)
+    if parts and len(parts) < _COMPACT_PARTS:
+        return _write_part(sensor_type, after_id=parts[-1][1]), False
+    rows = _write_part(sensor_type, after_id=None)
+    for _, _, path in parts:
+        os.remove(path)
+    return rows, True
+
+
+def refresh_snapshot() -> None:
+    """Append new rows to the Parquet snapshot of every reading table (periodic task)"""
+    if not analytics_available():
+        return
+    with directory_lock(settings.ANALYTICS_DIR) as locked:
+        if not locked:
+            return
+        started = time.perf_counter()
+        results = {sensor_type: _refresh_table(sensor_type) for sensor_type in SENSOR_MODELS}
+        rows = {sensor_type: written for sensor_type, (written, _) in results.items()}
+        rebuilt = [sensor_type for sensor_type, (_, full) in results.items() if full]
+        logger.info(
+            "Analytics snapshot refreshed: %d rows written, rebuilt %s (%.1f s)",
+            sum(rows.values()), ", ".join(rebuilt) or "none", time.perf_counter() - started,
+            extra={"snapshot_rows": rows, "snapshot_rebuilt": rebuilt}
+        )
+
+
+# Statistics
+
+def _empty_stats() -> dict:
+    stats = {"count": 0, "min": None, "max": None, "mean": None, "std": None, "first": None, "last": None}
+    stats.update({f"p{p:02d}": None for p in PERCENTILES})
+    return stats
+
+
+def _finite(value) -> Optional[float]:
+    return None if value is None or math.isnan(value) else round(float(value), 4)
+
+
+def _timestamp(seconds) -> Optional[datetime]:
+    return datetime.fromtimestamp(seconds, timezone.utc) if seconds is not None else None
+
+
+def numpy_stats(seconds: np.ndarray, values: np.ndarray, bucket: Optional[str]) -> dict:
+    """Statistics of one series from NumPy arrays (the SQL path)"""
+    stats = _empty_stats()
+    if len(values):
+        percentiles = np.percentile(values, PERCENTILES)
+        stats.update({
+            "count": int(len(values)),
+            "min": _finite(values.min()),
+            "max": _finite(values.max()),
+            "mean": _finite(values.mean()),
+            "std": _finite(values.std(ddof=1)) if len(values) > 1 else None,
+            "first": _timestamp(seconds.min()),
+            "last": _timestamp(seconds.max()),
+        })
+        stats.update({f"p{p:02d}": _finite(value) for p, value in zip(PERCENTILES, percentiles)})
+    if bucket:
+        step, offset = BUCKETS[bucket]
+        starts = np.floor((seconds - offset) / step) * step + offset
+        keys, index, counts = np.unique(starts, return_inverse=True, return_counts=True)
+        sums = np.bincount(index, weights=values)
+        minimums = np.full(len(keys), np.inf)
+        maximums = np.full(len(keys), -np.inf)
+        np.minimum.at(minimums, index, values)
+        np.maximum.at(maximums, index, values)
+        stats["buckets"] = [
+            {"start": _timestamp(key), "count": int(count), "mean": _finite(total / count),
+             "min": _finite(low), "max": _finite(high)}
+            for key, count, total, low, high in zip(keys, counts, sums, minimums, maximums)
+        ]
+    return stats
+
+
+def duckdb_stats(
+    db: Session,
+    sensor_type: str,
+    since: datetime,
+    device_id: Optional[str],
+    bucket: Optional[str]
+) -> Optional[dict]:
+    """Statistics of one series in DuckDB, None when there is no snapshot yet"""
+    parts = _snapshot_parts(sensor_type)
+    if not parts:
+        return None
+    import duckdb
+
+    snapshot_max_id = parts[-1][1]
+    snapshot_time = max(os.path.getmtime(path) for _, _, path in parts)
+    connection = duckdb.connect()
+    try:
+        connection.execute(f"SET threads = {int(settings.ANALYTICS_THREADS)}")
+        connection.execute(
+            f"CREATE VIEW snapshot AS SELECT * FROM read_parquet([{', '.join(_sql_string(path) for _, _, path in parts)}])"
+        )
+
+        # Rows added since the snapshot - a primary key range scan
+        model = SENSOR_MODELS[sensor_type]
+        value_column = getattr(model, SENSOR_VALUE_COLUMNS[sensor_type])
+        fresh = _arrow_table(db.execute(
+            select(model.id, model.device_id, model.timestamp, value_column).where(model.id > snapshot_max_id)
+        ).all())
+        db.rollback()
+        connection.register("fresh", fresh)
+
+        sources = ["SELECT * FROM snapshot", "SELECT * FROM fresh"]
+        files = archive_files(sensor_type, since)
+        if files:
+            # Archived rows still in the table (interrupted archiver run) count once
+            sources.append(
+                f"SELECT * FROM read_parquet([{', '.join(_sql_string(path) for path in files)}]) "
+                "WHERE id NOT IN (SELECT id FROM snapshot)"
+            )
+        connection.execute(f"CREATE VIEW readings AS {' UNION ALL '.join(sources)}")
+
+        conditions = "timestamp >= to_timestamp(?)"
+        parameters = [_utc(since).timestamp()]
+        if device_id:
+            conditions += " AND device_id = ?"
+            parameters.append(device_id)
+
+        quantiles = ", ".join(str(p / 100) for p in PERCENTILES)
+        row = connection.execute(
+            f"SELECT count(*), min(value), max(value), avg(value), stddev_samp(value), "
+            f"epoch(min(timestamp)), epoch(max(timestamp)), quantile_cont(value, [{quantiles}]) "
+            f"FROM readings WHERE {conditions}",
+            parameters
+        ).fetchone()
+        stats = _empty_stats()
+        if row[0]:
+            stats.update({
+                "count": int(row[0]),
+                "min": _finite(row[1]),
+                "max": _finite(row[2]),
+                "mean": _finite(row[3]),
+                "std": _finite(row[4]),
+                "first": _timestamp(row[5]),
+                "last": _timestamp(row[6]),
+            })
+            stats.update({f"p{p:02d}": _finite(value) for p, value in zip(PERCENTILES, row[7])})
+
+        if bucket:
+            step, offset = BUCKETS[bucket]
+            rows = connection.execute(
+                f"SELECT floor((epoch(timestamp) - {offset}) / {step}) * {step} + {offset} AS bucket, "
+                f"count(*), avg(value), min(value), max(value) "
+                f"FROM readings WHERE {conditions} GROUP BY bucket ORDER BY bucket",
+                parameters
+            ).fetchall()
+            stats["buckets"] = [
+                {"start": _timestamp(start), "count": int(count), "mean": _finite(mean),
+                 "min": _finite(low), "max": _finite(high)}
+                for start, count, mean, low, high in rows
+            ]
+        stats["snapshot_age_seconds"] = round(time.time() - snapshot_time)
+        return stats
+    finally:
+        connection.close()
+
+
+def _sql_string(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def reading_stats(
+    db: Session,
+    sensor_type: str,
+    days: int,
+    device_id: Optional[str] = None,
+    bucket: Optional[str] = None
+) -> dict:
+    """Statistics of a sensor over the last N days, on DuckDB for long windows"""
+    since = datetime.utcnow() - timedelta(days=days)
+    stats = None
+    if days > settings.ANALYTICS_MIN_DAYS and analytics_available():
+        try:
+            stats = duckdb_stats(db, sensor_type, since, device_id, bucket)
+        except Exception:
+            logger.exception("Analytics query failed, falling back to SQL")
+        if stats is not None:
+            stats["engine"] = "duckdb"
+    if stats is None:
+        seconds, values = series_arrays(db, sensor_type, since, device_id)
+        stats = numpy_stats(seconds, values, bucket)
+        stats["engine"] = "sql"
+    stats.update({"sensor_type": sensor_type, "days": days, "device_id": device_id, "bucket": bucket})
+    return stats
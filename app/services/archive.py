@@ -0,0 +1,451 @@
+"""
+Archive Service - Cold readings in compressed columnar files
+
+A periodic task moves raw readings older than ARCHIVE_AFTER_DAYS out of
+the reading tables into Parquet part files, one directory per sensor
+type and month:
+
+    ARCHIVE_DIR/<sensor_type>/<YYYY-MM>/part-<first id>-<last id>.parquet
+
+Every archiver batch adds new part files (written to a temporary file
+and renamed, so readers never see a partial file) and existing parts
+are never rewritten. Rows are only deleted from the table once they
+are on disk. A crash in between leaves rows in both places; readers
+drop archived rows whose id is still in the table, and the next run
+skips ids already archived and deletes them. A lock file makes sure
+only one worker archives at a time.
+
+Ids are never reused, so an id identifies a reading in both places.
+This is why the row with the highest id of each table is never
+archived, however old it is: SQLite tables without AUTOINCREMENT
+would hand that id out again. It stays in the table and is read like
+any other recent row.
+
+Readers (`fetch_archived`, `archived_arrays`) only open the parts of
+the months overlapping the requested window, with the timestamp filter
+pushed down to the Parquet row groups; `fetch_archived_after` (delta
+sync) only opens parts holding ids above the cursor. pyarrow is
+imported on first use.
+"""
+import fcntl
+import logging
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List, Optional, Tuple
+from sqlalchemy import delete, func, select
+from app.config import get_settings
+from app.database import SessionLocal
+from app.models.readings import SENSOR_MODELS, SENSOR_VALUE_COLUMNS
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+_DELETE_CHUNK = 1000  # Ids per DELETE statement (SQL Server allows ~2100 parameters)
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Part file path -> (mtime, (lowest id, highest id, newest timestamp)), from the Parquet footer statistics
+_footers = {}
+
+
+def archive_enabled() -> bool:
+    return bool(settings.ARCHIVE_DIR)
+
+
+def _utc(timestamp: datetime) -> datetime:
+    if timestamp.tzinfo is None:
+        return timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.astimezone(timezone.utc)
+
+
+def _month_dir(sensor_type: str, year: int, month: int) -> str:
+    return os.path.join(settings.ARCHIVE_DIR, sensor_type, f"{year:04d}-{month:02d}")
+
+
+def _part_files(directory: str) -> List[str]:
+    try:
+        names = sorted(os.listdir(directory))
+    except FileNotFoundError:
+        return []
+    return [os.path.join(directory, name) for name in names if name.startswith("part-") and name.endswith(".parquet")]
+
+
+def _month_dirs(sensor_type: str, since: datetime, until: Optional[datetime]) -> List[str]:
+    """Month directories overlapping [since, until), oldest first"""
+    directory = os.path.join(settings.ARCHIVE_DIR, sensor_type)
+    try:
+        names = sorted(os.listdir(directory))
+    except FileNotFoundError:
+        return []
+    first = f"{since:%Y-%m}"
+    last = f"{until:%Y-%m}" if until else None
+    return [
+        os.path.join(directory, name) for name in names
+        if len(name) == 7 and name >= first and (last is None or name <= last)
+    ]
+
+
+def _month_files(sensor_type: str, since: datetime, until: Optional[datetime]) -> List[str]:
+    """Part files of the months overlapping [since, until)"""
+    return [path for directory in _month_dirs(sensor_type, since, until) for path in _part_files(directory)]
+
+
+def reading_schema():
+    """Arrow schema of archived (and snapshotted) readings"""
+    import pyarrow as pa
+    return pa.schema([
+        ("id", pa.int64()),
+        ("device_id", pa.string()),
+        ("timestamp", pa.timestamp("us", tz="UTC")),
+        ("value", pa.float64()),
+    ])
+
+
+def archive_files(sensor_type: str, since: datetime, until: Optional[datetime] = None) -> List[str]:
+    """Part files of a sensor type overlapping [since, until)"""
+    if not archive_enabled():
+        return []
+    return _month_files(sensor_type, _utc(since), _utc(until) if until else None)
+
+
+def _read_window(sensor_type: str, since: datetime, until: Optional[datetime], device_id: Optional[str]):
+    """Archived rows of one sensor type as a pyarrow table (None when nothing is archived)"""
+    paths = _month_files(sensor_type, _utc(since), _utc(until) if until else None)
+    if not paths:
+        return None
+    import pyarrow as pa
+
+    return pa.concat_tables([_read_window_file(path, since, until, device_id) for path in paths])
+
+
+def _read_window_file(
+    path: str,
+    since: datetime,
+    until: Optional[datetime],
+    device_id: Optional[str],
+    columns: Optional[List[str]] = None
+):
+    import pyarrow.parquet as pq
+
+    filters = [("timestamp", ">=", _utc(since))]
+    if until is not None:
+        filters.append(("timestamp", "<", _utc(until)))
+    if device_id:
+        filters.append(("device_id", "=", device_id))
+    # Part files are written sorted by timestamp, so whole row groups are skipped
+    return pq.read_table(path, columns=columns, filters=filters, schema=reading_schema())
+
+
+def fetch_archived(
+    sensor_type: str,
+    since: datetime,
+    until: Optional[datetime] = None,
+    device_id: Optional[str] = None
+) -> List:
+    """Archived readings as (unsaved) model instances, naive UTC timestamps, oldest first"""
+    if not archive_enabled():
+        return []
+    table = _read_window(sensor_type, since, until, device_id)
+    if table is None or table.num_rows == 0:
+        return []
+    model = SENSOR_MODELS[sensor_type]
+    value_column = SENSOR_VALUE_COLUMNS[sensor_type]
+    columns = table.sort_by("timestamp").to_pydict()
+    return [
+        model(id=row_id, device_id=device, timestamp=timestamp.replace(tzinfo=None), **{value_column: value})
+        for row_id, device, timestamp, value in zip(
+            columns["id"], columns["device_id"], columns["timestamp"], columns["value"]
+        )
+    ]
+
+
+def archived_arrays(
+    sensor_type: str,
+    since: datetime,
+    until: Optional[datetime] = None,
+    device_id: Optional[str] = None
+) -> Optional[Tuple]:
+    """Archived (ids, unix seconds, values) NumPy arrays, None when nothing is archived"""
+    if not archive_enabled():
+        return None
+    table = _read_window(sensor_type, since, until, device_id)
+    if table is None or table.num_rows == 0:
+        return None
+    seconds = table["timestamp"].to_numpy().astype("datetime64[us]").astype("int64") / 1e6
+    return table["id"].to_numpy(), seconds, table["value"].to_numpy()
+
+
+def _without_ids(table, exclude_ids: Optional[List[int]]):
+    if not exclude_ids:
+        return table
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    return table.filter(pc.invert(pc.is_in(table["id"], value_set=pa.array(exclude_ids, pa.int64()))))
+
+
+def archived_batches(
+    sensor_type: str,
+    since: datetime,
+    until: Optional[datetime] = None,
+    device_id: Optional[str] = None,
+    batch_rows: int = 10000,
+    exclude_ids: Optional[List[int]] = None
+) -> Iterator:
+    """Archived rows as pyarrow record batches, oldest first, without the rows in exclude_ids"""
+    if not archive_enabled():
+        return
+    import pyarrow as pa
+
+    # One month in memory at a time - its parts may overlap in time
+    for directory in _month_dirs(sensor_type, _utc(since), _utc(until) if until else None):
+        parts = [_read_window_file(path, since, until, device_id) for path in _part_files(directory)]
+        if not parts:
+            continue
+        table = _without_ids(pa.concat_tables(parts), exclude_ids)
+        table = table.sort_by([("timestamp", "ascending"), ("id", "ascending")])
+        yield from table.to_batches(max_chunksize=batch_rows)
+
+
+def count_archived(
+    sensor_type: str,
+    since: datetime,
+    until: Optional[datetime] = None,
+    device_id: Optional[str] = None,
+    exclude_ids: Optional[List[int]] = None
+) -> int:
+    """Number of archived rows in a window, without the rows in exclude_ids"""
+    if not archive_enabled():
+        return 0
+    return sum(
+        _without_ids(_read_window_file(path, since, until, device_id, columns=["id"]), exclude_ids).num_rows
+        for path in _month_files(sensor_type, _utc(since), _utc(until) if until else None)
+    )
+
+
+def _footer_stats(path: str) -> Tuple[Optional[int], Optional[int], Optional[datetime]]:
+    """Lowest id, highest id and newest timestamp of a part file, None when the footer has no statistics"""
+    import pyarrow.parquet as pq
+
+    mtime = os.stat(path).st_mtime_ns
+    cached = _footers.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    metadata = pq.read_metadata(path)
+    stats = []
+    for name, extreme in (("id", "min"), ("id", "max"), ("timestamp", "max")):
+        column = metadata.schema.names.index(name)
+        values = [metadata.row_group(index).column(column).statistics for index in range(metadata.num_row_groups)]
+        complete = values and all(statistics is not None and statistics.has_min_max for statistics in values)
+        if not complete:
+            stats.append(None)
+        elif extreme == "min":
+            stats.append(min(statistics.min for statistics in values))
+        else:
+            stats.append(max(statistics.max for statistics in values))
+    _footers[path] = (mtime, tuple(stats))
+    return tuple(stats)
+
+
+def archived_until(sensor_type: str) -> Optional[datetime]:
+    """Newest archived timestamp of a sensor type (naive UTC), None when nothing is archived"""
+    if not archive_enabled():
+        return None
+    # The parts of the newest month hold the newest timestamp
+    for directory in reversed(_month_dirs(sensor_type, _EPOCH, None)):
+        newest = [_footer_stats(path)[2] for path in _part_files(directory)]
+        if not newest:
+            continue
+        if None in newest:
+            return datetime.utcnow()
+        return _utc(max(newest)).replace(tzinfo=None)
+    return None
+
+
+def fetch_archived_after(
+    sensor_type: str,
+    after_id: int,
+    limit: int,
+    since: Optional[datetime] = None,
+    device_id: Optional[str] = None
+) -> List[Tuple]:
+    """Archived (id, device_id, value, timestamp) rows with id > after_id, lowest ids first, naive UTC timestamps"""
+    if not archive_enabled():
+        return []
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    tables = []
+    for path in _month_files(sensor_type, _utc(since) if since else _EPOCH, None):
+        maximum = _footer_stats(path)[1]
+        if maximum is not None and maximum <= after_id:
+            continue
+        filters = [("id", ">", after_id)]
+        if since is not None:
+            filters.append(("timestamp", ">=", _utc(since)))
+        if device_id:
+            filters.append(("device_id", "=", device_id))
+        tables.append(pq.read_table(path, filters=filters, schema=reading_schema()))
+    if not tables:
+        return []
+    columns = pa.concat_tables(tables).sort_by("id").slice(0, limit).to_pydict()
+    return [
+        (row_id, device, value, timestamp.replace(tzinfo=None))
+        for row_id, device, timestamp, value in zip(
+            columns["id"], columns["device_id"], columns["timestamp"], columns["value"]
+        )
+    ]
+
+
+def merge_readings(hot: List, archived: List) -> List:
+    """Hot and archived readings newest first, archived rows still in the table dropped"""
+    if not archived:
+        return hot
+    hot_ids = {reading.id for reading in hot}
+    merged = hot + [reading for reading in archived if reading.id not in hot_ids]
+    merged.sort(key=lambda reading: _utc(reading.timestamp), reverse=True)
+    return merged
+
+
+# Archiver
+
+@contextmanager
+def directory_lock(directory: str) -> Iterator[bool]:
+    """Exclusive lock over all workers - yields False when another process holds it"""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, ".lock"), "w") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _archived_ids(directory: str, low: int, high: int):
+    """Ids in [low, high] already in a month's parts - only parts whose id range overlaps are read"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    tables = []
+    for path in _part_files(directory):
+        first, last, _ = _footer_stats(path)
+        if first is not None and last is not None and (last < low or first > high):
+            continue
+        tables.append(pq.read_table(path, columns=["id"], filters=[("id", ">=", low), ("id", "<=", high)]))
+    if not tables:
+        return None
+    return pa.concat_tables(tables)["id"]
+
+
+def _write_part(sensor_type: str, year: int, month: int, rows: List[Tuple]) -> None:
+    """Write (id, device_id, timestamp, value) rows as a new part file of their month"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    schema = reading_schema()
+    ids, devices, timestamps, values = zip(*rows)
+    table = pa.Table.from_arrays(
+        [
+            pa.array(ids, pa.int64()),
+            pa.array(devices, pa.string()),
+            pa.array([_utc(timestamp) for timestamp in timestamps], schema.field("timestamp").type),
+            pa.array(values, pa.float64()),
+        ],
+        schema=schema
+    )
+    directory = _month_dir(sensor_type, year, month)
+    # Rows archived by an interrupted run come again - skip the ids already on disk
+    archived = _archived_ids(directory, min(ids), max(ids))
+    if archived is not None and len(archived):
+        table = table.filter(pc.invert(pc.is_in(table["id"], value_set=archived)))
+        if table.num_rows == 0:
+            return
+    table = table.sort_by([("timestamp", "ascending"), ("id", "ascending")])
+
+    first, last = pc.min_max(table["id"]).values()
+    path = os.path.join(directory, f"part-{first.as_py()}-{last.as_py()}.parquet")
+    os.makedirs(directory, exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    pq.write_table(table, temporary, compression="zstd", row_group_size=100_000)
+    os.replace(temporary, path)
+
+
+def _archive_sensor(sensor_type: str, cutoff: datetime, budget: int) -> int:
+    """
+    Archive up to `budget` rows of one sensor type older than cutoff, returns the number moved
+
+    The row with the highest id is left in the table even past the cutoff
+    (see the module docstring).
+    """
+    model = SENSOR_MODELS[sensor_type]
+    value_column = getattr(model, SENSOR_VALUE_COLUMNS[sensor_type])
+    db = SessionLocal()
+    try:
+        # The row with the highest id always stays: SQLite tables without
+        # AUTOINCREMENT would otherwise hand out archived ids again
+        max_id = db.execute(select(func.max(model.id))).scalar()
+        db.rollback()
+    finally:
+        db.close()
+    if max_id is None:
+        return 0
+    moved = 0
+    while moved < budget:
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                select(model.id, model.device_id, model.timestamp, value_column)
+                .where(model.timestamp < cutoff, model.id < max_id)
+                .order_by(model.timestamp, model.id)
+                .limit(min(settings.ARCHIVE_BATCH_ROWS, budget - moved))
+            ).all()
+            db.rollback()
+            if not rows:
+                break
+
+            by_month = {}
+            for row in rows:
+                timestamp = _utc(row[2])
+                by_month.setdefault((timestamp.year, timestamp.month), []).append(tuple(row))
+            for (year, month), month_rows in by_month.items():
+                _write_part(sensor_type, year, month, month_rows)
+
+            # Only delete what is safely on disk, in short transactions
+            ids = [row[0] for row in rows]
+            for start in range(0, len(ids), _DELETE_CHUNK):
+                db.execute(delete(model).where(model.id.in_(ids[start:start + _DELETE_CHUNK])))
+                db.commit()
+            moved += len(rows)
+        finally:
+            db.close()
+    return moved
+
+
+def archive_cold_readings() -> None:
+    """Move readings older than ARCHIVE_AFTER_DAYS to the archive (periodic task)"""
+    if not archive_enabled():
+        return
+    with directory_lock(settings.ARCHIVE_DIR) as locked:
+        if not locked:
+            return
+        started = time.perf_counter()
+        cutoff = datetime.utcnow() - timedelta(days=settings.ARCHIVE_AFTER_DAYS)
+        # Cut at midnight, so a run archives whole days
+        cutoff = cutoff.replace(hour=0, minute=0, second=0, microsecond=0)
+        moved = {}
+        for sensor_type in SENSOR_MODELS:
+            count = _archive_sensor(sensor_type, cutoff, settings.ARCHIVE_MAX_ROWS_PER_RUN)
+            if count:
+                moved[sensor_type] = count
+        if moved:
+            logger.info(
+                "Archived readings older than %s: %s (%.1f s)",
+                cutoff.date(), moved, time.perf_counter() - started,
+                extra={"archived": moved}
+            )
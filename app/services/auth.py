@@ -1,6 +1,13 @@
 """
 Authentication Service
 """
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
@@ -8,6 +15,7 @@ from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 from app.config import get_settings
 from app.models.user import User
+from app.services.metrics import AUTH_CACHE_REQUESTS
 
 settings = get_settings()
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -23,6 +31,85 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+class PasswordHasherBusy(Exception):
+    """Raised when the password hashing queue is full"""
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a small thread pool so it never blocks the event loop
+
+    bcrypt releases the GIL, so threads give real parallelism. At most
+    `workers + queue_size` calls are accepted at once, the rest are
+    rejected with PasswordHasherBusy instead of piling up.
+    """
+
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self._lock = threading.Lock()
+        self._executor = (
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+            if workers > 0 else None
+        )
+
+    async def run(self, func, *args):
+        if self._executor is None:
+            return self._timed(func, *args)
+        with self._lock:
+            if self.pending >= self.workers + self.queue_size:
+                self.rejected += 1
+                raise PasswordHasherBusy()
+            self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self._timed, func, *args)
+        finally:
+            with self._lock:
+                self.pending -= 1
+
+    def _timed(self, func, *args):
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.completed += 1
+                self.total_seconds += elapsed
+                self.max_seconds = max(self.max_seconds, elapsed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "pending": self.pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_ms": round(self.total_seconds / self.completed * 1000, 1) if self.completed else 0.0,
+                "max_ms": round(self.max_seconds * 1000, 1)
+            }
+
+
+password_hasher = PasswordHasher(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_QUEUE_SIZE)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against its hash in the password hashing pool"""
+    return await password_hasher.run(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password in the password hashing pool"""
+    return await password_hasher.run(get_password_hash, password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create JWT access token"""
     to_encode = data.copy()
@@ -35,6 +122,12 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
+def is_operator(username: str) -> bool:
+    """Check if the user is listed in OPERATOR_USERNAMES"""
+    operators = {name.strip() for name in settings.OPERATOR_USERNAMES.split(",") if name.strip()}
+    return username in operators
+
+
 def get_user_by_username(db: Session, username: str) -> Optional[User]:
     """Get user by username"""
     return db.query(User).filter(User.username == username).first()
@@ -60,20 +153,247 @@ def authenticate_user(db: Session, username: str, password: str) -> Optional[Use
     return user
 
 
-def decode_token(token: str) -> Optional[str]:
-    """Decode JWT token and return username"""
+async def authenticate_user_async(db: Session, username: str, password: str) -> Optional[User]:
+    """Authenticate user with username and password, hashing off the event loop"""
+    user = get_user_by_username(db, username)
+    if not user:
+        return None
+    hashed_password = user.hashed_password
+    # Don't hold a pooled connection while waiting for the hasher
+    db.rollback()
+    if not await verify_password_async(password, hashed_password):
+        return None
+    return user
+
+
+def create_user_access_token(user: User, expires_delta: Optional[timedelta] = None):
+    """Create JWT access token carrying the claims needed for stateless auth"""
+    return create_access_token(
+        data={
+            "sub": user.username,
+            "uid": user.id,
+            "act": bool(user.is_active),
+            "ver": settings.TOKEN_VERSION,
+            "tv": user.token_version
+        },
+        expires_delta=expires_delta
+    )
+
+
+class TokenDecodeCache:
+    """Bounded LRU of verified token payloads keyed by the token hash"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[bytes, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: bytes) -> Optional[dict]:
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is None:
+                return None
+            if payload.get("exp", 0) <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return payload
+
+    def put(self, key: bytes, payload: dict) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = payload
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+token_decode_cache = TokenDecodeCache(settings.TOKEN_DECODE_CACHE_SIZE)
+
+
+def decode_token_claims(token: str) -> Optional[dict]:
+    """Verify JWT token and return its payload (memoized per token)"""
+    key = hashlib.sha256(token.encode()).digest()
+    payload = token_decode_cache.get(key)
+    if payload is not None:
+        AUTH_CACHE_REQUESTS.labels("token_decode", "hit").inc()
+        return payload
+    AUTH_CACHE_REQUESTS.labels("token_decode", "miss").inc()
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        username: str = payload.get("sub")
-        return username
     except JWTError:
         return None
+    token_decode_cache.put(key, payload)
+    return payload
+
+
+def decode_token(token: str) -> Optional[str]:
+    """Decode JWT token and return username"""
+    payload = decode_token_claims(token)
+    if payload is None:
+        return None
+    return payload.get("sub")
 
 
 def get_current_user_from_token(token: str, db: Session) -> Optional[User]:
-    """Get current user from JWT token"""
-    username = decode_token(token)
-    if username is None:
+    """Get current user from JWT token, if the token is still valid for that user"""
+    payload = decode_token_claims(token)
+    if payload is None or payload.get("sub") is None:
+        return None
+    user = get_user_by_username(db, payload["sub"])
+    if user is None or not token_is_current(payload, user):
         return None
-    return get_user_by_username(db, username)
+    return user
+
+
+def token_is_current(payload: dict, user) -> bool:
+    """False once the user was deactivated or their tokens revoked (User or CachedUser)"""
+    return bool(user.is_active) and payload.get("tv") == user.token_version
+
+
+def revoke_user_access_tokens(user: User) -> None:
+    """Invalidate the user's access tokens, takes effect when the session commits"""
+    user.token_version = (user.token_version or 1) + 1
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    """Snapshot of an authenticated user, safe to share between requests"""
+    id: int
+    username: str
+    is_active: bool
+    token_version: int
+    email: Optional[str] = None
+    full_name: Optional[str] = None
+
+    @classmethod
+    def from_user(cls, user: User) -> "CachedUser":
+        return cls(
+            id=user.id,
+            username=user.username,
+            is_active=user.is_active,
+            token_version=user.token_version,
+            email=user.email,
+            full_name=user.full_name
+        )
+
+
+class UserCache:
+    """Bounded TTL cache of active users keyed by username (LRU eviction)"""
+
+    def __init__(self, max_size: int, ttl_seconds: int):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_size > 0
+
+    def get(self, username: str) -> Optional[CachedUser]:
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(username)
+                self.hits += 1
+                AUTH_CACHE_REQUESTS.labels("user", "hit").inc()
+                return entry[0]
+            if entry is not None:
+                del self._entries[username]
+            self.misses += 1
+            AUTH_CACHE_REQUESTS.labels("user", "miss").inc()
+            return None
+
+    def put(self, user: CachedUser) -> None:
+        if not self.enabled or not user.is_active:
+            return
+        with self._lock:
+            self._entries[user.username] = (user, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(user.username)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, username: str) -> None:
+        with self._lock:
+            self._entries.pop(username, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+user_cache = UserCache(settings.USER_CACHE_MAX_SIZE, settings.USER_CACHE_TTL_SECONDS)
+
+
+def _lookup_cached_user(username: str, db: Session) -> Optional[CachedUser]:
+    if user_cache.enabled:
+        cached = user_cache.get(username)
+        if cached is not None:
+            return cached
+    user = get_user_by_username(db, username)
+    if user is None:
+        return None
+    cached = CachedUser.from_user(user)
+    user_cache.put(cached)
+    return cached
+
+
+def get_user_from_token_claims(token: str) -> Optional[CachedUser]:
+    """
+    Get current user from JWT claims alone, without touching the database
+
+    A password change or deactivation is not seen here, so a revoked
+    token stays valid until it expires (ACCESS_TOKEN_EXPIRE_MINUTES).
+    """
+    payload = decode_token_claims(token)
+    if payload is None:
+        return None
+    if payload.get("ver") != settings.TOKEN_VERSION or not payload.get("act"):
+        return None
+    if payload.get("sub") is None or payload.get("uid") is None or payload.get("tv") is None:
+        return None
+    return CachedUser(id=payload["uid"], username=payload["sub"], is_active=True, token_version=payload["tv"])
+
+
+def get_cached_user_from_token(token: str, db: Session) -> Optional[CachedUser]:
+    """
+    Get current user from JWT token, using the user cache
+
+    Cache entries live in the worker process only. Other workers see a
+    changed user - and keep accepting its revoked tokens - for
+    USER_CACHE_TTL_SECONDS at most. With STATELESS_AUTH the token claims
+    are trusted and the database is not used at all.
+    """
+    if settings.STATELESS_AUTH:
+        return get_user_from_token_claims(token)
+    payload = decode_token_claims(token)
+    if payload is None or payload.get("sub") is None:
+        return None
+    user = _lookup_cached_user(payload["sub"], db)
+    if user is None or not token_is_current(payload, user):
+        return None
+    return user
+
 
+def invalidate_cached_user(*usernames: str) -> None:
+    """Drop users from the cache after their data changed"""
+    for username in usernames:
+        if username:
+            user_cache.invalidate(username)
@@ -0,0 +1,336 @@
+"""
+Derived Series - Brewery metrics computed from raw readings on ingestion
+
+- dew_point (°C): from the latest temperature and humidity of a device
+- weight_loss_rate (kg/h): least-squares slope of the weight over the
+  window, positive while the fermenter loses weight (CO2 escaping)
+- ph_drift (pH/h): least-squares slope of the pH over the window
+
+Time is cut into DERIVED_MIN_INTERVAL_SECONDS buckets. The first input
+reading of a bucket that has no value yet gets one, computed from the
+readings in the database (so from every worker's inserts, including the
+caller's uncommitted ones) and written in the caller's transaction. A
+unique key on (series, device_id, bucket) makes the database the judge:
+when two workers compute the same bucket, one insert is skipped.
+
+Each worker keeps, per device and input type, the readings of the last
+window and the highest id it has read, so a due bucket only reads the
+rows added since (an index range on device_id and id) instead of the
+whole window. It also remembers the newest bucket stored per series, so
+readings in a bucket that already has its value cost no query. Both are
+only updated once the caller's transaction commits.
+"""
+import bisect
+import math
+import threading
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import event, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.config import get_settings
+from app.models.readings import SENSOR_MODELS, SENSOR_VALUE_COLUMNS, DerivedReading
+
+settings = get_settings()
+
+# Series -> raw sensor types it is computed from
+DERIVED_SERIES = {
+    "dew_point": ("temperature", "humidity"),
+    "weight_loss_rate": ("weight",),
+    "ph_drift": ("ph",),
+}
+INPUT_TYPES = {sensor_type for inputs in DERIVED_SERIES.values() for sensor_type in inputs}
+_SERIES_OF_INPUT = {
+    sensor_type: [series for series, inputs in DERIVED_SERIES.items() if sensor_type in inputs]
+    for sensor_type in INPUT_TYPES
+}
+
+# Temperature and humidity further apart than this are not paired for the dew point
+_PAIRING_SECONDS = 600
+
+# Session.info key of the engine updates waiting for the caller's commit
+_AFTER_COMMIT = "derived_after_commit"
+
+
+def _after_commit(db: Session, update) -> None:
+    db.info.setdefault(_AFTER_COMMIT, []).append(update)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_after_commit(session: Session) -> None:
+    # Savepoint releases fire this too - only the outermost commit counts
+    if session.get_nested_transaction() is None:
+        for update in session.info.pop(_AFTER_COMMIT, ()):
+            update()
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _drop_after_rollback(session: Session, transaction) -> None:
+    if transaction.parent is None:
+        session.info.pop(_AFTER_COMMIT, None)
+
+
+def dew_point(temperature_celsius: float, humidity_percent: float) -> Optional[float]:
+    """Magnus formula (Sonntag 1990 constants), accurate to ~0.1 °C between -45 and 60 °C"""
+    if humidity_percent <= 0:
+        return None
+    gamma = math.log(min(humidity_percent, 100.0) / 100) + 17.62 * temperature_celsius / (243.12 + temperature_celsius)
+    return 243.12 * gamma / (17.62 - gamma)
+
+
+def _epoch(timestamp: datetime) -> float:
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.timestamp()
+
+
+class SlopeWindow:
+    """Least-squares slope over a sliding time window, O(1) per point"""
+
+    def __init__(self, window_seconds: float):
+        self.window_seconds = window_seconds
+        self.points: Deque[Tuple[float, float]] = deque()
+        self._base = None
+        self._sums = [0.0, 0.0, 0.0, 0.0]  # t, v, t*t, t*v (t relative to _base)
+
+    def _add_sums(self, t: float, value: float, sign: int) -> None:
+        t -= self._base
+        sums = self._sums
+        sums[0] += sign * t
+        sums[1] += sign * value
+        sums[2] += sign * t * t
+        sums[3] += sign * t * value
+
+    def add(self, timestamp: float, value: float) -> None:
+        if self.points and timestamp <= self.points[-1][0]:
+            return  # Out of order - the window only moves forward
+        if self._base is None or timestamp - self._base > 4 * self.window_seconds:
+            self._rebase(timestamp)
+        self.points.append((timestamp, value))
+        self._add_sums(timestamp, value, 1)
+        while self.points[0][0] < timestamp - self.window_seconds:
+            self._add_sums(*self.points.popleft(), -1)
+
+    def _rebase(self, timestamp: float) -> None:
+        # Keeps t small and clears rounding errors accumulated by removals
+        self._base = self.points[0][0] if self.points else timestamp
+        self._sums = [0.0, 0.0, 0.0, 0.0]
+        for point in self.points:
+            self._add_sums(*point, 1)
+
+    def slope_per_hour(self) -> Optional[float]:
+        """None until the window holds 3 points spanning a quarter of its length"""
+        n = len(self.points)
+        if n < 3 or self.points[-1][0] - self.points[0][0] < self.window_seconds / 4:
+            return None
+        sum_t, sum_v, sum_tt, sum_tv = self._sums
+        denominator = n * sum_tt - sum_t * sum_t
+        if denominator <= 0:
+            return None
+        return (n * sum_tv - sum_t * sum_v) / denominator * 3600
+
+
+class DerivedSeriesEngine:
+    """Computes the derived values due for new readings, shared by the requests of a worker"""
+
+    def __init__(self, window_seconds: float, interval_seconds: float):
+        self.window_seconds = window_seconds
+        self.interval_seconds = interval_seconds
+        # (device_id, series) -> newest bucket found in the table
+        self._stored: Dict[Tuple[str, str], int] = {}
+        # (device_id, sensor_type) -> (complete from, highest id read, (unix time, value) points ascending)
+        self._windows: Dict[Tuple[str, str], Tuple[float, int, List[Tuple[float, float]]]] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, timestamp: float) -> int:
+        return int(timestamp // self.interval_seconds)
+
+    def _remember(self, device_id: str, series: str, bucket: int) -> None:
+        with self._lock:
+            key = (device_id, series)
+            if bucket > self._stored.get(key, -1):
+                self._stored[key] = bucket
+
+    def _due(self, db: Session, device_id: str, readings: List[Tuple[str, float, float]]) -> Dict[Tuple[str, int], float]:
+        """(series, bucket) -> timestamp of its first new input reading, for buckets without a value"""
+        with self._lock:
+            stored = {series: self._stored.get((device_id, series)) for series in DERIVED_SERIES}
+        due = {}
+        for sensor_type, _, timestamp in readings:
+            bucket = self.bucket(timestamp)
+            for series in _SERIES_OF_INPUT[sensor_type]:
+                if bucket != stored[series]:
+                    due.setdefault((series, bucket), timestamp)
+        if not due:
+            return due
+        buckets = [bucket for _, bucket in due]
+        existing = db.execute(
+            select(DerivedReading.series, DerivedReading.bucket).where(
+                DerivedReading.device_id == device_id,
+                DerivedReading.series.in_({series for series, _ in due}),
+                DerivedReading.bucket.between(min(buckets), max(buckets))
+            )
+        ).all()
+        for series, bucket in existing:
+            self._remember(device_id, series, bucket)
+            due.pop((series, bucket), None)
+        return due
+
+    def _inputs(self, db: Session, device_id: str, sensor_type: str, since: float) -> List[Tuple[float, float]]:
+        """(unix time, value) readings of a device from `since` on, oldest first"""
+        model = SENSOR_MODELS[sensor_type]
+        value_column = getattr(model, SENSOR_VALUE_COLUMNS[sensor_type])
+        query = select(model.id, model.timestamp, value_column).where(model.device_id == device_id)
+        key = (device_id, sensor_type)
+        with self._lock:
+            cached = self._windows.get(key)
+        if cached is not None and cached[0] <= since:
+            complete_from, through_id, points = cached
+            rows = db.execute(query.where(model.id > through_id)).all()
+        else:
+            # First use, or older readings than the window holds (a late upload)
+            complete_from, through_id, points = since, 0, []
+            rows = db.execute(query.where(model.timestamp >= datetime.utcfromtimestamp(since))).all()
+        if rows:
+            points = sorted(points + [(_epoch(timestamp), value) for _, timestamp, value in rows])
+            through_id = max(through_id, max(row[0] for row in rows))
+
+            # Keep what the next buckets need, once the readings are committed
+            complete_from = max(complete_from, points[-1][0] - max(self.window_seconds, _PAIRING_SECONDS))
+            window = (complete_from, through_id, points[bisect.bisect_left(points, (complete_from,)):])
+
+            def keep():
+                with self._lock:
+                    current = self._windows.get(key)
+                    if current is None or current[1] < window[1]:
+                        self._windows[key] = window
+            _after_commit(db, keep)
+        return points[bisect.bisect_left(points, (since,)):]
+
+    def _slopes(self, points: List[Tuple[float, float]], targets: List[float]) -> List[Optional[float]]:
+        """Slope (per hour) of the window ending at each target time, targets ascending"""
+        window = SlopeWindow(self.window_seconds)
+        slopes = []
+        index = 0
+        for target in targets:
+            while index < len(points) and points[index][0] <= target + 1e-3:
+                window.add(*points[index])
+                index += 1
+            slopes.append(window.slope_per_hour())
+        return slopes
+
+    @staticmethod
+    def _dew_points(temperatures: List[Tuple[float, float]], humidities: List[Tuple[float, float]], targets: List[float]) -> List[Optional[float]]:
+        """Dew point from the latest temperature and humidity at each target time"""
+        values = []
+        for target in targets:
+            temperature = _latest(temperatures, target)
+            humidity = _latest(humidities, target)
+            if temperature is None or humidity is None or abs(temperature[0] - humidity[0]) > _PAIRING_SECONDS:
+                values.append(None)
+            else:
+                values.append(dew_point(temperature[1], humidity[1]))
+        return values
+
+    def derive(self, db: Session, device_id: str, readings: Iterable[tuple]) -> List[dict]:
+        """
+        Derived rows due for (sensor_type, value, naive UTC timestamp) readings
+
+        The readings must already be inserted (flushed) in the caller's transaction.
+        """
+        readings = [
+            (sensor_type, value, _epoch(timestamp)) for sensor_type, value, timestamp in readings
+            if sensor_type in INPUT_TYPES
+        ]
+        if not readings:
+            return []
+        due = self._due(db, device_id, readings)
+        if not due:
+            return []
+
+        first = min(due.values()) - max(self.window_seconds, _PAIRING_SECONDS)
+        inputs = {
+            sensor_type: self._inputs(db, device_id, sensor_type, first)
+            for sensor_type in {sensor_type for series, _ in due for sensor_type in DERIVED_SERIES[series]}
+        }
+        rows = []
+        for series in DERIVED_SERIES:
+            targets = sorted((timestamp, bucket) for (name, bucket), timestamp in due.items() if name == series)
+            if not targets:
+                continue
+            times = [timestamp for timestamp, _ in targets]
+            if series == "dew_point":
+                values = self._dew_points(inputs["temperature"], inputs["humidity"], times)
+            elif series == "weight_loss_rate":
+                values = [-slope if slope is not None else None for slope in self._slopes(inputs["weight"], times)]
+            else:
+                values = self._slopes(inputs["ph"], times)
+            rows.extend(
+                {
+                    "series": series,
+                    "device_id": device_id,
+                    "bucket": bucket,
+                    "value": round(value, 4),
+                    "timestamp": datetime.utcfromtimestamp(timestamp)
+                }
+                for (timestamp, bucket), value in zip(targets, values)
+                if value is not None
+            )
+        return rows
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "series": len(self._stored),
+                "windows": len(self._windows),
+                "window_points": sum(len(points) for _, _, points in self._windows.values())
+            }
+
+
+def _latest(points: List[Tuple[float, float]], timestamp: float) -> Optional[Tuple[float, float]]:
+    """Newest point at or before timestamp (points ascending)"""
+    index = bisect.bisect_right(points, (timestamp + 1e-3, math.inf)) - 1
+    return points[index] if index >= 0 else None
+
+
+derived_engine = DerivedSeriesEngine(settings.DERIVED_WINDOW_MINUTES * 60, settings.DERIVED_MIN_INTERVAL_SECONDS)
+
+
+def store_derived(db: Session, device_id: str, readings: Iterable[tuple]) -> int:
+    """Compute and insert derived values for new, already flushed readings (runs in the caller's transaction)"""
+    if not settings.DERIVED_SERIES_ENABLED:
+        return 0
+    rows = derived_engine.derive(db, device_id, readings)
+    if not rows:
+        return 0
+    # Stored by this insert or by another worker - either way the bucket is done
+    def remember():
+        for row in rows:
+            derived_engine._remember(device_id, row["series"], row["bucket"])
+    _after_commit(db, remember)
+    try:
+        with db.begin_nested():
+            db.execute(insert(DerivedReading), rows)
+        return len(rows)
+    except IntegrityError:
+        pass
+    # Another worker stored some of these buckets in the meantime
+    stored = 0
+    for row in rows:
+        try:
+            with db.begin_nested():
+                db.execute(insert(DerivedReading), [row])
+            stored += 1
+        except IntegrityError:
+            pass
+    return stored
+
+
+def fetch_derived(db: Session, series: str, days: int, device_id: Optional[str] = None) -> List[DerivedReading]:
+    """Get values of a derived series for the last N days, newest first"""
+    since = datetime.utcnow() - timedelta(days=days)
+    query = db.query(DerivedReading).filter(DerivedReading.series == series, DerivedReading.timestamp >= since)
+    if device_id:
+        query = query.filter(DerivedReading.device_id == device_id)
+    return query.order_by(DerivedReading.timestamp.desc()).all()
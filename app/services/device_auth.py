@@ -0,0 +1,121 @@
+"""
+Device Authentication Service
+
+Devices authenticate to /sensor/data with an API key in the
+X-Device-Key header. Keys are verified against an in-memory map of key
+hashes that is reloaded in the background, so there is no database
+round trip on the ingestion path.
+"""
+import hashlib
+import hmac
+import secrets
+import threading
+from typing import Dict, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models.device import DeviceCredential
+
+
+def _hash_key(key: str) -> str:
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+class DeviceKeyCache:
+    """
+    Device id -> key hash, swapped atomically on every reload
+
+    Keys changed by `set` while a reload was reading the database are
+    re-applied on top of the reloaded map, so a reload never undoes them.
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self.hits = 0
+        self.failures = 0
+        self.generation = 0
+        self._keys: Dict[str, str] = {}
+        self._changes: Dict[str, Tuple[int, Optional[str]]] = {}
+        self._lock = threading.Lock()
+
+    def load(self, keys: Dict[str, str], generation: int) -> None:
+        """Replace the map with keys read from the database after `generation` was taken"""
+        with self._lock:
+            for device_id, (changed_at, key_hash) in self._changes.items():
+                if changed_at <= generation:
+                    continue
+                if key_hash is None:
+                    keys.pop(device_id, None)
+                else:
+                    keys[device_id] = key_hash
+            self._changes = {
+                device_id: change for device_id, change in self._changes.items() if change[0] > generation
+            }
+            self._keys = keys
+            self.loaded = True
+
+    def set(self, device_id: str, key_hash: Optional[str]) -> None:
+        with self._lock:
+            self.generation += 1
+            self._changes[device_id] = (self.generation, key_hash)
+            keys = dict(self._keys)
+            if key_hash is None:
+                keys.pop(device_id, None)
+            else:
+                keys[device_id] = key_hash
+            self._keys = keys
+
+    def has_key(self, device_id: str) -> bool:
+        return device_id in self._keys
+
+    def verify(self, device_id: str, key: str) -> bool:
+        expected = self._keys.get(device_id)
+        ok = expected is not None and hmac.compare_digest(expected, _hash_key(key))
+        if ok:
+            self.hits += 1
+        else:
+            self.failures += 1
+        return ok
+
+    def stats(self) -> dict:
+        return {
+            "loaded": self.loaded,
+            "devices": len(self._keys),
+            "verified": self.hits,
+            "failed": self.failures
+        }
+
+
+device_key_cache = DeviceKeyCache()
+
+
+def refresh_device_keys() -> None:
+    """Reload all device keys into the cache (run periodically)"""
+    generation = device_key_cache.generation
+    db = SessionLocal()
+    try:
+        rows = db.query(DeviceCredential.device_id, DeviceCredential.key_hash).all()
+    finally:
+        db.close()
+    device_key_cache.load({device_id: key_hash for device_id, key_hash in rows}, generation)
+
+
+def create_device_key(db: Session, device_id: str) -> str:
+    """Create (or replace) the API key of a device and return it"""
+    key = "dk_" + secrets.token_urlsafe(32)
+    credential = db.query(DeviceCredential).filter(DeviceCredential.device_id == device_id).first()
+    if credential is None:
+        credential = DeviceCredential(device_id=device_id, key_hash=_hash_key(key))
+        db.add(credential)
+    else:
+        credential.key_hash = _hash_key(key)
+    db.commit()
+    device_key_cache.set(device_id, credential.key_hash)
+    return key
+
+
+def delete_device_key(db: Session, device_id: str) -> bool:
+    """Remove the API key of a device, returns False if it had none"""
+    deleted = db.query(DeviceCredential).filter(DeviceCredential.device_id == device_id).delete()
+    db.commit()
+    device_key_cache.set(device_id, None)
+    return bool(deleted)
@@ -0,0 +1,109 @@
+"""
+Device Catalogue Service
+
+Keeps `device_catalogue` up to date on ingestion so listing devices
+never has to scan the reading tables.
+"""
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy import case, func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models.device import DeviceSensor
+from app.models.readings import SENSOR_MODELS
+
+logger = logging.getLogger(__name__)
+
+
+def record_reading(
+    db: Session,
+    device_id: str,
+    sensor_type: str,
+    count: int = 1,
+    first_seen: Optional[datetime] = None,
+    last_seen: Optional[datetime] = None
+) -> None:
+    """Count new readings in the catalogue (runs in the caller's transaction)"""
+    values = {"reading_count": DeviceSensor.reading_count + count}
+    # Late uploads (a spooled backlog) only ever widen the seen range
+    values["last_seen"] = func.now() if last_seen is None else case(
+        (DeviceSensor.last_seen.is_(None), last_seen),
+        (DeviceSensor.last_seen < last_seen, last_seen),
+        else_=DeviceSensor.last_seen
+    )
+    if first_seen is not None:
+        values["first_seen"] = case(
+            (DeviceSensor.first_seen.is_(None), first_seen),
+            (DeviceSensor.first_seen > first_seen, first_seen),
+            else_=DeviceSensor.first_seen
+        )
+    increment = (
+        update(DeviceSensor)
+        .where(DeviceSensor.device_id == device_id, DeviceSensor.sensor_type == sensor_type)
+        .values(**values)
+    )
+    if db.execute(increment).rowcount:
+        return
+
+    # First reading of this sensor from this device (seen times default to now)
+    seen = {"first_seen": first_seen, "last_seen": last_seen}
+    try:
+        with db.begin_nested():
+            db.add(DeviceSensor(
+                device_id=device_id,
+                sensor_type=sensor_type,
+                reading_count=count,
+                **{name: value for name, value in seen.items() if value is not None}
+            ))
+    except IntegrityError:
+        # Another worker inserted the row in the meantime
+        db.execute(increment)
+
+
+def rebuild_catalogue(db: Session) -> None:
+    """Rebuild the catalogue from the reading tables (full scan, run once)"""
+    db.query(DeviceSensor).delete()
+    for sensor_type, model in SENSOR_MODELS.items():
+        rows = db.query(
+            model.device_id,
+            func.min(model.timestamp),
+            func.max(model.timestamp),
+            func.count(model.id)
+        ).group_by(model.device_id).all()
+        for device_id, first_seen, last_seen, count in rows:
+            db.add(DeviceSensor(
+                device_id=device_id,
+                sensor_type=sensor_type,
+                first_seen=first_seen,
+                last_seen=last_seen,
+                reading_count=count
+            ))
+    db.commit()
+
+
+def ensure_catalogue(db: Session) -> None:
+    """Backfill the catalogue if it is empty (first start after upgrade)"""
+    if db.query(DeviceSensor.id).first() is not None:
+        return
+    try:
+        rebuild_catalogue(db)
+        logger.info("Device catalogue rebuilt from reading tables")
+    except IntegrityError:
+        # Another worker did the backfill concurrently
+        db.rollback()
+
+
+def list_devices(db: Session) -> List[Dict]:
+    """List devices with per-sensor first/last seen and reading counts"""
+    devices: Dict[str, Dict] = {}
+    rows = db.query(DeviceSensor).order_by(DeviceSensor.device_id, DeviceSensor.sensor_type).all()
+    for row in rows:
+        device = devices.setdefault(row.device_id, {"device_id": row.device_id, "sensors": []})
+        device["sensors"].append({
+            "sensor_type": row.sensor_type,
+            "first_seen": row.first_seen,
+            "last_seen": row.last_seen,
+            "reading_count": row.reading_count
+        })
+    return list(devices.values())
@@ -0,0 +1,256 @@
+"""
+Export Service - Bulk export of readings as CSV or Parquet
+
+Rows are read in chunks of EXPORT_CHUNK_ROWS through `yield_per` with
+`stream_results`, so memory stays constant however long the range is:
+a CSV chunk is written out before the next one is fetched, and every
+chunk becomes one Parquet row group. Archived readings of the range
+are streamed from the archive files first, one month file at a time;
+archived rows still in the table (interrupted archiver run) are only
+exported from the table. Parquet needs the optional pyarrow package,
+imported on first use.
+
+Each export keeps one read connection for its whole duration, so the
+number of concurrent exports is limited (EXPORT_MAX_CONCURRENT).
+"""
+import csv
+import io
+import threading
+from datetime import datetime, timezone
+from typing import Callable, Iterator, List, Optional, Tuple
+from sqlalchemy import func, literal, select
+from app.config import get_settings
+from app.database import ReadSessionLocal
+from app.models.readings import SENSOR_MODELS, SENSOR_VALUE_COLUMNS, DerivedReading
+from app.services.archive import archived_batches, archived_until, count_archived
+from app.services.derived import DERIVED_SERIES
+
+settings = get_settings()
+
+EXPORT_COLUMNS = ("sensor_type", "id", "device_id", "timestamp", "value")
+# Rough bytes per row, used for the size hint header
+BYTES_PER_ROW = {"csv": 56, "parquet": 12}
+
+
+class ExportBusy(Exception):
+    """Too many exports are running"""
+
+
+class ExportUnavailable(Exception):
+    """The requested format needs a package that is not installed"""
+
+
+_export_slots = threading.BoundedSemaphore(settings.EXPORT_MAX_CONCURRENT)
+
+
+def _series_query(series: str, start: datetime, end: datetime, device_id: Optional[str]):
+    if series in DERIVED_SERIES:
+        model = DerivedReading
+        value_column = DerivedReading.value
+        conditions = [DerivedReading.series == series]
+    else:
+        model = SENSOR_MODELS[series]
+        value_column = getattr(model, SENSOR_VALUE_COLUMNS[series])
+        conditions = []
+    conditions += [model.timestamp >= start, model.timestamp < end]
+    if device_id:
+        conditions.append(model.device_id == device_id)
+    return model, value_column, conditions
+
+
+def _table_ids_in_archive_range(db, series: str, start: datetime, end: datetime, device_id: Optional[str]) -> List[int]:
+    """Ids of table rows not newer than the newest archived row - the only ones that can also be archived"""
+    until = archived_until(series)
+    if until is None or until < start:
+        return []
+    model, _, conditions = _series_query(series, start, end, device_id)
+    return db.execute(select(model.id).where(*conditions, model.timestamp <= until)).scalars().all()
+
+
+def count_rows(db, types: List[str], start: datetime, end: datetime, device_id: Optional[str] = None) -> int:
+    """Number of rows an export will contain (index range counts plus archived rows)"""
+    total = 0
+    for series in types:
+        model, _, conditions = _series_query(series, start, end, device_id)
+        total += db.execute(select(func.count(model.id)).where(*conditions)).scalar() or 0
+        if series in SENSOR_MODELS:
+            in_table = _table_ids_in_archive_range(db, series, start, end, device_id)
+            total += count_archived(series, start, end, device_id, exclude_ids=in_table)
+    return total
+
+
+def _utc(timestamp: datetime) -> datetime:
+    if timestamp.tzinfo is None:
+        return timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.astimezone(timezone.utc)
+
+
+def _archived_chunks(
+    series: str,
+    start: datetime,
+    end: datetime,
+    device_id: Optional[str],
+    chunk_rows: int,
+    exclude_ids: List[int]
+) -> Iterator[List[Tuple]]:
+    for batch in archived_batches(series, start, end, device_id, chunk_rows, exclude_ids):
+        columns = batch.to_pydict()
+        yield [
+            (series, row_id, device, timestamp, value)
+            for row_id, device, timestamp, value in zip(
+                columns["id"], columns["device_id"], columns["timestamp"], columns["value"]
+            )
+        ]
+
+
+def iter_chunks(
+    types: List[str],
+    start: datetime,
+    end: datetime,
+    device_id: Optional[str] = None,
+    chunk_rows: int = 10000
+) -> Iterator[List[Tuple]]:
+    """Rows (sensor_type, id, device_id, timestamp, value) in chunks, per series archived rows first, then by timestamp"""
+    db = ReadSessionLocal()
+    try:
+        for series in types:
+            if series in SENSOR_MODELS:
+                in_table = _table_ids_in_archive_range(db, series, start, end, device_id)
+                yield from _archived_chunks(series, start, end, device_id, chunk_rows, in_table)
+            model, value_column, conditions = _series_query(series, start, end, device_id)
+            query = (
+                select(literal(series), model.id, model.device_id, model.timestamp, value_column)
+                .where(*conditions)
+                .order_by(model.timestamp, model.id)
+                .execution_options(stream_results=True, yield_per=chunk_rows)
+            )
+            for partition in db.execute(query).partitions():
+                yield [(row[0], row[1], row[2], _utc(row[3]), row[4]) for row in partition]
+        db.rollback()
+    finally:
+        db.close()
+
+
+def _csv_stream(chunks: Iterator[List[Tuple]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(EXPORT_COLUMNS)
+    for chunk in chunks:
+        writer.writerows(
+            (sensor_type, row_id, device_id, timestamp.isoformat(), value)
+            for sensor_type, row_id, device_id, timestamp, value in chunk
+        )
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    tail = buffer.getvalue()
+    if tail:
+        yield tail.encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file collecting what pyarrow writes, drained after every row group"""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+def _parquet_stream(chunks: Iterator[List[Tuple]]) -> Iterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("sensor_type", pa.dictionary(pa.int8(), pa.string())),
+        ("id", pa.int64()),
+        ("device_id", pa.string()),
+        ("timestamp", pa.timestamp("us", tz="UTC")),
+        ("value", pa.float64()),
+    ])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        for chunk in chunks:
+            columns = list(zip(*chunk))
+            table = pa.Table.from_arrays(
+                [
+                    pa.array(columns[0], pa.string()).dictionary_encode().cast(schema.field("sensor_type").type),
+                    pa.array(columns[1], pa.int64()),
+                    pa.array(columns[2], pa.string()),
+                    pa.array(columns[3], schema.field("timestamp").type),
+                    pa.array(columns[4], pa.float64()),
+                ],
+                schema=schema
+            )
+            writer.write_table(table)
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+class _ExportSlot:
+    """One of the EXPORT_MAX_CONCURRENT slots, released at most once"""
+
+    def __init__(self):
+        self._released = False
+        self._lock = threading.Lock()
+
+    def release(self) -> None:
+        with self._lock:
+            if not self._released:
+                self._released = True
+                _export_slots.release()
+
+
+def export_stream(
+    export_format: str,
+    types: List[str],
+    start: datetime,
+    end: datetime,
+    device_id: Optional[str] = None
+) -> Tuple[Iterator[bytes], Callable[[], None]]:
+    """
+    Response body of an export and the function releasing its slot
+
+    Takes an export slot right away (raises ExportBusy when none is free).
+    The stream releases it when it ends; the caller must also call the
+    release function after the response (a stream that never started
+    cannot release it).
+    """
+    if export_format == "parquet":
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            raise ExportUnavailable("Parquet export needs the pyarrow package")
+    if not _export_slots.acquire(blocking=False):
+        raise ExportBusy()
+    slot = _ExportSlot()
+
+    def stream() -> Iterator[bytes]:
+        try:
+            chunks = iter_chunks(types, start, end, device_id, settings.EXPORT_CHUNK_ROWS)
+            if export_format == "parquet":
+                yield from _parquet_stream(chunks)
+            else:
+                yield from _csv_stream(chunks)
+        finally:
+            slot.release()
+
+    return stream(), slot.release
@@ -0,0 +1,74 @@
+"""
+Health Service - Background database probe and pool statistics
+"""
+import logging
+import time
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import text
+from app.database import engine, read_engine
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseProbe:
+    """Result of the last background `SELECT 1`"""
+
+    def __init__(self):
+        self.status = "unknown"
+        self.latency_ms: Optional[float] = None
+        self.checked_at: Optional[datetime] = None
+        self.error: Optional[str] = None
+
+    def stats(self) -> dict:
+        return {
+            "status": self.status,
+            "latency_ms": self.latency_ms,
+            "checked_at": self.checked_at.isoformat() if self.checked_at else None,
+            "error": self.error
+        }
+
+
+database_probe = DatabaseProbe()
+
+
+def probe_database() -> None:
+    """Check the database connection (run periodically, not per request)"""
+    start = time.perf_counter()
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+    except Exception as e:
+        if database_probe.status != "unhealthy":
+            logger.warning("Database probe failed: %s", e)
+        database_probe.status = "unhealthy"
+        database_probe.error = str(e)
+    else:
+        database_probe.status = "healthy"
+        database_probe.error = None
+    database_probe.latency_ms = round((time.perf_counter() - start) * 1000, 1)
+    database_probe.checked_at = datetime.utcnow()
+
+
+def _single_pool_stats(pool) -> dict:
+    size = pool.size() if hasattr(pool, "size") else None
+    checked_out = pool.checkedout() if hasattr(pool, "checkedout") else None
+    overflow = pool.overflow() if hasattr(pool, "overflow") else None
+    max_overflow = getattr(pool, "_max_overflow", 0)
+    capacity = (size or 0) + max(max_overflow, 0)
+    return {
+        "size": size,
+        "checked_out": checked_out,
+        "overflow": overflow,
+        "saturation": round(checked_out / capacity, 3) if capacity and checked_out is not None else None
+    }
+
+
+def pool_stats() -> dict:
+    """Connection pool usage of this worker (writer and reader pools in SQLite mode)"""
+    if read_engine is engine:
+        return _single_pool_stats(engine.pool)
+    return {
+        "writer": _single_pool_stats(engine.pool),
+        "reader": _single_pool_stats(read_engine.pool)
+    }
@@ -0,0 +1,84 @@
+"""
+Ingest Service - Batch uploads of readings
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from sqlalchemy import delete, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models.device import IngestedBatch
+from app.models.readings import SENSOR_MODELS, SENSOR_VALUE_COLUMNS
+from app.schemas.readings import BatchReading
+from app.services.derived import store_derived
+from app.services.devices import record_reading
+
+logger = logging.getLogger(__name__)
+
+
+class DuplicateBatch(Exception):
+    """The batch_id was already stored for this device"""
+
+
+def _naive_utc(timestamp: Optional[datetime], now: datetime) -> datetime:
+    if timestamp is None:
+        return now
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+def store_batch(
+    db: Session,
+    device_id: str,
+    readings: List[BatchReading],
+    batch_id: Optional[str] = None
+) -> Dict[str, int]:
+    """
+    Insert a batch of readings, one multi-row INSERT per sensor type
+
+    Derived series are updated from the batch as well. Runs in the
+    caller's transaction. Raises DuplicateBatch when the
+    batch_id was already stored - the caller should roll back.
+    Returns the number of stored readings per sensor type.
+    """
+    if batch_id is not None:
+        try:
+            with db.begin_nested():
+                db.add(IngestedBatch(device_id=device_id, batch_id=batch_id, reading_count=len(readings)))
+        except IntegrityError:
+            raise DuplicateBatch(batch_id)
+
+    now = datetime.utcnow()
+    rows_by_type = defaultdict(list)
+    for reading in readings:
+        rows_by_type[reading.type].append({
+            "device_id": device_id,
+            SENSOR_VALUE_COLUMNS[reading.type]: reading.value,
+            "timestamp": _naive_utc(reading.timestamp, now)
+        })
+
+    for sensor_type, rows in rows_by_type.items():
+        db.execute(insert(SENSOR_MODELS[sensor_type]), rows)
+        timestamps = [row["timestamp"] for row in rows]
+        record_reading(db, device_id, sensor_type, len(rows), min(timestamps), max(timestamps))
+    # After the inserts - derived values are computed from the stored readings
+    store_derived(db, device_id, (
+        (sensor_type, row[SENSOR_VALUE_COLUMNS[sensor_type]], row["timestamp"])
+        for sensor_type, rows in rows_by_type.items()
+        for row in rows
+    ))
+    return {sensor_type: len(rows) for sensor_type, rows in rows_by_type.items()}
+
+
+def purge_ingested_batches(retention_days: int) -> None:
+    """Forget batch ids older than the retention (periodic task)"""
+    db = SessionLocal()
+    try:
+        cutoff = datetime.utcnow() - timedelta(days=retention_days)
+        db.execute(delete(IngestedBatch).where(IngestedBatch.received_at < cutoff))
+        db.commit()
+    finally:
+        db.close()
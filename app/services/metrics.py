@@ -0,0 +1,134 @@
+"""
+Prometheus Metrics
+
+With several gunicorn workers set PROMETHEUS_MULTIPROC_DIR (see
+startup.sh) - every worker then writes its samples to that directory
+and /metrics aggregates all of them.
+"""
+import os
+import time
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+SENSOR_READINGS = Counter(
+    "sensor_readings_total",
+    "Ingested sensor readings by sensor type",
+    ["sensor_type"],
+)
+ALERTS_FIRED = Counter(
+    "alerts_fired_total",
+    "Alerts sent by sensor type and rule kind",
+    ["sensor_type", "kind"],
+)
+DB_QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds",
+    "Database statement latency by statement class",
+    ["statement"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled connection",
+    ["pool"],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+)
+DB_POOL_OVERFLOW_CHECKOUTS = Counter(
+    "db_pool_overflow_checkouts_total",
+    "Connection checkouts served while the pool was in overflow",
+    ["pool"],
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections",
+    "Connections currently checked out of the pool",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow_connections",
+    "Overflow connections currently open",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+AUTH_CACHE_REQUESTS = Counter(
+    "auth_cache_requests_total",
+    "Auth cache lookups by cache and result",
+    ["cache", "result"],
+)
+
+_STATEMENT_CLASSES = {"SELECT", "INSERT", "UPDATE", "DELETE", "BEGIN", "COMMIT", "ROLLBACK"}
+
+
+def statement_class(statement: str) -> str:
+    """First keyword of a SQL statement, used as a low-cardinality label"""
+    keyword = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return keyword if keyword in _STATEMENT_CLASSES else "OTHER"
+
+
+def pool_label(pool) -> str:
+    """Pool name used as metric label (`pool_logging_name` of the engine)"""
+    return getattr(pool, "logging_name", None) or "primary"
+
+
+def observe_checkout_wait(seconds: float, pool) -> None:
+    """Called by TimedQueuePool after every connection checkout"""
+    label = pool_label(pool)
+    DB_POOL_CHECKOUT_WAIT.labels(label).observe(seconds)
+    overflow = pool.overflow()
+    if overflow > 0:
+        DB_POOL_OVERFLOW_CHECKOUTS.labels(label).inc()
+    DB_POOL_CHECKED_OUT.labels(label).set(pool.checkedout())
+    DB_POOL_OVERFLOW.labels(label).set(max(overflow, 0))
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Record statement latency and pool usage of an engine"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["metrics_query_start"].pop()
+        DB_QUERY_LATENCY.labels(statement_class(statement)).observe(time.perf_counter() - start)
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(context):
+        starts = context.connection.info.get("metrics_query_start") if context.connection else None
+        if starts:
+            starts.pop()
+
+    @event.listens_for(engine, "checkin")
+    def _checkin(dbapi_connection, connection_record):
+        if hasattr(engine.pool, "checkedout"):
+            DB_POOL_CHECKED_OUT.labels(pool_label(engine.pool)).set(engine.pool.checkedout())
+
+    listeners = getattr(engine.pool, "checkout_listeners", None)
+    if listeners is not None and observe_checkout_wait not in listeners:
+        listeners.append(observe_checkout_wait)
+
+
+def render_metrics() -> tuple:
+    """Latest metrics in Prometheus text format and its content type"""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
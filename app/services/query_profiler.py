@@ -0,0 +1,185 @@
+"""
+Query Profiler - Statement timings, slow-query log and execution plans
+
+Statements are grouped by their normalized text (literals replaced by
+`?`). Statements slower than SLOW_QUERY_THRESHOLD_MS are logged with
+their parameters and row count. With QUERY_PLAN_CAPTURE the execution
+plan of the slowest SELECTs is captured on a separate connection in a
+background thread, so the request that ran the query is not affected.
+"""
+import heapq
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.config import get_settings
+
+logger = logging.getLogger("app.slow_query")
+settings = get_settings()
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_BIND_PARAM = re.compile(r"%\(\w+\)s|%s|:\w+|\?")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def normalize_statement(statement: str) -> str:
+    """Replace literals and bind parameters with `?` so similar statements group together"""
+    normalized = _STRING_LITERAL.sub("?", statement)
+    normalized = _BIND_PARAM.sub("?", normalized)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    normalized = _IN_LIST.sub("(...)", normalized)
+    return _WHITESPACE.sub(" ", normalized).strip()
+
+
+class QueryStats:
+    """Aggregated timings per normalized statement (bounded number of statements)"""
+
+    def __init__(self, max_statements: int, max_plans: int):
+        self.max_statements = max_statements
+        self.max_plans = max_plans
+        self._stats: Dict[str, dict] = {}
+        self._plans: List[tuple] = []  # min-heap of (elapsed_ms, seq, entry)
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, elapsed_ms: float, rows: int) -> None:
+        key = normalize_statement(statement)
+        with self._lock:
+            entry = self._stats.get(key)
+            if entry is None:
+                if len(self._stats) >= self.max_statements:
+                    key = "<other statements>"
+                    entry = self._stats.get(key)
+                if entry is None:
+                    entry = self._stats[key] = {
+                        "statement": key, "count": 0, "total_ms": 0.0, "max_ms": 0.0, "rows": 0
+                    }
+            entry["count"] += 1
+            entry["total_ms"] += elapsed_ms
+            entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+            if rows > 0:
+                entry["rows"] += rows
+
+    def wants_plan(self, elapsed_ms: float) -> bool:
+        with self._lock:
+            return len(self._plans) < self.max_plans or elapsed_ms > self._plans[0][0]
+
+    def add_plan(self, statement: str, parameters, elapsed_ms: float, plan: List[str]) -> None:
+        key = normalize_statement(statement)
+        with self._lock:
+            # Keep one plan per normalized statement - the slowest one
+            for index, (existing_ms, _, existing) in enumerate(self._plans):
+                if existing["normalized"] == key:
+                    if existing_ms >= elapsed_ms:
+                        return
+                    self._plans.pop(index)
+                    heapq.heapify(self._plans)
+                    break
+            self._seq += 1
+            entry = {
+                "normalized": key,
+                "statement": statement,
+                "parameters": repr(parameters)[:500],
+                "elapsed_ms": round(elapsed_ms, 2),
+                "plan": plan
+            }
+            if len(self._plans) < self.max_plans:
+                heapq.heappush(self._plans, (elapsed_ms, self._seq, entry))
+            else:
+                heapq.heappushpop(self._plans, (elapsed_ms, self._seq, entry))
+
+    def top(self, limit: int, order_by: str = "total_ms") -> List[dict]:
+        with self._lock:
+            entries = sorted(self._stats.values(), key=lambda e: e[order_by], reverse=True)[:limit]
+            return [
+                {
+                    **entry,
+                    "total_ms": round(entry["total_ms"], 2),
+                    "max_ms": round(entry["max_ms"], 2),
+                    "avg_ms": round(entry["total_ms"] / entry["count"], 2)
+                }
+                for entry in entries
+            ]
+
+    def slowest_plans(self) -> List[dict]:
+        with self._lock:
+            return [entry for _, _, entry in sorted(self._plans, reverse=True)]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+            self._plans.clear()
+
+
+query_stats = QueryStats(settings.QUERY_STATS_MAX_STATEMENTS, settings.QUERY_PLAN_SLOWEST)
+_plan_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="query-plan")
+
+
+def _capture_plan(engine: Engine, statement: str, parameters, elapsed_ms: float) -> None:
+    """Run the dialect's EXPLAIN for a statement on a separate connection"""
+    try:
+        # Per-connection execution option: unlike connection.info it is
+        # not kept by the pooled DBAPI connection after this checkout
+        with engine.connect().execution_options(query_profiler_internal=True) as connection:
+            dialect = engine.dialect.name
+            if dialect == "mssql":
+                connection.exec_driver_sql("SET SHOWPLAN_TEXT ON")
+                try:
+                    rows = connection.exec_driver_sql(statement, parameters).fetchall()
+                finally:
+                    connection.exec_driver_sql("SET SHOWPLAN_TEXT OFF")
+            elif dialect == "sqlite":
+                rows = connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+            else:
+                rows = connection.exec_driver_sql("EXPLAIN " + statement, parameters).fetchall()
+            connection.rollback()
+        plan = [" ".join(str(column) for column in row) for row in rows]
+        query_stats.add_plan(statement, parameters, elapsed_ms, plan)
+    except Exception:
+        logger.exception("Could not capture execution plan")
+
+
+def install_query_profiler(engine: Engine) -> None:
+    """Record statement timings of an engine and log slow statements"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_profiler_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info["query_profiler_start"].pop()) * 1000
+        if conn.get_execution_options().get("query_profiler_internal"):
+            return
+        rows = cursor.rowcount if cursor.rowcount is not None else -1
+        query_stats.record(statement, elapsed_ms, rows)
+
+        if elapsed_ms < settings.SLOW_QUERY_THRESHOLD_MS:
+            return
+        logger.warning(
+            "Slow query (%.1f ms, rows=%s): %s | params=%s",
+            elapsed_ms, rows, _WHITESPACE.sub(" ", statement), repr(parameters)[:500]
+        )
+        if (
+            settings.QUERY_PLAN_CAPTURE
+            and not executemany
+            and statement.lstrip().upper().startswith("SELECT")
+            and query_stats.wants_plan(elapsed_ms)
+        ):
+            _plan_executor.submit(_capture_plan, engine, statement, parameters, elapsed_ms)
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(context):
+        starts: Optional[list] = (
+            context.connection.info.get("query_profiler_start") if context.connection else None
+        )
+        if starts:
+            starts.pop()
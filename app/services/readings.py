@@ -0,0 +1,53 @@
+"""
+Readings Service - Shared queries for sensor readings
+
+When the window reaches past ARCHIVE_AFTER_DAYS, archived readings are
+merged in (see app.services.archive).
+"""
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.config import get_settings
+from app.database import ReadSessionLocal
+from app.models.readings import SENSOR_MODELS
+from app.services.archive import archive_enabled, fetch_archived, merge_readings
+
+settings = get_settings()
+
+
+def fetch_readings(
+    db: Session,
+    sensor_type: str,
+    days: int,
+    device_id: Optional[str] = None
+) -> List:
+    """Get readings of one sensor type for the last N days, newest first"""
+    model = SENSOR_MODELS[sensor_type]
+    since = datetime.utcnow() - timedelta(days=days)
+    query = db.query(model).filter(model.timestamp >= since)
+    if device_id:
+        query = query.filter(model.device_id == device_id)
+    readings = query.order_by(model.timestamp.desc()).all()
+    if archive_enabled() and days >= settings.ARCHIVE_AFTER_DAYS:
+        readings = merge_readings(readings, fetch_archived(sensor_type, since, device_id=device_id))
+    return readings
+
+
+def _fetch_in_own_session(sensor_type: str, days: int, device_id: Optional[str]) -> List:
+    """Run fetch_readings on a separate pooled (read) connection"""
+    db = ReadSessionLocal()
+    try:
+        return fetch_readings(db, sensor_type, days, device_id)
+    finally:
+        db.close()
+
+
+async def fetch_all_readings(days: int, device_id: Optional[str] = None) -> Dict[str, List]:
+    """Get readings of every sensor type, querying all tables concurrently"""
+    results = await asyncio.gather(*(
+        run_in_threadpool(_fetch_in_own_session, sensor_type, days, device_id)
+        for sensor_type in SENSOR_MODELS
+    ))
+    return dict(zip(SENSOR_MODELS, results))
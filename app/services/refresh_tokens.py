@@ -0,0 +1,140 @@
+"""
+Refresh Token Service
+
+Refresh tokens let clients renew access tokens with a single indexed
+lookup instead of a bcrypt password check. Tokens are opaque random
+strings; only their SHA-256 hash is stored.
+
+Rotated and revoked tokens are only kept as long as they are useful
+(see `purge_refresh_tokens`), so an active client does not leave a row
+behind for every refresh.
+"""
+import hashlib
+import secrets
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+from sqlalchemy import delete, exists, select
+from sqlalchemy.orm import Session, aliased
+from app.config import get_settings
+from app.database import SessionLocal
+from app.models.refresh_token import RefreshToken
+from app.models.user import User
+from app.services.auth import get_user_by_id
+
+settings = get_settings()
+
+
+def _hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def issue_refresh_token(db: Session, user: User, family_id: Optional[str] = None) -> str:
+    """Create a new refresh token for the user (starts a new family by default)"""
+    now = datetime.utcnow()
+    token = secrets.token_urlsafe(32)
+    db.add(RefreshToken(
+        user_id=user.id,
+        token_hash=_hash_token(token),
+        family_id=family_id or secrets.token_hex(16),
+        expires_at=now + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    ))
+    db.commit()
+    return token
+
+
+def rotate_refresh_token(db: Session, token: str) -> Optional[Tuple[User, str]]:
+    """
+    Exchange a refresh token for a new one
+
+    Returns the user and the new token, or None when the token is
+    unknown, expired, revoked or its user is no longer active. Presenting
+    an already rotated token revokes every token of its family.
+    """
+    stored = db.query(RefreshToken).filter(
+        RefreshToken.token_hash == _hash_token(token)
+    ).first()
+    if stored is None:
+        return None
+
+    if stored.revoked:
+        # Reuse of a rotated token - the family may be stolen
+        _revoke_family(db, stored.family_id)
+        db.commit()
+        return None
+
+    if stored.expires_at < datetime.utcnow():
+        return None
+
+    user = get_user_by_id(db, stored.user_id)
+    if user is None or not user.is_active:
+        return None
+
+    # Claim the token atomically so concurrent refreshes cannot both succeed
+    claimed = db.query(RefreshToken).filter(
+        RefreshToken.id == stored.id,
+        RefreshToken.revoked == False  # noqa: E712
+    ).update({RefreshToken.revoked: True}, synchronize_session=False)
+    if not claimed:
+        db.rollback()
+        return None
+    return user, issue_refresh_token(db, user, family_id=stored.family_id)
+
+
+def revoke_refresh_token(db: Session, token: str) -> None:
+    """Revoke a refresh token together with all tokens rotated from the same login"""
+    stored = db.query(RefreshToken).filter(
+        RefreshToken.token_hash == _hash_token(token)
+    ).first()
+    if stored is not None:
+        _revoke_family(db, stored.family_id)
+        db.commit()
+
+
+def revoke_user_refresh_tokens(db: Session, user_id: int) -> None:
+    """Revoke every refresh token of a user (caller commits)"""
+    db.query(RefreshToken).filter(
+        RefreshToken.user_id == user_id,
+        RefreshToken.revoked == False  # noqa: E712
+    ).update({RefreshToken.revoked: True}, synchronize_session=False)
+
+
+def _revoke_family(db: Session, family_id: str) -> None:
+    db.query(RefreshToken).filter(
+        RefreshToken.family_id == family_id,
+        RefreshToken.revoked == False  # noqa: E712
+    ).update({RefreshToken.revoked: True}, synchronize_session=False)
+
+
+def purge_refresh_tokens(reuse_window_hours: int) -> None:
+    """
+    Delete refresh tokens that can no longer be used (periodic task)
+
+    - expired tokens
+    - every token of a family without a live token (logout, reuse, password change)
+    - rotated tokens whose successor was issued more than the reuse window
+      ago - presenting one after that is rejected as unknown instead of
+      revoking its family
+    """
+    now = datetime.utcnow()
+    lifetime = timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    successor = aliased(RefreshToken)
+    db = SessionLocal()
+    try:
+        db.execute(delete(RefreshToken).where(RefreshToken.expires_at < now))
+        db.execute(delete(RefreshToken).where(
+            RefreshToken.family_id.not_in(
+                select(RefreshToken.family_id).where(RefreshToken.revoked == False)  # noqa: E712
+            )
+        ))
+        # A successor's expiry tells when it was issued, i.e. when its predecessor was rotated
+        db.execute(delete(RefreshToken).where(
+            RefreshToken.revoked == True,  # noqa: E712
+            exists().where(
+                successor.family_id == RefreshToken.family_id,
+                successor.id > RefreshToken.id,
+                successor.expires_at < now - timedelta(hours=reuse_window_hours) + lifetime
+            )
+        ))
+        db.commit()
+    finally:
+        db.close()
@@ -0,0 +1,133 @@
+"""
+Resample Service - Several sensor series aligned on one time grid
+
+Each series is fetched with one range scan (id, timestamp and value
+columns only) plus the archived months it overlaps, averaged into grid
+buckets and gap-filled with vectorized NumPy operations - no per-row
+Python work beyond reading the rows.
+"""
+import re
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.models.readings import SENSOR_MODELS, SENSOR_VALUE_COLUMNS, DerivedReading
+from app.services.archive import archived_arrays
+from app.services.derived import DERIVED_SERIES
+
+MAX_GRID_POINTS = 20000
+
+_STEP_PATTERN = re.compile(r"^(\d+)([smhd])$")
+_STEP_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_step(step: str) -> int:
+    """Grid step like "30s", "5m", "1h" or "1d", in seconds"""
+    match = _STEP_PATTERN.match(step.strip())
+    if match is None or int(match[1]) == 0:
+        raise ValueError(f"Invalid step {step!r}, use e.g. 30s, 5m, 1h or 1d")
+    return int(match[1]) * _STEP_UNITS[match[2]]
+
+
+def _series_query(series: str, since: datetime, device_id: Optional[str]):
+    if series in DERIVED_SERIES:
+        query = select(DerivedReading.id, DerivedReading.timestamp, DerivedReading.value).where(
+            DerivedReading.series == series, DerivedReading.timestamp >= since
+        )
+        if device_id:
+            query = query.where(DerivedReading.device_id == device_id)
+        return query
+    model = SENSOR_MODELS[series]
+    query = select(model.id, model.timestamp, getattr(model, SENSOR_VALUE_COLUMNS[series])).where(model.timestamp >= since)
+    if device_id:
+        query = query.where(model.device_id == device_id)
+    return query
+
+
+def _to_seconds(timestamps: List[datetime]) -> np.ndarray:
+    """Datetimes (naive = UTC) as float seconds since the epoch"""
+    naive = [t.astimezone(timezone.utc).replace(tzinfo=None) if t.tzinfo else t for t in timestamps]
+    return np.array(naive, dtype="datetime64[us]").astype(np.int64) / 1e6
+
+
+def series_arrays(
+    db: Session,
+    series: str,
+    since: datetime,
+    device_id: Optional[str] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Unix seconds and values of a series since a point in time, hot and archived rows, unordered"""
+    rows = db.execute(_series_query(series, since, device_id)).all()
+    if rows:
+        ids, timestamps, values = zip(*rows)
+        ids = np.asarray(ids, dtype=np.int64)
+        seconds = _to_seconds(timestamps)
+        values = np.asarray(values, dtype=np.float64)
+    else:
+        ids, seconds, values = np.empty(0, np.int64), np.empty(0), np.empty(0)
+    archived = archived_arrays(series, since, device_id=device_id) if series in SENSOR_MODELS else None
+    if archived is not None:
+        # Archived rows still in the table (interrupted archiver run) count once
+        keep = ~np.isin(archived[0], ids)
+        seconds = np.concatenate([seconds, archived[1][keep]])
+        values = np.concatenate([values, archived[2][keep]])
+    return seconds, values
+
+
+def _fill(values: np.ndarray, method: str) -> np.ndarray:
+    """Fill empty (NaN) buckets between the first and last measured bucket"""
+    present = ~np.isnan(values)
+    if method == "none" or present.sum() == 0:
+        return values
+    indexes = np.arange(len(values))
+    first, last = indexes[present][0], indexes[present][-1]
+    if method == "linear":
+        filled = np.interp(indexes, indexes[present], values[present])
+    else:
+        # Index of the last measured bucket at or before each bucket
+        last_seen = np.maximum.accumulate(np.where(present, indexes, 0))
+        filled = values[last_seen]
+    # Never extrapolate before the first or after the last measurement
+    filled[:first] = np.nan
+    filled[last + 1:] = np.nan
+    return filled
+
+
+def resample(
+    db: Session,
+    types: List[str],
+    step_seconds: int,
+    days: int,
+    fill: str,
+    device_id: Optional[str] = None
+) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """
+    Bucket means of each series on a common grid covering the last N days
+
+    Returns the grid (bucket start, Unix seconds) and one array per
+    series, NaN where a bucket has no value after filling.
+    """
+    now = datetime.now(timezone.utc)
+    end = int(now.timestamp())
+    start = (end - days * 86400) // step_seconds * step_seconds
+    size = (end - start) // step_seconds + 1
+    if size > MAX_GRID_POINTS:
+        raise ValueError(f"The grid would have {size} points, use a larger step or fewer days (max {MAX_GRID_POINTS})")
+    grid = start + np.arange(size, dtype=np.int64) * step_seconds
+    since = datetime.utcfromtimestamp(start)
+
+    columns = {}
+    for series in types:
+        seconds, values = series_arrays(db, series, since, device_id)
+        if len(values) == 0:
+            columns[series] = np.full(size, np.nan)
+            continue
+        buckets = ((seconds - start) // step_seconds).astype(np.int64)
+        inside = (buckets >= 0) & (buckets < size)
+        buckets, values = buckets[inside], values[inside]
+        counts = np.bincount(buckets, minlength=size)
+        sums = np.bincount(buckets, weights=values, minlength=size)
+        means = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+        columns[series] = _fill(means, fill)
+    return grid, columns
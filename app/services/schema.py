@@ -0,0 +1,94 @@
+"""
+Schema Service - One-time schema check at startup
+
+`prepare_database` runs once per deployment: in the gunicorn master
+before workers are forked (see gunicorn.conf.py), or in the process
+itself when started without gunicorn. Workers see SCHEMA_READY_ENV and
+skip it.
+"""
+import logging
+import os
+from sqlalchemy import inspect, select, text, update
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from sqlalchemy.schema import CreateColumn
+from app.database import Base, SessionLocal, engine
+from app.models import SchemaVersion
+from app.services.devices import ensure_catalogue
+
+logger = logging.getLogger(__name__)
+
+# Bump when tables or columns are added so existing databases get create_all again
+SCHEMA_VERSION = 5
+SCHEMA_READY_ENV = "BREWERY_SCHEMA_READY"
+
+
+def add_missing_columns() -> None:
+    """
+    Add columns that create_all skips because their table already exists
+
+    Only nullable columns or columns with a server default can be added
+    this way, anything else needs a manual migration.
+    """
+    with engine.connect() as connection:
+        inspector = inspect(connection)
+        missing = [
+            (table, column)
+            for table in Base.metadata.sorted_tables if inspector.has_table(table.name)
+            for column in table.columns
+            if column.name not in {c["name"] for c in inspector.get_columns(table.name)}
+        ]
+    add = "ADD" if engine.dialect.name == "mssql" else "ADD COLUMN"
+    for table, column in missing:
+        if not column.nullable and column.server_default is None:
+            logger.warning("Cannot add column %s.%s without a server default", table.name, column.name)
+            continue
+        ddl = CreateColumn(column).compile(dialect=engine.dialect)
+        try:
+            with engine.begin() as connection:
+                connection.execute(text(f"ALTER TABLE {table.name} {add} {ddl}"))
+        except DBAPIError as exc:
+            logger.warning("Could not add column %s.%s: %s", table.name, column.name, exc.orig)
+            continue
+        logger.info("Added column %s.%s", table.name, column.name)
+
+
+def ensure_schema() -> bool:
+    """Create missing tables unless the stored schema version is current, returns True if it ran"""
+    if inspect(engine).has_table(SchemaVersion.__tablename__):
+        with engine.connect() as connection:
+            current = connection.execute(select(SchemaVersion.version)).scalar()
+        if current == SCHEMA_VERSION:
+            return False
+    else:
+        current = None
+
+    Base.metadata.create_all(bind=engine)
+    add_missing_columns()
+    try:
+        with engine.begin() as connection:
+            if current is None:
+                connection.execute(SchemaVersion.__table__.insert().values(id=1, version=SCHEMA_VERSION))
+            else:
+                connection.execute(update(SchemaVersion).values(version=SCHEMA_VERSION))
+    except IntegrityError:
+        # Another process recorded the version concurrently
+        pass
+    logger.info("Database schema updated from version %s to %s", current, SCHEMA_VERSION)
+    return True
+
+
+def prepare_database() -> None:
+    """Schema check and device catalogue backfill"""
+    ensure_schema()
+    db = SessionLocal()
+    try:
+        ensure_catalogue(db)
+    except Exception:
+        logger.exception("Device catalogue backfill failed")
+    finally:
+        db.close()
+
+
+def database_prepared() -> bool:
+    """True when the gunicorn master already ran prepare_database for this schema version"""
+    return os.environ.get(SCHEMA_READY_ENV) == str(SCHEMA_VERSION)
@@ -0,0 +1,74 @@
+"""
+Startup Report - How long startup phases took and worker memory
+
+Import this module before anything heavy so the import phase is
+measured. With gunicorn `preload_app` the import phases run once in the
+master; `worker_forked` (called from gunicorn.conf.py) keeps them as
+`master_ms` and restarts the clock for the worker's own phases.
+"""
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _memory_mb() -> Dict[str, Optional[float]]:
+    """Resident and private (not shared copy-on-write) memory of this process"""
+    memory = {"rss_mb": None, "private_mb": None}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if name == "Rss":
+                    memory["rss_mb"] = round(int(value.split()[0]) / 1024, 1)
+                elif name in ("Private_Clean", "Private_Dirty"):
+                    memory["private_mb"] = round((memory["private_mb"] or 0) + int(value.split()[0]) / 1024, 1)
+    except OSError:
+        pass
+    return memory
+
+
+class StartupReport:
+    """Duration of named startup phases, in order"""
+
+    def __init__(self):
+        self._last = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.master_phases: Dict[str, float] = {}
+        self.completed = False
+
+    def mark(self, phase: str) -> None:
+        """End the current phase"""
+        now = time.perf_counter()
+        self.phases[phase] = round((now - self._last) * 1000, 1)
+        self._last = now
+
+    def worker_forked(self) -> None:
+        self.master_phases = self.phases
+        self.phases = {}
+        self._last = time.perf_counter()
+
+    def complete(self) -> None:
+        self.completed = True
+        stats = self.stats()
+        logger.info(
+            "Startup complete in %.0f ms (%s), rss %s MB, private %s MB",
+            stats["total_ms"],
+            ", ".join(f"{name} {ms:.0f} ms" for name, ms in self.phases.items()),
+            stats["rss_mb"], stats["private_mb"]
+        )
+
+    def stats(self) -> dict:
+        return {
+            "pid": os.getpid(),
+            "preloaded": bool(self.master_phases),
+            "master_ms": self.master_phases,
+            "phases_ms": self.phases,
+            "total_ms": round(sum(self.phases.values()), 1),
+            **_memory_mb()
+        }
+
+
+startup_report = StartupReport()
@@ -0,0 +1,30 @@
+"""
+Background Tasks - Periodic jobs running inside each worker
+"""
+import asyncio
+import logging
+from typing import Callable, List
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+
+async def _run_periodically(name: str, interval: float, func: Callable[[], None]) -> None:
+    while True:
+        try:
+            await run_in_threadpool(func)
+        except Exception:
+            logger.exception("Background task %s failed", name)
+        await asyncio.sleep(interval)
+
+
+def start_periodic(name: str, interval: float, func: Callable[[], None]) -> asyncio.Task:
+    """Run a blocking function now and then every `interval` seconds"""
+    return asyncio.create_task(_run_periodically(name, interval, func), name=name)
+
+
+async def stop_tasks(tasks: List[asyncio.Task]) -> None:
+    """Cancel background tasks and wait for them to finish"""
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,86 @@
+"""
+Shared benchmark setup - local SQLite database and seeded synthetic data
+"""
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+# Only used until setup_database() points the app at the benchmark database
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "brewery-bench.db"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert
+from sqlalchemy.engine import Engine
+
+from app import database
+from app.models.readings import SENSOR_MODELS, SENSOR_VALUE_COLUMNS
+
+# Typical value and noise per sensor type
+SENSOR_PROFILES = {
+    "temperature": (20.0, 1.5),
+    "ph": (4.5, 0.3),
+    "weight": (25.0, 2.0),
+    "outsideTemp": (12.0, 6.0),
+    "humidity": (60.0, 10.0),
+    "pressure": (1013.0, 8.0),
+}
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def setup_database(path: str = None) -> Engine:
+    """Point the app at a fresh embedded SQLite database (temporary file by default)"""
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(prefix="brewery-bench-"), "bench.db")
+    engine, read_engine = database.create_engines(f"sqlite:///{path}")
+    database.SessionLocal.configure(bind=engine)
+    database.ReadSessionLocal.configure(bind=read_engine)
+    database.Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def generate_readings(
+    engine: Engine,
+    days: int,
+    per_hour: int,
+    devices: int = 2,
+    seed: int = 42,
+    sensor_types=None,
+) -> int:
+    """
+    Insert synthetic readings covering the last N days
+
+    Values follow a slow daily cycle plus Gaussian noise. The same seed
+    always produces the same rows. Returns the number of rows inserted.
+    """
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    step = timedelta(hours=1) / per_hour
+    samples = days * 24 * per_hour
+    total = 0
+    with engine.begin() as connection:
+        for sensor_type in sensor_types or SENSOR_MODELS:
+            model = SENSOR_MODELS[sensor_type]
+            value_column = SENSOR_VALUE_COLUMNS[sensor_type]
+            mean, noise = SENSOR_PROFILES[sensor_type]
+            rows = []
+            for i in range(samples):
+                timestamp = now - step * (samples - i)
+                daily = (timestamp.hour - 12) / 12 * noise
+                for device in range(devices):
+                    rows.append({
+                        "device_id": f"bench-device-{device}",
+                        value_column: round(mean + daily + rng.gauss(0, noise / 3), 3),
+                        "timestamp": timestamp,
+                    })
+            connection.execute(insert(model), rows)
+            total += len(rows)
+    return total
@@ -0,0 +1,200 @@
+"""
+Fleet Load Generator
+
+Simulates N brewery devices posting to /sensor/data while M mobile
+clients log in and poll /readings/*, against a running server:
+
+    python -m benchmarks.fleet_load --base-url http://localhost:8000 \\
+        --devices 200 --interval 5 --jitter 0.5 --clients 20 --duration 120
+
+Devices send one reading every `--interval` seconds (+/- `--jitter`
+fraction). With `--burst-probability` a device sometimes sends a burst
+of `--burst-size` readings back to back, like a Pi flushing after a
+network outage. Mobile clients log in once (users are registered on
+first run) and then poll a random readings endpoint every
+`--poll-interval` seconds.
+
+Readings and polls are sent on a fixed schedule (open loop): a slow
+response does not delay the next request, and latency is measured from
+the scheduled send time, so queueing in the server shows up in the
+percentiles instead of silently lowering the request rate.
+
+Prints throughput and p50/p95/p99 latency per endpoint, optionally
+writing them as JSON with `--output`. To find where the production
+setup tops out, start the server with startup.sh (gunicorn, 4 uvicorn
+workers) and raise `--devices` until p99 or the error count climbs.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+from benchmarks.common import SENSOR_PROFILES, percentile
+
+import httpx
+
+READINGS_ENDPOINTS = [
+    "/readings/temperature", "/readings/ph", "/readings/weight",
+    "/readings/outsideTemp", "/readings/humidity", "/readings/pressure",
+    "/readings/all",
+]
+
+
+class Recorder:
+    """Latencies and errors per endpoint"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    async def request(self, client: httpx.AsyncClient, name: str, method: str, url: str,
+                      expected=(), scheduled: float = None, **kwargs):
+        """Send one request, timing it from `scheduled` (time.perf_counter()) if given"""
+        start = time.perf_counter() if scheduled is None else scheduled
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.errors[name] += 1
+            return None
+        self.latencies[name].append((time.perf_counter() - start) * 1000)
+        if response.status_code >= 400 and response.status_code not in expected:
+            self.errors[name] += 1
+        return response
+
+    def report(self, elapsed: float) -> Dict[str, Dict]:
+        report = {}
+        for name in sorted(set(self.latencies) | set(self.errors)):
+            samples = self.latencies.get(name, [])
+            report[name] = {
+                "requests": len(samples),
+                "errors": self.errors.get(name, 0),
+                "throughput_rps": round(len(samples) / elapsed, 2),
+                "p50_ms": round(percentile(samples, 50), 1) if samples else None,
+                "p95_ms": round(percentile(samples, 95), 1) if samples else None,
+                "p99_ms": round(percentile(samples, 99), 1) if samples else None,
+                "max_ms": round(max(samples), 1) if samples else None,
+            }
+        return report
+
+
+async def device(client, recorder: Recorder, index: int, args, stop_at: float):
+    rng = random.Random(args.seed + index)
+    device_id = f"loadtest-device-{index}"
+    key = args.device_keys.get(device_id)
+    headers = {"X-Device-Key": key} if key else {}
+
+    async def send(readings, scheduled):
+        # A burst goes out back to back, like the Pi flushing its spool
+        for sensor_type, value in readings:
+            await recorder.request(
+                client, "POST /sensor/data", "POST", "/sensor/data", scheduled=scheduled,
+                json={"type": sensor_type, "value": value, "device_id": device_id},
+                headers=headers,
+            )
+            scheduled = None
+
+    tasks = []
+    # Spread device start times over one interval
+    scheduled = time.perf_counter() + rng.uniform(0, args.interval)
+    while scheduled < stop_at:
+        await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+        burst = args.burst_size if rng.random() < args.burst_probability else 1
+        readings = []
+        for _ in range(burst):
+            sensor_type = rng.choice(list(SENSOR_PROFILES))
+            mean, noise = SENSOR_PROFILES[sensor_type]
+            readings.append((sensor_type, round(rng.gauss(mean, noise), 3)))
+        tasks.append(asyncio.create_task(send(readings, scheduled)))
+        scheduled += args.interval * (1 + rng.uniform(-args.jitter, args.jitter))
+    await asyncio.gather(*tasks)
+
+
+async def mobile_client(client, recorder: Recorder, index: int, args, stop_at: float):
+    rng = random.Random(args.seed * 1000 + index)
+    username = f"loadtest-user-{index}"
+    password = "loadtest-password"
+    response = await recorder.request(
+        client, "POST /login", "POST", "/login", expected=(401,),
+        data={"username": username, "password": password}
+    )
+    if response is not None and response.status_code == 401:
+        await recorder.request(
+            client, "POST /register", "POST", "/register",
+            json={"email": f"{username}@example.com", "username": username, "password": password},
+        )
+        response = await recorder.request(
+            client, "POST /login", "POST", "/login", data={"username": username, "password": password}
+        )
+    if response is None or response.status_code != 200:
+        return
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    tasks = []
+    scheduled = time.perf_counter()
+    while scheduled < stop_at:
+        await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+        endpoint = rng.choice(READINGS_ENDPOINTS)
+        tasks.append(asyncio.create_task(recorder.request(
+            client, f"GET {endpoint}", "GET", endpoint, scheduled=scheduled,
+            params={"days": args.days}, headers=headers
+        )))
+        scheduled += args.poll_interval * (1 + rng.uniform(-args.jitter, args.jitter))
+    await asyncio.gather(*tasks)
+
+
+async def main(args):
+    recorder = Recorder()
+    # No connection cap: with an open-loop schedule, requests still waiting
+    # for a slow server must not hold back the ones scheduled after them
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=args.devices + args.clients)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        start = time.perf_counter()
+        stop_at = start + args.duration
+        await asyncio.gather(
+            *(device(client, recorder, i, args, stop_at) for i in range(args.devices)),
+            *(mobile_client(client, recorder, i, args, stop_at) for i in range(args.clients)),
+        )
+        elapsed = time.perf_counter() - start
+
+    report = recorder.report(elapsed)
+    print(f"{args.devices} devices, {args.clients} mobile clients, {elapsed:.0f} s\n")
+    print(f"{'endpoint':<30} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for name, stats in report.items():
+        def ms(value):
+            return f"{value:.1f}" if value is not None else "-"
+        print(
+            f"{name:<30} {stats['requests']:>9} {stats['errors']:>7} {stats['throughput_rps']:>8.1f} "
+            f"{ms(stats['p50_ms']):>8} {ms(stats['p95_ms']):>8} {ms(stats['p99_ms']):>8}"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": {k: v for k, v in vars(args).items() if k != "device_keys"}, "elapsed_s": round(elapsed, 1), "endpoints": report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--devices", type=int, default=50, help="Simulated devices (N)")
+    parser.add_argument("--interval", type=float, default=5.0, help="Seconds between device readings")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Random +/- fraction of the interval")
+    parser.add_argument("--burst-probability", type=float, default=0.0, help="Chance a device sends a burst")
+    parser.add_argument("--burst-size", type=int, default=20, help="Readings in one burst")
+    parser.add_argument("--device-keys", default=None,
+                        help="JSON file mapping loadtest-device-<i> to its X-Device-Key")
+    parser.add_argument("--clients", type=int, default=5, help="Simulated mobile clients (M)")
+    parser.add_argument("--poll-interval", type=float, default=10.0, help="Seconds between client polls")
+    parser.add_argument("--days", type=int, default=7, help="days parameter of readings polls")
+    parser.add_argument("--duration", type=float, default=60.0, help="Test duration in seconds")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=None, help="Write the report as JSON")
+    args = parser.parse_args()
+    if args.device_keys:
+        with open(args.device_keys) as f:
+            args.device_keys = json.load(f)
+    else:
+        args.device_keys = {}
+    asyncio.run(main(args))
@@ -0,0 +1,109 @@
+"""
+Login Storm Benchmark
+
+Measures /sensor/data latency on a single worker while many clients log
+in at the same time, once with bcrypt running inline on the event loop
+and once in the password hashing pool.
+
+Runs in-process against a local SQLite database:
+
+    pip install -r benchmarks/requirements.txt
+    python -m benchmarks.login_storm --logins 40 --posts 300
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks.common import percentile, setup_database
+
+import httpx
+
+from app.config import get_settings
+from app.main import app
+from app.services import auth as auth_service
+
+USERNAME = "storm"
+PASSWORD = "storm-password"
+
+
+async def post_readings(client, count, interval):
+    """
+    Send sensor posts on a fixed schedule (open loop)
+
+    Latency is measured from the scheduled send time, so time spent
+    waiting for a blocked event loop is counted too.
+    """
+    async def post(i, scheduled):
+        response = await client.post(
+            "/sensor/data",
+            json={"type": "temperature", "value": 20 + i % 5, "device_id": "bench-device"}
+        )
+        response.raise_for_status()
+        return (time.perf_counter() - scheduled) * 1000
+
+    tasks = []
+    start = time.perf_counter()
+    for i in range(count):
+        scheduled = start + i * interval
+        await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+        tasks.append(asyncio.create_task(post(i, scheduled)))
+    return await asyncio.gather(*tasks)
+
+
+async def login_storm(client, count, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def login():
+        async with semaphore:
+            await client.post("/login", data={"username": USERNAME, "password": PASSWORD})
+
+    await asyncio.gather(*(login() for _ in range(count)))
+
+
+async def run_mode(name, hasher, args):
+    auth_service.password_hasher = hasher
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        latencies, _ = await asyncio.gather(
+            post_readings(client, args.posts, args.interval / 1000),
+            login_storm(client, args.logins, args.concurrency)
+        )
+        elapsed = time.perf_counter() - start
+
+    print(
+        f"{name:>8}: ingest p50={percentile(latencies, 50):7.1f} ms "
+        f"p95={percentile(latencies, 95):7.1f} ms "
+        f"p99={percentile(latencies, 99):7.1f} ms "
+        f"max={max(latencies):7.1f} ms "
+        f"mean={statistics.mean(latencies):6.1f} ms  ({elapsed:.1f} s)"
+    )
+    print(f"{'':>8}  hasher: {hasher.stats()}")
+
+
+async def main(args):
+    setup_database()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        response = await client.post(
+            "/register",
+            json={"email": "storm@example.com", "username": USERNAME, "password": PASSWORD}
+        )
+        response.raise_for_status()
+
+    settings = get_settings()
+    print(f"{args.logins} logins (concurrency {args.concurrency}) during {args.posts} sensor posts")
+    await run_mode("inline", auth_service.PasswordHasher(0, 0), args)
+    await run_mode("pool", auth_service.PasswordHasher(
+        settings.PASSWORD_HASH_WORKERS, max(settings.PASSWORD_HASH_QUEUE_SIZE, args.concurrency)
+    ), args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=40, help="Number of logins in the storm")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent login requests")
+    parser.add_argument("--posts", type=int, default=300, help="Sensor posts to measure")
+    parser.add_argument("--interval", type=float, default=50, help="Interval between scheduled sensor posts (ms)")
+    asyncio.run(main(parser.parse_args()))
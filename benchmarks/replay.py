@@ -0,0 +1,164 @@
+"""
+Traffic Replay
+
+Re-issues traffic recorded by the capture middleware
+(TRAFFIC_CAPTURE_PATH) against a local instance, keeping the original
+request spacing, and compares latency distributions between builds:
+
+    python -m benchmarks.replay captures/traffic.jsonl.* --base-url http://localhost:8000 \\
+        --username replay --password replay-password --speed 4 --output before.json
+    # ... deploy the new build ...
+    python -m benchmarks.replay captures/traffic.jsonl.* --speed 4 \\
+        --username replay --password replay-password --compare before.json
+
+`--speed 1` replays in real time, `--speed 10` ten times faster and
+`--speed 0` sends every request as fast as possible. Requests are sent
+on the recorded schedule (open loop), so a slow server does not slow
+the replay down and latency is measured from the scheduled send time.
+
+The capture never stores credentials: requests that were authenticated
+are replayed with a token for `--username`, and bodies of redacted
+auth endpoints are skipped. Device keys can be supplied with
+`--device-keys` (JSON mapping device_id to key).
+"""
+import argparse
+import asyncio
+import glob
+import json
+import time
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.fleet_load import Recorder, percentile
+
+
+def load_capture(patterns: List[str]) -> List[Dict]:
+    """Captured requests from all files (all workers, rotated files), oldest first"""
+    records = []
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)) or [pattern]:
+            with open(path, encoding="utf-8") as f:
+                records.extend(json.loads(line) for line in f if line.strip())
+    records.sort(key=lambda record: record["ts"])
+    return records
+
+
+def replayable(record: Dict) -> bool:
+    return not record["redacted"] and not record["truncated"]
+
+
+async def login(client: httpx.AsyncClient, username: str, password: str) -> str:
+    response = await client.post("/login", data={"username": username, "password": password})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def replay(client, recorder: Recorder, record: Dict, send_at: float, token: str, device_keys: Dict):
+    await asyncio.sleep(max(0.0, send_at - time.monotonic()))
+    headers = {}
+    if record.get("content_type"):
+        headers["Content-Type"] = record["content_type"]
+    if record.get("subject") not in (None, "invalid") and token:
+        headers["Authorization"] = f"Bearer {token}"
+    if record.get("device_key") and record.get("body"):
+        try:
+            device_id = json.loads(record["body"]).get("device_id")
+        except (ValueError, AttributeError):
+            device_id = None
+        if device_id in device_keys:
+            headers["X-Device-Key"] = device_keys[device_id]
+    url = record["path"] + (f"?{record['query']}" if record["query"] else "")
+    name = f"{record['method']} {record['route'] or record['path']}"
+    # Responses that failed in production are expected to fail again
+    expected = (record["status"],) if record["status"] >= 400 else ()
+    await recorder.request(
+        client, name, record["method"], url, expected=expected,
+        content=record["body"].encode() if record["body"] else None, headers=headers,
+    )
+
+
+def print_comparison(report: Dict[str, Dict], previous: Dict[str, Dict]):
+    print(f"\n{'endpoint':<36} {'metric':>6} {'before':>9} {'after':>9} {'change':>8}")
+    for name, stats in report.items():
+        before = previous.get(name)
+        if before is None:
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            if stats[metric] is None or before.get(metric) is None:
+                continue
+            change = (stats[metric] - before[metric]) / before[metric] * 100 if before[metric] else 0.0
+            print(f"{name:<36} {metric[:3]:>6} {before[metric]:>9.1f} {stats[metric]:>9.1f} {change:>+7.1f}%")
+
+
+async def main(args):
+    records = [record for record in load_capture(args.capture) if replayable(record)]
+    if args.limit:
+        records = records[:args.limit]
+    if not records:
+        print("No replayable requests in capture")
+        return
+
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        token = await login(client, args.username, args.password) if args.username else None
+        first_ts = records[0]["ts"]
+        start = time.monotonic()
+        await asyncio.gather(*(
+            replay(
+                client, recorder, record,
+                start + ((record["ts"] - first_ts) / args.speed if args.speed > 0 else 0.0),
+                token, args.device_keys,
+            )
+            for record in records
+        ))
+        elapsed = time.monotonic() - start
+
+    report = recorder.report(elapsed)
+    print(f"Replayed {len(records)} requests at {args.speed or 'max'}x in {elapsed:.1f} s\n")
+    print(f"{'endpoint':<36} {'requests':>9} {'errors':>7} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for name, stats in report.items():
+        def ms(value):
+            return f"{value:.1f}" if value is not None else "-"
+        print(
+            f"{name:<36} {stats['requests']:>9} {stats['errors']:>7} "
+            f"{ms(stats['p50_ms']):>8} {ms(stats['p95_ms']):>8} {ms(stats['p99_ms']):>8}"
+        )
+
+    recorded = {}
+    for record in records:
+        recorded.setdefault(f"{record['method']} {record['route'] or record['path']}", []).append(record["duration_ms"])
+    print(f"\n{'endpoint':<36} {'captured p50':>13} {'captured p99':>13}")
+    for name, samples in sorted(recorded.items()):
+        print(f"{name:<36} {percentile(samples, 50):>13.1f} {percentile(samples, 99):>13.1f}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(report, json.load(f)["endpoints"])
+    if args.output:
+        with open(args.output, "w") as f:
+            config = {k: v for k, v in vars(args).items() if k not in ("device_keys", "password")}
+            json.dump({"config": config, "elapsed_s": round(elapsed, 1), "endpoints": report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("capture", nargs="+", help="Capture files or glob patterns")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed factor (0 = as fast as possible)")
+    parser.add_argument("--username", default=None, help="User whose token replaces captured auth")
+    parser.add_argument("--password", default=None)
+    parser.add_argument("--device-keys", default=None, help="JSON file mapping device_id to its X-Device-Key")
+    parser.add_argument("--connections", type=int, default=100, help="Maximum concurrent connections")
+    parser.add_argument("--limit", type=int, default=0, help="Replay only the first N requests")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Request timeout in seconds")
+    parser.add_argument("--compare", default=None, help="Report JSON of a previous replay to compare with")
+    parser.add_argument("--output", default=None, help="Write the report as JSON")
+    args = parser.parse_args()
+    if args.device_keys:
+        with open(args.device_keys) as f:
+            args.device_keys = json.load(f)
+    else:
+        args.device_keys = {}
+    asyncio.run(main(args))
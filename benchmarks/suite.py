@@ -0,0 +1,262 @@
+"""
+Microbenchmark Suite - ingestion and query hot paths
+
+Runs in-process against a local SQLite database filled with seeded
+synthetic data, writes machine-readable results and compares them with
+a stored baseline:
+
+    python -m benchmarks.suite --save-baseline           # on the base commit
+    python -m benchmarks.suite --compare                 # after a change
+    python -m benchmarks.suite --only readings --compare
+
+Results go to benchmarks/results/latest.json, the baseline to
+benchmarks/results/baseline.json (override with --output/--baseline).
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+
+from benchmarks.common import generate_readings, percentile, setup_database
+
+from pydantic import TypeAdapter
+
+from app import database
+from app.models.user import User
+from app.routers.sensor import receive_sensor_data
+from app.schemas.readings import SensorDataCreate, TemperatureReadingResponse
+from app.services import auth as auth_service
+from app.services.readings import fetch_readings
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+READING_WINDOWS = (1, 7, 30, 365)
+PASSWORD = "benchmark-password"
+
+
+def measure(func: Callable[[], None], iterations: int, warmup: int = 2) -> Dict:
+    """Time `iterations` calls of func, returning latency statistics in ms"""
+    for _ in range(warmup):
+        func()
+    samples: List[float] = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        "iterations": iterations,
+        "median_ms": round(statistics.median(samples), 4),
+        "mean_ms": round(statistics.mean(samples), 4),
+        "p95_ms": round(percentile(samples, 95), 4),
+        "min_ms": round(min(samples), 4),
+        "ops_per_sec": round(1000 / statistics.mean(samples), 1),
+    }
+
+
+def bench_ingest(args) -> Dict[str, Dict]:
+    """receive_sensor_data called directly with a real session"""
+    sensor_types = ["temperature", "ph", "weight", "outsideTemp", "humidity", "pressure"]
+    counter = {"i": 0}
+
+    def ingest():
+        counter["i"] += 1
+        data = SensorDataCreate(
+            type=sensor_types[counter["i"] % len(sensor_types)],
+            value=20.0 + counter["i"] % 7,
+            device_id=f"bench-device-{counter['i'] % 2}",
+        )
+        db = database.SessionLocal()
+        try:
+            receive_sensor_data(data, db, x_device_key=None)
+        finally:
+            db.close()
+
+    return {"ingest.receive_sensor_data": measure(ingest, args.ingest_iterations)}
+
+
+def bench_readings(args) -> Dict[str, Dict]:
+    """fetch_readings plus response serialization per days window"""
+    adapter = TypeAdapter(List[TemperatureReadingResponse])
+    results = {}
+    for days in READING_WINDOWS:
+        rows = {"count": 0}
+
+        def query_and_serialize():
+            db = database.SessionLocal()
+            try:
+                readings = fetch_readings(db, "temperature", days)
+                rows["count"] = len(readings)
+                adapter.dump_json(adapter.validate_python(readings, from_attributes=True))
+            finally:
+                db.close()
+
+        iterations = max(3, args.query_iterations // days) if days > 7 else args.query_iterations
+        result = measure(query_and_serialize, iterations, warmup=1)
+        result["rows"] = rows["count"]
+        results[f"readings.temperature.days_{days}"] = result
+    return results
+
+
+def bench_auth(args) -> Dict[str, Dict]:
+    """JWT decode plus user lookup, uncached and through the caches"""
+    db = database.SessionLocal()
+    try:
+        user = db.query(User).filter(User.username == "bench").first()
+        if user is None:
+            user = User(
+                email="bench@example.com",
+                username="bench",
+                hashed_password=auth_service.get_password_hash(PASSWORD),
+            )
+            db.add(user)
+            db.commit()
+            db.refresh(user)
+        token = auth_service.create_user_access_token(user)
+    finally:
+        db.close()
+
+    def decode_and_lookup():
+        auth_service.token_decode_cache.clear()
+        session = database.SessionLocal()
+        try:
+            assert auth_service.get_current_user_from_token(token, session) is not None
+        finally:
+            session.close()
+
+    def cached_lookup():
+        session = database.SessionLocal()
+        try:
+            assert auth_service.get_cached_user_from_token(token, session) is not None
+        finally:
+            session.close()
+
+    def claims_only():
+        assert auth_service.get_user_from_token_claims(token) is not None
+
+    return {
+        "auth.decode_and_lookup": measure(decode_and_lookup, args.auth_iterations),
+        "auth.cached_lookup": measure(cached_lookup, args.auth_iterations),
+        "auth.stateless_claims": measure(claims_only, args.auth_iterations),
+    }
+
+
+def bench_bcrypt(args) -> Dict[str, Dict]:
+    """Cost of one bcrypt hash and one verify"""
+    hashed = auth_service.get_password_hash(PASSWORD)
+    return {
+        "bcrypt.hash": measure(lambda: auth_service.get_password_hash(PASSWORD), args.bcrypt_iterations, warmup=1),
+        "bcrypt.verify": measure(lambda: auth_service.verify_password(PASSWORD, hashed), args.bcrypt_iterations, warmup=1),
+    }
+
+
+BENCHMARKS = {
+    "ingest": bench_ingest,
+    "readings": bench_readings,
+    "auth": bench_auth,
+    "bcrypt": bench_bcrypt,
+}
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> bool:
+    """Print median changes against the baseline, return True if anything regressed"""
+    regressed = False
+    print(f"\n{'benchmark':<36} {'baseline':>12} {'current':>12} {'change':>9}")
+    for name, result in results["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            print(f"{name:<36} {'-':>12} {result['median_ms']:>10.3f}ms {'new':>9}")
+            continue
+        change = (result["median_ms"] - base["median_ms"]) / base["median_ms"] if base["median_ms"] else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressed = True
+        print(
+            f"{name:<36} {base['median_ms']:>10.3f}ms {result['median_ms']:>10.3f}ms "
+            f"{change:>+8.1%}{flag}"
+        )
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", choices=sorted(BENCHMARKS), action="append", help="Run only these groups")
+    parser.add_argument("--seed", type=int, default=42, help="Synthetic data seed")
+    parser.add_argument("--per-hour", type=int, default=6, help="Synthetic readings per hour per device")
+    parser.add_argument("--devices", type=int, default=2, help="Synthetic devices")
+    parser.add_argument("--ingest-iterations", type=int, default=500)
+    parser.add_argument("--query-iterations", type=int, default=30)
+    parser.add_argument("--auth-iterations", type=int, default=500)
+    parser.add_argument("--bcrypt-iterations", type=int, default=5)
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "latest.json"))
+    parser.add_argument("--baseline", default=os.path.join(RESULTS_DIR, "baseline.json"))
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("--compare", action="store_true", help="Compare with the baseline")
+    parser.add_argument("--fail-threshold", type=float, default=0.2,
+                        help="Exit with status 1 when a median is this much slower (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    engine = setup_database()
+    groups = args.only or list(BENCHMARKS)
+    if "readings" in groups:
+        start = time.perf_counter()
+        rows = generate_readings(
+            engine, max(READING_WINDOWS), args.per_hour, args.devices, args.seed, ["temperature"]
+        )
+        print(f"Generated {rows} temperature readings in {time.perf_counter() - start:.1f} s")
+
+    results = {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat() + "Z",
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "per_hour": args.per_hour,
+            "devices": args.devices,
+        },
+        "results": {},
+    }
+    for group in groups:
+        for name, result in BENCHMARKS[group](args).items():
+            results["results"][name] = result
+            print(f"{name:<36} median {result['median_ms']:>10.3f} ms  p95 {result['p95_ms']:>10.3f} ms  "
+                  f"{result['ops_per_sec']:>10.1f} ops/s")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        shutil.copyfile(args.output, args.baseline)
+        print(f"Baseline saved to {args.baseline}")
+
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            print(f"No baseline at {args.baseline} - run with --save-baseline first")
+            sys.exit(2)
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.fail_threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Gunicorn configuration (used by startup.sh)
+
+The app is imported once in the master (preload_app) and workers are
+forked from it, so they share the imported code copy-on-write. The
+master also runs the schema check once, instead of every worker running
+it against the database on boot.
+"""
+import gc
+import logging
+import os
+
+preload_app = True
+
+
+def when_ready(server):
+    """Runs in the master after the app is preloaded, before any worker is forked"""
+    from app.database import engine, read_engine
+    from app.services.auth import pwd_context
+    from app.services.schema import SCHEMA_READY_ENV, SCHEMA_VERSION, prepare_database
+    from app.services.startup import startup_report
+
+    try:
+        prepare_database()
+    except Exception:
+        # Workers retry on their own when the database is not reachable yet
+        logging.getLogger(__name__).exception("Schema check in the master failed")
+    else:
+        os.environ[SCHEMA_READY_ENV] = str(SCHEMA_VERSION)
+    startup_report.mark("master_database")
+
+    # Load the bcrypt backend once here rather than on each worker's first login
+    pwd_context.handler("bcrypt").get_backend()
+
+    # Forked workers must not reuse the master's connections
+    for engine_ in {engine, read_engine}:
+        engine_.dispose()
+
+    # Move everything allocated so far out of the GC's reach - collections in
+    # the workers would otherwise touch (and copy) the shared pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from app.logging_config import restart_log_pipelines
+    from app.services.startup import startup_report
+    # Log writer threads of the master are not copied by fork
+    restart_log_pipelines()
+    startup_report.worker_forked()
+
+
+def child_exit(server, worker):
+    """Drop live gauges of a dead worker from the Prometheus multiprocess directory"""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -5,5 +5,6 @@ from app.main import app
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Access records come from AccessLogMiddleware
+    uvicorn.run(app, host="0.0.0.0", port=8000, access_log=False)
 
@@ -0,0 +1,23 @@
+"""
+Smart Brewery - Raspberry Pi client
+
+Samples the fermentation sensors, keeps readings in a local SQLite spool
+and uploads them in gzip-compressed batches to POST /sensor/batch.
+"""
+from brewery_client.agent import Agent
+from brewery_client.aggregate import Deadband, WindowAggregator
+from brewery_client.sensors import Sensor, create_sensor
+from brewery_client.spool import Spool, SpooledReading
+from brewery_client.uploader import Backoff, Uploader
+
+__all__ = [
+    "Agent",
+    "Backoff",
+    "Deadband",
+    "Sensor",
+    "Spool",
+    "SpooledReading",
+    "Uploader",
+    "WindowAggregator",
+    "create_sensor",
+]
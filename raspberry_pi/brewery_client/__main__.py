@@ -0,0 +1,106 @@
+"""
+Command line entry point: python -m brewery_client --config client.json
+
+Example config:
+
+    {
+        "base_url": "https://brewery.example.com",
+        "device_id": "fermenter-1",
+        "device_key": "...",
+        "spool_path": "/var/lib/brewery/spool.db",
+        "batch_size": 500,
+        "flush_interval": 60,
+        "window_seconds": 60,
+        "window_method": "mean",
+        "deadband": {"temperature": 0.1, "weight": 0.05},
+        "sensors": [
+            {"kind": "ds18b20", "interval": 10},
+            {"kind": "hx711", "interval": 30, "reference_unit": 92.5}
+        ]
+    }
+"""
+import argparse
+import json
+import logging
+import signal
+import sys
+
+from brewery_client.agent import Agent
+from brewery_client.aggregate import Deadband, WindowAggregator
+from brewery_client.sensors import SimulatedSensor, create_sensor
+from brewery_client.spool import Spool
+from brewery_client.uploader import Uploader
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="brewery_client", description="Smart Brewery sensor client")
+    parser.add_argument("--config", help="JSON config file")
+    parser.add_argument("--base-url", help="Server URL (overrides the config)")
+    parser.add_argument("--device-id", help="Device id (overrides the config)")
+    parser.add_argument("--simulate", action="store_true", help="Use simulated sensors instead of hardware")
+    parser.add_argument("--once", action="store_true", help="Sample once, upload the spool and exit")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+
+    config = {}
+    if args.config:
+        with open(args.config) as f:
+            config = json.load(f)
+    base_url = args.base_url or config.get("base_url", "http://localhost:8000")
+    device_id = args.device_id or config.get("device_id", "raspberry-pi")
+
+    if args.simulate:
+        sensors = [SimulatedSensor(interval=config.get("simulate_interval", 10))]
+    else:
+        sensors = [create_sensor(entry) for entry in config.get("sensors", [])]
+    if not sensors:
+        parser.error("No sensors configured (use --simulate or add \"sensors\" to the config)")
+
+    aggregator = None
+    if config.get("window_seconds"):
+        aggregator = WindowAggregator(config["window_seconds"], config.get("window_method", "mean"))
+    deadband = None
+    if config.get("deadband"):
+        deadband = Deadband(config["deadband"], config.get("heartbeat_seconds", 300))
+
+    spool = Spool(config.get("spool_path", "brewery_spool.db"), config.get("spool_max_rows", 1_000_000))
+    uploader = Uploader(
+        base_url,
+        device_id,
+        device_key=config.get("device_key"),
+        timeout=config.get("timeout", 15),
+        compress=config.get("compress", True)
+    )
+    agent = Agent(
+        sensors,
+        spool,
+        uploader,
+        batch_size=config.get("batch_size", 500),
+        flush_interval=config.get("flush_interval", 60),
+        aggregator=aggregator if not args.once else None,
+        deadband=deadband
+    )
+
+    try:
+        if args.once:
+            uploaded = agent.run_once()
+            logging.getLogger("brewery_client").info("%s, %d readings spooled", "Uploaded" if uploaded else "Upload failed", spool.count())
+            return 0 if uploaded else 1
+        signal.signal(signal.SIGTERM, lambda *_: agent.stop())
+        try:
+            agent.run()
+        except KeyboardInterrupt:
+            agent.stop()
+        return 0
+    finally:
+        uploader.close()
+        spool.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""
+Agent - Samples sensors into the spool and uploads it in batches
+
+The sampling loop never waits for the network: readings go through the
+optional aggregator / deadband into the local spool, and a separate
+upload thread drains the spool whenever `batch_size` readings are
+waiting or `flush_interval` seconds have passed. Failed uploads back off
+exponentially; the readings stay spooled until the server confirmed
+them (the batch id makes a retried upload idempotent).
+"""
+import logging
+import threading
+import time
+from typing import List, Optional
+
+from brewery_client.aggregate import Deadband, WindowAggregator
+from brewery_client.sensors import Sensor
+from brewery_client.spool import Spool
+from brewery_client.uploader import REJECTED, RETRY, Backoff, Uploader
+
+logger = logging.getLogger(__name__)
+
+
+class Agent:
+    """Ties sensors, spool and uploader together"""
+
+    def __init__(
+        self,
+        sensors: List[Sensor],
+        spool: Spool,
+        uploader: Uploader,
+        batch_size: int = 500,
+        flush_interval: float = 60.0,
+        aggregator: Optional[WindowAggregator] = None,
+        deadband: Optional[Deadband] = None,
+        backoff: Optional[Backoff] = None
+    ):
+        self.sensors = sensors
+        self.spool = spool
+        self.uploader = uploader
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.aggregator = aggregator
+        self.deadband = deadband
+        self.backoff = backoff or Backoff()
+        self._stop = threading.Event()
+        self._wake_uploader = threading.Event()
+        self._next_read = [0.0] * len(sensors)
+
+    # Sampling
+
+    def sample(self, now: Optional[float] = None) -> int:
+        """Read the sensors that are due, returns the number of readings spooled"""
+        now = now if now is not None else time.time()
+        readings = []
+        for index, sensor in enumerate(self.sensors):
+            if now < self._next_read[index]:
+                continue
+            self._next_read[index] = now + sensor.interval
+            try:
+                values = sensor.read()
+            except Exception as e:
+                logger.warning("Reading %s failed: %s", type(sensor).__name__, e)
+                continue
+            for sensor_type, value in values.items():
+                if self.aggregator:
+                    readings.extend(self.aggregator.add(sensor_type, value, now))
+                else:
+                    readings.append((sensor_type, value, now))
+        if self.aggregator:
+            readings.extend(self.aggregator.flush(now))
+        return self._spool(readings)
+
+    def _spool(self, readings: list) -> int:
+        if self.deadband:
+            readings = [reading for reading in readings if self.deadband.keep(*reading)]
+        if readings:
+            self.spool.put_many(readings)
+            if self.spool.count() >= self.batch_size:
+                self._wake_uploader.set()
+        return len(readings)
+
+    # Uploading
+
+    def upload(self) -> bool:
+        """Upload spooled readings batch by batch, returns False when the server should be retried later"""
+        while not self._stop.is_set():
+            batch_id, readings = self.spool.next_batch(self.batch_size)
+            if not readings:
+                return True
+            result = self.uploader.send(batch_id, readings)
+            if result == RETRY:
+                return False
+            if result == REJECTED:
+                # Retrying will not help - drop the batch instead of blocking everything behind it
+                logger.error("Dropping %d rejected readings", len(readings))
+            self.spool.ack(readings)
+            self.backoff.reset()
+        return True
+
+    def _upload_loop(self) -> None:
+        delay = self.flush_interval
+        while not self._stop.is_set():
+            self._wake_uploader.wait(delay)
+            self._wake_uploader.clear()
+            if self._stop.is_set():
+                break
+            if self.upload():
+                delay = self.flush_interval
+            else:
+                delay = self.backoff.next_delay()
+                logger.info("Upload failed, %d readings spooled, retrying in %.0f s", self.spool.count(), delay)
+
+    # Lifecycle
+
+    def run(self) -> None:
+        """Sample and upload until `stop()` is called"""
+        uploader = threading.Thread(target=self._upload_loop, name="uploader", daemon=True)
+        uploader.start()
+        tick = min(sensor.interval for sensor in self.sensors) if self.sensors else 1.0
+        try:
+            while not self._stop.is_set():
+                self.sample()
+                self._stop.wait(min(tick, 1.0))
+        finally:
+            self._stop.set()
+            self._wake_uploader.set()
+            uploader.join(timeout=self.uploader.timeout + 5)
+            if self.aggregator:
+                self._spool(self.aggregator.flush())
+
+    def run_once(self) -> bool:
+        """Sample every sensor once and upload everything spooled"""
+        self.sample()
+        if self.aggregator:
+            self._spool(self.aggregator.flush())
+        return self.upload()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake_uploader.set()
@@ -0,0 +1,80 @@
+"""
+Pre-aggregation - fewer readings uploaded for slowly changing sensors
+
+Two independent options, both per sensor type:
+
+- WindowAggregator: sample often, upload one value per window
+  (mean, min, max or last), time-stamped at the end of the window.
+- Deadband: drop a reading that differs from the last kept one by less
+  than a threshold, but keep one at least every `heartbeat` seconds so
+  the server still sees the sensor alive.
+"""
+import math
+from typing import Dict, List, Optional, Tuple
+
+Reading = Tuple[str, float, float]  # (sensor_type, value, timestamp)
+
+AGGREGATES = {
+    "mean": lambda values: sum(values) / len(values),
+    "min": min,
+    "max": max,
+    "last": lambda values: values[-1],
+}
+
+
+class WindowAggregator:
+    """Collapses samples into one reading per sensor type and time window"""
+
+    def __init__(self, window_seconds: float, method: str = "mean"):
+        if method not in AGGREGATES:
+            raise ValueError(f"Unknown aggregate {method!r}, use one of {', '.join(AGGREGATES)}")
+        self.window_seconds = window_seconds
+        self.aggregate = AGGREGATES[method]
+        self._windows: Dict[str, Tuple[float, List[float]]] = {}
+
+    def _window_end(self, timestamp: float) -> float:
+        return (math.floor(timestamp / self.window_seconds) + 1) * self.window_seconds
+
+    def add(self, sensor_type: str, value: float, timestamp: float) -> List[Reading]:
+        """Add a sample, returns the reading of a window it closed (if any)"""
+        window_end = self._window_end(timestamp)
+        closed = []
+        current = self._windows.get(sensor_type)
+        if current is not None and current[0] != window_end:
+            closed.append((sensor_type, self.aggregate(current[1]), current[0]))
+            current = None
+        if current is None:
+            current = self._windows[sensor_type] = (window_end, [])
+        current[1].append(value)
+        return closed
+
+    def flush(self, now: Optional[float] = None) -> List[Reading]:
+        """Readings of windows that ended before `now` (all windows when now is None)"""
+        closed = []
+        for sensor_type, (window_end, values) in list(self._windows.items()):
+            if now is None or window_end <= now:
+                closed.append((sensor_type, self.aggregate(values), window_end))
+                del self._windows[sensor_type]
+        return closed
+
+
+class Deadband:
+    """Keeps a reading only when it moved by at least the sensor's threshold"""
+
+    def __init__(self, thresholds: Dict[str, float], heartbeat_seconds: float = 300):
+        self.thresholds = thresholds
+        self.heartbeat_seconds = heartbeat_seconds
+        self._last: Dict[str, Tuple[float, float]] = {}
+
+    def keep(self, sensor_type: str, value: float, timestamp: float) -> bool:
+        threshold = self.thresholds.get(sensor_type)
+        last = self._last.get(sensor_type)
+        if (
+            threshold is None
+            or last is None
+            or abs(value - last[0]) >= threshold
+            or timestamp - last[1] >= self.heartbeat_seconds
+        ):
+            self._last[sensor_type] = (value, timestamp)
+            return True
+        return False
@@ -0,0 +1,137 @@
+"""
+Sensors - Uniform read() interface over the brewery's sensor hardware
+
+Hardware libraries are imported when a sensor is created, so the client
+runs (e.g. with simulated sensors) on machines without them.
+Every sensor returns a dict of sensor_type -> value per read; the types
+are the server's (temperature, ph, weight, outsideTemp, humidity,
+pressure).
+"""
+import math
+import random
+import subprocess
+import time
+from typing import Dict
+
+
+class Sensor:
+    """Base class - `interval` is the sampling period in seconds"""
+
+    def __init__(self, interval: float = 10.0):
+        self.interval = interval
+
+    def read(self) -> Dict[str, float]:
+        raise NotImplementedError
+
+
+class SimulatedSensor(Sensor):
+    """Slowly drifting fermentation values, for testing without hardware"""
+
+    def __init__(self, interval: float = 10.0, types=("temperature", "humidity", "ph", "weight")):
+        super().__init__(interval)
+        self.types = list(types)
+        self._started = time.time()
+        self._weight = 25.0
+
+    def read(self) -> Dict[str, float]:
+        hours = (time.time() - self._started) / 3600
+        self._weight -= random.uniform(0, 0.0005)
+        values = {
+            "temperature": 19.5 + 0.5 * math.sin(hours) + random.gauss(0, 0.05),
+            "humidity": 55 + 3 * math.sin(hours / 2) + random.gauss(0, 0.3),
+            "ph": 4.6 - min(hours / 48, 0.5) + random.gauss(0, 0.01),
+            "weight": self._weight,
+        }
+        return {sensor_type: round(values[sensor_type], 3) for sensor_type in self.types if sensor_type in values}
+
+
+class DS18B20Sensor(Sensor):
+    """1-Wire temperature probe (w1thermsensor)"""
+
+    def __init__(self, interval: float = 10.0, sensor_id: str = None, sensor_type: str = "temperature"):
+        super().__init__(interval)
+        from w1thermsensor import W1ThermSensor
+        self.sensor_type = sensor_type
+        self._sensor = W1ThermSensor(sensor_id=sensor_id) if sensor_id else W1ThermSensor()
+
+    def read(self) -> Dict[str, float]:
+        return {self.sensor_type: round(self._sensor.get_temperature(), 3)}
+
+
+class BME280Sensor(Sensor):
+    """I2C temperature / humidity / pressure sensor (adafruit-circuitpython-bme280)"""
+
+    def __init__(self, interval: float = 10.0, address: int = 0x76, temperature_type: str = "outsideTemp"):
+        super().__init__(interval)
+        import board
+        from adafruit_bme280 import basic as adafruit_bme280
+        self.temperature_type = temperature_type
+        self._sensor = adafruit_bme280.Adafruit_BME280_I2C(board.I2C(), address=address)
+
+    def read(self) -> Dict[str, float]:
+        return {
+            self.temperature_type: round(self._sensor.temperature, 3),
+            "humidity": round(self._sensor.relative_humidity, 3),
+            "pressure": round(self._sensor.pressure, 3),
+        }
+
+
+class HX711Sensor(Sensor):
+    """Load cell amplifier for the fermenter weight (hx711)"""
+
+    def __init__(
+        self,
+        interval: float = 30.0,
+        dout_pin: int = 5,
+        pd_sck_pin: int = 6,
+        reference_unit: float = 1.0,
+        offset: float = 0.0,
+        samples: int = 5
+    ):
+        super().__init__(interval)
+        from hx711 import HX711
+        self.reference_unit = reference_unit
+        self.offset = offset
+        self.samples = samples
+        self._sensor = HX711(dout_pin=dout_pin, pd_sck_pin=pd_sck_pin)
+
+    def read(self) -> Dict[str, float]:
+        raw = self._sensor.get_raw_data(self.samples)
+        raw = sorted(value for value in raw if value is not False)
+        if not raw:
+            return {}
+        return {"weight": round((raw[len(raw) // 2] - self.offset) / self.reference_unit, 3)}
+
+
+class CommandSensor(Sensor):
+    """Runs a command that prints one number, e.g. a vendor pH probe script"""
+
+    def __init__(self, command: str, sensor_type: str, interval: float = 60.0, timeout: float = 10.0):
+        super().__init__(interval)
+        self.command = command
+        self.sensor_type = sensor_type
+        self.timeout = timeout
+
+    def read(self) -> Dict[str, float]:
+        output = subprocess.run(
+            self.command, shell=True, capture_output=True, text=True, timeout=self.timeout, check=True
+        ).stdout
+        return {self.sensor_type: float(output.strip())}
+
+
+SENSOR_CLASSES = {
+    "simulated": SimulatedSensor,
+    "ds18b20": DS18B20Sensor,
+    "bme280": BME280Sensor,
+    "hx711": HX711Sensor,
+    "command": CommandSensor,
+}
+
+
+def create_sensor(config: dict) -> Sensor:
+    """Build a sensor from a config entry like {"kind": "ds18b20", "interval": 10}"""
+    config = dict(config)
+    kind = config.pop("kind")
+    if kind not in SENSOR_CLASSES:
+        raise ValueError(f"Unknown sensor kind {kind!r}, use one of {', '.join(SENSOR_CLASSES)}")
+    return SENSOR_CLASSES[kind](**config)
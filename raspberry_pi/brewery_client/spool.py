@@ -0,0 +1,145 @@
+"""
+Local Spool - Durable SQLite queue of readings waiting for upload
+
+Readings are committed to disk as soon as they are sampled, so a power
+cut or network outage loses nothing that was already measured. Uploads
+take the oldest rows and delete them only after the server confirmed
+them.
+
+The batch being uploaded is stored with its id until it is acknowledged,
+so a retry - also after a restart, or after the size limit dropped some
+of its rows - is sent under the same batch id.
+"""
+import sqlite3
+import threading
+import time
+import uuid
+from typing import List, NamedTuple, Optional, Tuple
+
+
+class SpooledReading(NamedTuple):
+    id: int
+    sensor_type: str
+    value: float
+    timestamp: float  # Unix time
+
+
+class Spool:
+    """SQLite-backed FIFO of readings, safe to use from several threads"""
+
+    def __init__(self, path: str, max_rows: int = 1_000_000):
+        self.path = path
+        self.max_rows = max_rows
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL never corrupts the file on power loss (the last few commits
+        # may be lost) and needs far fewer fsyncs - SD cards wear out
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS readings ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " sensor_type TEXT NOT NULL,"
+            " value REAL NOT NULL,"
+            " timestamp REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        # The batch sent but not yet acknowledged (at most one row)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS pending_batch ("
+            " batch_id TEXT PRIMARY KEY,"
+            " first_id INTEGER NOT NULL,"
+            " last_id INTEGER NOT NULL)"
+        )
+        self._connection.execute(
+            "INSERT OR IGNORE INTO meta (key, value) VALUES ('spool_id', ?)", (uuid.uuid4().hex[:12],)
+        )
+        self.spool_id = self._connection.execute("SELECT value FROM meta WHERE key = 'spool_id'").fetchone()[0]
+
+    def put(self, sensor_type: str, value: float, timestamp: Optional[float] = None) -> None:
+        self.put_many([(sensor_type, value, timestamp if timestamp is not None else time.time())])
+
+    def put_many(self, readings: List[tuple]) -> None:
+        """Store (sensor_type, value, timestamp) tuples in one transaction"""
+        with self._lock:
+            self._connection.execute("BEGIN")
+            self._connection.executemany(
+                "INSERT INTO readings (sensor_type, value, timestamp) VALUES (?, ?, ?)", readings
+            )
+            self._connection.execute("COMMIT")
+            self._enforce_limit()
+
+    def _enforce_limit(self) -> None:
+        # During a very long outage keep the newest readings
+        overflow = self._count() - self.max_rows
+        if overflow > 0:
+            self._connection.execute(
+                "DELETE FROM readings WHERE id IN (SELECT id FROM readings ORDER BY id LIMIT ?)", (overflow,)
+            )
+            self.dropped += overflow
+
+    def peek(self, limit: int) -> List[SpooledReading]:
+        """Oldest readings, not removed until `ack`"""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT id, sensor_type, value, timestamp FROM readings ORDER BY id LIMIT ?", (limit,)
+            ).fetchall()
+        return [SpooledReading(*row) for row in rows]
+
+    def next_batch(self, limit: int) -> Tuple[Optional[str], List[SpooledReading]]:
+        """
+        The batch to upload and its id, (None, []) when the spool is empty
+
+        Returns the pending batch again until it is acknowledged, otherwise
+        stores the oldest `limit` readings as the new pending batch.
+        """
+        with self._lock:
+            pending = self._connection.execute("SELECT batch_id, first_id, last_id FROM pending_batch").fetchone()
+            if pending is not None:
+                rows = self._connection.execute(
+                    "SELECT id, sensor_type, value, timestamp FROM readings WHERE id BETWEEN ? AND ? ORDER BY id",
+                    (pending[1], pending[2])
+                ).fetchall()
+                if rows:
+                    return pending[0], [SpooledReading(*row) for row in rows]
+                # The size limit dropped the whole batch
+                self._connection.execute("DELETE FROM pending_batch")
+
+            rows = self._connection.execute(
+                "SELECT id, sensor_type, value, timestamp FROM readings ORDER BY id LIMIT ?", (limit,)
+            ).fetchall()
+            if not rows:
+                return None, []
+            # AUTOINCREMENT never reuses ids, so this id is never given to other rows
+            batch_id = f"{self.spool_id}-{rows[0][0]}-{rows[-1][0]}"
+            self._connection.execute(
+                "INSERT INTO pending_batch (batch_id, first_id, last_id) VALUES (?, ?, ?)",
+                (batch_id, rows[0][0], rows[-1][0])
+            )
+            return batch_id, [SpooledReading(*row) for row in rows]
+
+    def ack(self, readings: List[SpooledReading]) -> None:
+        """Remove uploaded readings (and the pending batch they belong to)"""
+        if not readings:
+            return
+        with self._lock:
+            self._connection.execute("BEGIN")
+            self._connection.execute(
+                "DELETE FROM readings WHERE id BETWEEN ? AND ?", (readings[0].id, readings[-1].id)
+            )
+            self._connection.execute("DELETE FROM pending_batch WHERE last_id <= ?", (readings[-1].id,))
+            self._connection.execute("COMMIT")
+
+    def _count(self) -> int:
+        # Rows are only ever removed from the front, so ids are contiguous
+        first, last = self._connection.execute("SELECT MIN(id), MAX(id) FROM readings").fetchone()
+        return last - first + 1 if first is not None else 0
+
+    def count(self) -> int:
+        with self._lock:
+            return self._count()
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,112 @@
+"""
+Uploader - Batched, compressed uploads to /sensor/batch
+
+One requests.Session is reused for every upload, so the TCP and TLS
+connection stays open between batches (HTTP keep-alive) instead of a
+new handshake per reading.
+"""
+import gzip
+import json
+import logging
+import random
+from datetime import datetime, timezone
+from typing import List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from brewery_client.spool import SpooledReading
+
+logger = logging.getLogger(__name__)
+
+# Upload outcomes
+UPLOADED = "uploaded"
+RETRY = "retry"
+REJECTED = "rejected"
+
+
+class Backoff:
+    """Exponential backoff with jitter between failed uploads"""
+
+    def __init__(self, initial: float = 1.0, maximum: float = 300.0, factor: float = 2.0, jitter: float = 0.2):
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.jitter = jitter
+        self.failures = 0
+
+    def next_delay(self) -> float:
+        """Register a failure and return how long to wait before the next attempt"""
+        delay = min(self.maximum, self.initial * self.factor ** self.failures)
+        self.failures += 1
+        return delay * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def reset(self) -> None:
+        self.failures = 0
+
+
+class Uploader:
+    """Sends spooled readings of one device to the server"""
+
+    def __init__(
+        self,
+        base_url: str,
+        device_id: str,
+        device_key: Optional[str] = None,
+        timeout: float = 15.0,
+        compress: bool = True,
+        session: Optional[requests.Session] = None
+    ):
+        self.url = base_url.rstrip("/") + "/sensor/batch"
+        self.device_id = device_id
+        self.timeout = timeout
+        self.compress = compress
+        self.session = session or requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        self.session.headers["Content-Type"] = "application/json"
+        if device_key:
+            self.session.headers["X-Device-Key"] = device_key
+
+    def _body(self, batch_id: str, readings: List[SpooledReading]) -> bytes:
+        payload = {
+            "device_id": self.device_id,
+            "batch_id": batch_id,
+            "readings": [
+                {
+                    "type": reading.sensor_type,
+                    "value": reading.value,
+                    "timestamp": datetime.fromtimestamp(reading.timestamp, timezone.utc).isoformat()
+                }
+                for reading in readings
+            ]
+        }
+        return json.dumps(payload, separators=(",", ":")).encode()
+
+    def send(self, batch_id: str, readings: List[SpooledReading]) -> str:
+        """Upload one batch, returns UPLOADED, RETRY (try again later) or REJECTED (drop it)"""
+        body = self._body(batch_id, readings)
+        headers = {}
+        if self.compress:
+            body = gzip.compress(body, compresslevel=6)
+            headers["Content-Encoding"] = "gzip"
+        try:
+            response = self.session.post(self.url, data=body, headers=headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            logger.warning("Upload of %d readings failed: %s", len(readings), e)
+            return RETRY
+
+        if response.status_code == 200:
+            return UPLOADED
+        if response.status_code in (408, 429) or response.status_code >= 500:
+            logger.warning("Server busy or failing (%s), will retry", response.status_code)
+            return RETRY
+        if response.status_code == 401:
+            # Wrong or missing device key - keep the data until the key is fixed
+            logger.error("Server rejected the device key (401), will retry")
+            return RETRY
+        logger.error("Server rejected batch %s (%s): %s", batch_id, response.status_code, response.text[:500])
+        return REJECTED
+
+    def close(self) -> None:
+        self.session.close()
@@ -0,0 +1,124 @@
+"""
+brewery_client against the local app (FastAPI TestClient, temporary SQLite database)
+
+Run from the repository root: python -m pytest raspberry_pi/tests
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path[:0] = [_ROOT, os.path.join(_ROOT, "raspberry_pi")]
+os.environ.setdefault("SECRET_KEY", "brewery-client-test")
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "brewery.db"))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import func, select  # noqa: E402
+
+import app.models  # noqa: E402,F401
+from app.database import Base, SessionLocal, engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.readings import TemperatureReading  # noqa: E402
+from brewery_client import Agent, Spool, Uploader  # noqa: E402
+from brewery_client.sensors import SimulatedSensor  # noqa: E402
+from brewery_client.uploader import UPLOADED  # noqa: E402
+
+Base.metadata.create_all(engine)
+
+
+class AppAdapter(BaseAdapter):
+    """requests transport adapter sending to the app through TestClient"""
+
+    def __init__(self, client: TestClient):
+        super().__init__()
+        self.client = client
+
+    def send(self, request, **kwargs):
+        reply = self.client.request(request.method, request.url, content=request.body, headers=dict(request.headers))
+        response = requests.Response()
+        response.status_code = reply.status_code
+        response.headers = CaseInsensitiveDict(reply.headers)
+        response._content = reply.content
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def _uploader(device_id: str) -> Uploader:
+    uploader = Uploader("http://testserver", device_id)
+    uploader.session.mount("http://testserver", AppAdapter(TestClient(app)))
+    return uploader
+
+
+def _stored(device_id: str) -> int:
+    db = SessionLocal()
+    try:
+        return db.execute(
+            select(func.count(TemperatureReading.id)).where(TemperatureReading.device_id == device_id)
+        ).scalar()
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def spool(tmp_path):
+    spool = Spool(str(tmp_path / "spool.db"))
+    yield spool
+    spool.close()
+
+
+def test_agent_uploads_spool(spool):
+    agent = Agent([SimulatedSensor(types=("temperature",))], spool, _uploader("pi-agent"), batch_size=2)
+    spool.put_many([("temperature", 20.0 + i / 10, 1_700_000_000 + i * 60) for i in range(4)])
+
+    assert agent.run_once()
+    assert spool.count() == 0
+    assert _stored("pi-agent") == 5
+
+
+def test_retry_after_lost_response_is_not_stored_twice(spool):
+    uploader = _uploader("pi-retry")
+    spool.put_many([("temperature", 20.0, 1_700_000_000 + i * 60) for i in range(3)])
+
+    batch_id, readings = spool.next_batch(10)
+    assert uploader.send(batch_id, readings) == UPLOADED
+    # The response was lost - the batch is sent again under the same id
+    assert spool.next_batch(10) == (batch_id, readings)
+    assert uploader.send(batch_id, readings) == UPLOADED
+    spool.ack(readings)
+
+    assert spool.next_batch(10) == (None, [])
+    assert _stored("pi-retry") == 3
+
+
+def test_batch_id_survives_dropped_head(tmp_path):
+    path = str(tmp_path / "spool.db")
+    spool = Spool(path, max_rows=10)
+    uploader = _uploader("pi-overflow")
+    spool.put_many([("temperature", 20.0, 1_700_000_000 + i * 60) for i in range(10)])
+
+    batch_id, readings = spool.next_batch(5)
+    assert uploader.send(batch_id, readings) == UPLOADED
+    # Before the ack: the spool overflows and drops the three oldest rows, then restarts
+    spool.put_many([("temperature", 21.0, 1_700_010_000 + i * 60) for i in range(3)])
+    spool.close()
+    spool = Spool(path, max_rows=10)
+
+    retry_id, retry = spool.next_batch(5)
+    assert retry_id == batch_id
+    assert [reading.id for reading in retry] == [4, 5]
+    assert uploader.send(retry_id, retry) == UPLOADED
+    spool.ack(retry)
+
+    agent = Agent([], spool, uploader, batch_size=5)
+    assert agent.upload()
+    spool.close()
+    assert _stored("pi-overflow") == 5 + 8
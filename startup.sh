@@ -5,12 +5,18 @@
 # Get port from environment (Azure sets this automatically)
 PORT=${PORT:-8000}
 
+# Prometheus multiprocess mode - workers share metrics through this directory
+export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus-multiproc}
+rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
 # Start uvicorn with gunicorn workers for production
+# (no gunicorn access log - the app writes sampled access records, see ACCESS_LOG_SAMPLE_RATES)
 exec gunicorn main:app \
+    --config gunicorn.conf.py \
     --workers 4 \
     --worker-class uvicorn.workers.UvicornWorker \
     --bind 0.0.0.0:$PORT \
     --timeout 120 \
-    --access-logfile - \
     --error-logfile -
 
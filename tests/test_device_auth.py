@@ -0,0 +1,77 @@
+"""
+Device API keys on /sensor/data (FastAPI TestClient, temporary SQLite database)
+
+Run from the repository root: python -m pytest tests
+"""
+import os
+import sys
+import tempfile
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _ROOT)
+os.environ.setdefault("SECRET_KEY", "device-auth-test")
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "brewery.db"))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import app.models  # noqa: E402,F401
+from app.database import Base, SessionLocal, engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.services.device_auth import (  # noqa: E402
+    DeviceKeyCache, create_device_key, delete_device_key
+)
+
+Base.metadata.create_all(engine)
+client = TestClient(app)
+
+
+def _post(device_id: str, headers=None):
+    return client.post(
+        "/sensor/data",
+        json={"type": "temperature", "value": 20.5, "device_id": device_id},
+        headers=headers or {},
+    )
+
+
+def _create_key(device_id: str) -> str:
+    db = SessionLocal()
+    try:
+        return create_device_key(db, device_id)
+    finally:
+        db.close()
+
+
+def test_keyed_device_needs_its_key():
+    key = _create_key("keyed-device")
+
+    assert _post("keyed-device").status_code == 401
+    assert _post("keyed-device", {"X-Device-Key": "dk_wrong"}).status_code == 401
+    assert _post("keyed-device", {"X-Device-Key": key}).status_code == 200
+
+
+def test_device_without_key_is_open_by_default():
+    assert _post("unkeyed-device").status_code == 200
+
+    db = SessionLocal()
+    try:
+        _create_key("revoked-device")
+        delete_device_key(db, "revoked-device")
+    finally:
+        db.close()
+    assert _post("revoked-device").status_code == 200
+
+
+def test_reload_keeps_keys_set_while_loading():
+    cache = DeviceKeyCache()
+    cache.set("old-device", "old-hash")
+    generation = cache.generation
+    # Changed after the reload read the database
+    cache.set("new-device", "new-hash")
+    cache.set("old-device", None)
+
+    cache.load({"old-device": "old-hash"}, generation)
+
+    assert cache.has_key("new-device")
+    assert not cache.has_key("old-device")
+    cache.load({}, cache.generation)
+    assert not cache.has_key("new-device")